@@ -0,0 +1,471 @@
+"""
+Vectorized analysis of many positions at once.
+
+A batch keeps the bitboards of N positions in an N x 12 uint64 array, index
+color * 6 + PIECE_INDEX, and computes attack maps, checks and move counts for
+all positions with array operations. Sliding attacks use Kogge-Stone fills
+along the directions of SQUAREOFFSET, the wrap-around at the board edges is
+masked with BORDER_OFFSETS and the leaper tables of the move generator.
+
+Legal move counts are exact without generating moves for positions that are
+not in check, have no en passant square and no figure between the king and
+an enemy range figure. The remaining positions go through MoveGenerator,
+optionally on a process pool.
+
+Usage:
+    python batch.py positions.epd.gz
+    python batch.py positions.txt --processes 32 --chunk 100000
+"""
+import argparse
+import itertools
+import multiprocessing
+import time
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from bitboard import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, FULL_BOARD, square_name_to_index
+from chessboard import Chessboard
+from fen import parse_fen, read_fens
+from moveGenerator import MoveGenerator, SQUAREOFFSET, BORDER_OFFSETS, SQUAREOFFSET_KNIGHT, KNIGHT_ATTACKS, KING_ATTACKS, CASTLE_SQUARES
+
+
+class PositionBatch(NamedTuple):
+    fens: List[str]
+    bitboards: np.ndarray       # N x 12 uint64, index color * 6 + PIECE_INDEX
+    color_to_move: np.ndarray   # N uint8, 0 for white
+    castle_rights: np.ndarray   # N uint8, bits K = 1, Q = 2, k = 4, q = 8
+    en_passant: np.ndarray      # N uint64, mask of the en passant square, 0 if there is none
+
+
+CASTLE_BITS = {"K": 1, "Q": 2, "k": 4, "q": 8}
+
+
+def _step_sources(offset: int, reachable) -> int:
+    """
+    Args:
+            offset (int): square offset of the step
+            reachable (Callable[[int], bool]): whether the step from a square stays on the board
+
+    Returns:
+            int: Mask of the squares the step can be made from
+    """
+    mask = 0
+    for idx in range(64):
+        if reachable(idx):
+            mask |= 1 << idx
+    return mask
+
+
+# (offset, mask of the squares the step may start on) for every direction of SQUAREOFFSET
+RAY_STEPS = [
+    (offset, _step_sources(offset, lambda idx, direction=direction: BORDER_OFFSETS[idx][direction] > 0))
+    for direction, offset in enumerate(SQUAREOFFSET)
+]
+# mask of the squares a step in every direction of SQUAREOFFSET can end on
+RAY_TARGETS = [(sources << offset if offset > 0 else sources >> -offset) & FULL_BOARD for offset, sources in RAY_STEPS]
+ROOK_DIRECTIONS = range(4)
+BISHOP_DIRECTIONS = range(4, 8)
+
+KNIGHT_STEPS = [
+    (offset, _step_sources(offset, lambda idx, offset=offset: 0 <= idx + offset < 64 and KNIGHT_ATTACKS[idx] >> (idx + offset) & 1))
+    for offset in SQUAREOFFSET_KNIGHT
+]
+KING_STEPS = RAY_STEPS
+
+# capture directions of the pawns indexed by color, white pawns walk towards index 0
+PAWN_CAPTURE_DIRECTIONS = [(4, 6), (5, 7)]
+PAWN_PUSH_DIRECTION = [0, 1]
+# rank the double push starts from and the rank a pawn promotes on, indexed by color
+PAWN_START_RANK = [0xFF << 48, 0xFF << 8]
+PROMOTION_RANK = [0xFF, 0xFF << 56]
+
+
+def _shift(bitboards: np.ndarray, offset: int) -> np.ndarray:
+    """
+    Helper function to move every set bit by a square offset, bits leaving the board are dropped.
+    """
+    if offset > 0:
+        return bitboards << np.uint64(offset)
+    return bitboards >> np.uint64(-offset)
+
+
+def _step(bitboards: np.ndarray, step: Tuple[int, int]) -> np.ndarray:
+    """
+    Helper function to make one step with every set bit, without wrapping around the board edges.
+    """
+    offset, sources = step
+    return _shift(bitboards & np.uint64(sources), offset)
+
+
+def _ray_attacks(sliders: np.ndarray, empty: np.ndarray, direction: int) -> np.ndarray:
+    """
+    Helper function to compute the squares range figures attack in one direction with a Kogge-Stone fill.
+
+    Args:
+        sliders (np.ndarray): masks of the range figures
+        empty (np.ndarray): masks of the empty squares
+        direction (int): index into SQUAREOFFSET
+
+    Returns:
+        np.ndarray: masks of the attacked squares, including the first blocker
+    """
+    offset, sources = RAY_STEPS[direction]
+    # squares a single step can land on, the fill must not walk over an edge
+    targets = np.uint64(RAY_TARGETS[direction])
+
+    generator = sliders
+    propagator = empty & targets
+    generator = generator | propagator & _shift(generator, offset)
+    propagator = propagator & _shift(propagator, offset)
+    generator = generator | propagator & _shift(generator, 2 * offset)
+    propagator = propagator & _shift(propagator, 2 * offset)
+    generator = generator | propagator & _shift(generator, 4 * offset)
+    return _shift(generator, offset) & targets
+
+
+def popcount(bitboards: np.ndarray) -> np.ndarray:
+    """
+    popcount counts the set bits of every element.
+
+    Args:
+        bitboards (np.ndarray): uint64 masks
+
+    Returns:
+        np.ndarray: amount of set bits per element
+    """
+    return np.bitwise_count(bitboards)
+
+
+def _parse_fen(fen: str) -> Tuple[List[int], int, int, int]:
+    """
+    Helper function to read the bitboards and state of a FEN string.
+
+    Returns:
+        Tuple[List[int], int, int, int]: 12 bitboards, color to move, castle bits and en passant mask
+    """
+    state = parse_fen(fen)
+
+    castle_bits = 0
+    for castle_type in state.castle_right:
+        castle_bits |= CASTLE_BITS.get(castle_type, 0)
+    en_passant_square = square_name_to_index(state.en_passant_square)
+    en_passant = 0 if en_passant_square is None else 1 << en_passant_square
+
+    return state.bitboards[0] + state.bitboards[1], state.color_to_move, castle_bits, en_passant
+
+
+def load_positions(fens: Iterable[str]) -> PositionBatch:
+    """
+    load_positions reads FEN strings into a batch.
+
+    Args:
+        fens (Iterable[str]): FEN strings of the positions
+
+    Returns:
+        PositionBatch: bitboards and state of all positions
+    """
+    fens = list(fens)
+    parsed = [_parse_fen(fen) for fen in fens]
+
+    return PositionBatch(
+        fens,
+        np.array([position[0] for position in parsed], dtype=np.uint64).reshape(len(fens), 12),
+        np.array([position[1] for position in parsed], dtype=np.uint8),
+        np.array([position[2] for position in parsed], dtype=np.uint8),
+        np.array([position[3] for position in parsed], dtype=np.uint64),
+    )
+
+
+def _sides(batch: PositionBatch) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Helper function to split the bitboards into the side to move and its opponent.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: N x 6 bitboards of the side to move and of the opponent
+    """
+    black_to_move = batch.color_to_move.astype(bool)[:, None]
+    white = batch.bitboards[:, :6]
+    black = batch.bitboards[:, 6:]
+    return np.where(black_to_move, black, white), np.where(black_to_move, white, black)
+
+
+def _attacks_of(pieces: np.ndarray, color: np.ndarray, occupied: np.ndarray) -> np.ndarray:
+    """
+    Helper function to compute the squares the figures of one side attack.
+
+    Args:
+        pieces (np.ndarray): N x 6 bitboards of the side
+        color (np.ndarray): N colors of the side
+        occupied (np.ndarray): N masks of all occupied squares
+
+    Returns:
+        np.ndarray: N masks of the attacked squares
+    """
+    empty = ~occupied
+    attacked = np.zeros(len(pieces), dtype=np.uint64)
+
+    for pawn_color in (0b0, 0b1):
+        pawns = np.where(color == pawn_color, pieces[:, PAWN], np.uint64(0))
+        for direction in PAWN_CAPTURE_DIRECTIONS[pawn_color]:
+            attacked |= _step(pawns, RAY_STEPS[direction])
+
+    for step in KNIGHT_STEPS:
+        attacked |= _step(pieces[:, KNIGHT], step)
+    for step in KING_STEPS:
+        attacked |= _step(pieces[:, KING], step)
+
+    orthogonal = pieces[:, ROOK] | pieces[:, QUEEN]
+    diagonal = pieces[:, BISHOP] | pieces[:, QUEEN]
+    for direction in ROOK_DIRECTIONS:
+        attacked |= _ray_attacks(orthogonal, empty, direction)
+    for direction in BISHOP_DIRECTIONS:
+        attacked |= _ray_attacks(diagonal, empty, direction)
+
+    return attacked
+
+
+def attack_maps(batch: PositionBatch) -> np.ndarray:
+    """
+    attack_maps computes the squares each color attacks in every position.
+
+    Args:
+        batch (PositionBatch): positions to analyse
+
+    Returns:
+        np.ndarray: N x 2 uint64 masks, column 0 for white and 1 for black
+    """
+    occupied = np.bitwise_or.reduce(batch.bitboards, axis=1)
+    white = np.zeros(len(batch.fens), dtype=np.uint8)
+    return np.stack([
+        _attacks_of(batch.bitboards[:, :6], white, occupied),
+        _attacks_of(batch.bitboards[:, 6:], white + 1, occupied),
+    ], axis=1)
+
+
+def _checkers(own: np.ndarray, enemy: np.ndarray, color: np.ndarray, occupied: np.ndarray) -> np.ndarray:
+    """
+    Helper function to find the enemy figures attacking the king of the side to move.
+
+    Returns:
+        np.ndarray: N masks of the checking figures
+    """
+    king = own[:, KING]
+    empty = ~occupied
+    checkers = np.zeros(len(own), dtype=np.uint64)
+
+    # a figure attacks the king if the same figure on the king square would attack it
+    for direction in ROOK_DIRECTIONS:
+        checkers |= _ray_attacks(king, empty, direction) & (enemy[:, ROOK] | enemy[:, QUEEN])
+    for direction in BISHOP_DIRECTIONS:
+        checkers |= _ray_attacks(king, empty, direction) & (enemy[:, BISHOP] | enemy[:, QUEEN])
+    for step in KNIGHT_STEPS:
+        checkers |= _step(king, step) & enemy[:, KNIGHT]
+    for pawn_color in (0b0, 0b1):
+        own_king = np.where(color == pawn_color, king, np.uint64(0))
+        for direction in PAWN_CAPTURE_DIRECTIONS[pawn_color]:
+            checkers |= _step(own_king, RAY_STEPS[direction]) & enemy[:, PAWN]
+
+    return checkers
+
+
+def count_checkers(batch: PositionBatch) -> np.ndarray:
+    """
+    count_checkers counts the figures giving check to the side to move.
+
+    Args:
+        batch (PositionBatch): positions to analyse
+
+    Returns:
+        np.ndarray: N amounts of checking figures, 0 if the side to move is not in check
+    """
+    own, enemy = _sides(batch)
+    occupied = np.bitwise_or.reduce(batch.bitboards, axis=1)
+    return popcount(_checkers(own, enemy, batch.color_to_move, occupied))
+
+
+def _count_moves(batch: PositionBatch, own: np.ndarray, enemy: np.ndarray, enemy_attacks: np.ndarray) -> np.ndarray:
+    """
+    Helper function to count the moves of the side to move, every target of a figure is one move.
+
+    Range figures of the same kind never share a target in the same direction, the ray of the
+    first one ends on the second. So popcounts of whole directions count each move once.
+
+    Args:
+        batch (PositionBatch): positions to analyse
+        own (np.ndarray): N x 6 bitboards of the side to move
+        enemy (np.ndarray): N x 6 bitboards of the opponent
+        enemy_attacks (np.ndarray): N masks of the squares the king must not move to
+
+    Returns:
+        np.ndarray: N move counts
+    """
+    own_occupancy = np.bitwise_or.reduce(own, axis=1)
+    enemy_occupancy = np.bitwise_or.reduce(enemy, axis=1)
+    occupied = own_occupancy | enemy_occupancy
+    empty = ~occupied
+    not_own = ~own_occupancy
+    color = batch.color_to_move
+
+    counts = np.zeros(len(own), dtype=np.int64)
+
+    for direction in ROOK_DIRECTIONS:
+        counts += popcount(_ray_attacks(own[:, ROOK] | own[:, QUEEN], empty, direction) & not_own)
+    for direction in BISHOP_DIRECTIONS:
+        counts += popcount(_ray_attacks(own[:, BISHOP] | own[:, QUEEN], empty, direction) & not_own)
+    for step in KNIGHT_STEPS:
+        counts += popcount(_step(own[:, KNIGHT], step) & not_own)
+    for step in KING_STEPS:
+        counts += popcount(_step(own[:, KING], step) & not_own & ~enemy_attacks)
+
+    for pawn_color in (0b0, 0b1):
+        pawns = np.where(color == pawn_color, own[:, PAWN], np.uint64(0))
+        promotion_rank = np.uint64(PROMOTION_RANK[pawn_color])
+
+        push = RAY_STEPS[PAWN_PUSH_DIRECTION[pawn_color]]
+        single = _step(pawns, push) & empty
+        double = _step(_step(pawns & np.uint64(PAWN_START_RANK[pawn_color]), push) & empty, push) & empty
+        targets = [single, double]
+        for direction in PAWN_CAPTURE_DIRECTIONS[pawn_color]:
+            targets.append(_step(pawns, RAY_STEPS[direction]) & (enemy_occupancy | batch.en_passant))
+
+        for target in targets:
+            # a promotion is one move for each of the four figures
+            counts += popcount(target & ~promotion_rank) + 4 * popcount(target & promotion_rank).astype(np.int64)
+
+    for castle_type, (king_square, king_target, rook_square, empty_mask, walk_mask) in CASTLE_SQUARES.items():
+        castle_color = 0b0 if castle_type.isupper() else 0b1
+        possible = (
+            (color == castle_color)
+            & (batch.castle_rights & CASTLE_BITS[castle_type] != 0)
+            & (own[:, KING] & np.uint64(1 << king_square) != 0)
+            & (own[:, ROOK] & np.uint64(1 << rook_square) != 0)
+            & (occupied & np.uint64(empty_mask) == 0)
+            & (enemy_attacks & np.uint64(walk_mask | 1 << king_square) == 0)
+        )
+        counts += possible
+
+    return counts
+
+
+def count_king_safe_moves(batch: PositionBatch) -> np.ndarray:
+    """
+    count_king_safe_moves counts the moves of the side to move that do not put the king itself onto an
+    attacked square: kings do not step onto attacked squares and castling is fully legal. Pins, checks to
+    escape and en passant captures are not looked at, so the count is neither pseudo-legal nor legal.
+
+    Args:
+        batch (PositionBatch): positions to analyse
+
+    Returns:
+        np.ndarray: N move counts
+    """
+    own, enemy = _sides(batch)
+    occupied = np.bitwise_or.reduce(batch.bitboards, axis=1)
+    enemy_attacks = _attacks_of(enemy, batch.color_to_move ^ 1, occupied)
+    return _count_moves(batch, own, enemy, enemy_attacks)
+
+
+def _needs_move_generator(own: np.ndarray, enemy: np.ndarray, batch: PositionBatch, checkers: np.ndarray) -> np.ndarray:
+    """
+    Helper function to find the positions the vectorized count can not handle.
+    These are positions in check, with an en passant square, or with an own figure
+    between the king and an enemy range figure that could be pinned.
+
+    Returns:
+        np.ndarray: N booleans
+    """
+    king = own[:, KING]
+    # own figures are looked through, only enemy figures block the view of the king
+    enemy_occupancy = np.bitwise_or.reduce(enemy, axis=1)
+    through_own = ~enemy_occupancy
+
+    x_ray = np.zeros(len(own), dtype=np.uint64)
+    for direction in ROOK_DIRECTIONS:
+        x_ray |= _ray_attacks(king, through_own, direction) & (enemy[:, ROOK] | enemy[:, QUEEN])
+    for direction in BISHOP_DIRECTIONS:
+        x_ray |= _ray_attacks(king, through_own, direction) & (enemy[:, BISHOP] | enemy[:, QUEEN])
+
+    # range figures that see the king directly give check and are caught by the checkers
+    return (checkers != 0) | (batch.en_passant != 0) | (x_ray & ~checkers != 0)
+
+
+def _count_legal_moves(fen: str) -> int:
+    """
+    _count_legal_moves is the pool worker of count_legal_moves.
+
+    Args:
+        fen (str): FEN string of the position
+
+    Returns:
+        int: amount of legal moves in the position
+    """
+    return MoveGenerator(Chessboard(fen)).count_legal_moves()
+
+
+def count_legal_moves(batch: PositionBatch, processes: Optional[int] = 1) -> np.ndarray:
+    """
+    count_legal_moves counts the legal moves of the side to move.
+    Positions with checks, pins or en passant are counted by the move generator.
+
+    Args:
+        batch (PositionBatch): positions to analyse
+        processes (int, optional): size of the process pool for the move generator, 1 counts in this process, None uses every CPU. Defaults to 1.
+
+    Returns:
+        np.ndarray: N move counts
+    """
+    own, enemy = _sides(batch)
+    occupied = np.bitwise_or.reduce(batch.bitboards, axis=1)
+    color = batch.color_to_move
+
+    # the king must not hide behind itself from range figures
+    enemy_attacks = _attacks_of(enemy, color ^ 1, occupied & ~own[:, KING])
+    counts = _count_moves(batch, own, enemy, enemy_attacks)
+
+    checkers = _checkers(own, enemy, color, occupied)
+    fallback = np.flatnonzero(_needs_move_generator(own, enemy, batch, checkers))
+    fens = [batch.fens[index] for index in fallback]
+
+    if processes == 1 or len(fens) < 2:
+        fallback_counts = [_count_legal_moves(fen) for fen in fens]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            fallback_counts = pool.map(_count_legal_moves, fens, chunksize=64)
+
+    counts[fallback] = fallback_counts
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Count moves and checks of many positions at once.")
+    parser.add_argument("file", help="FEN or EPD file with one position per line, may be gzip compressed")
+    parser.add_argument("--processes", type=int, default=1, help="size of the process pool for positions with checks or pins, 0 uses every CPU")
+    parser.add_argument("--chunk", type=int, default=65536, help="positions loaded into memory at once")
+    args = parser.parse_args()
+
+    fens = read_fens(args.file)
+    positions = 0
+    seconds = 0.0
+
+    while True:
+        chunk = list(itertools.islice(fens, args.chunk))
+        if not chunk:
+            break
+
+        start = time.perf_counter()
+        batch = load_positions(chunk)
+        checkers = count_checkers(batch)
+        counts = count_legal_moves(batch, args.processes or None)
+        seconds += time.perf_counter() - start
+        positions += len(chunk)
+
+        for fen, count, checks in zip(chunk, counts, checkers):
+            print(f"{count}\t{checks}\t{fen}")
+
+    positions_per_second = positions / seconds if seconds > 0 else float("inf")
+    print(f"{positions} positions in {seconds:.3f}s ({positions_per_second:.0f} positions/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Helpers for 64 bit occupancy masks.
+
+Bit ``idx`` of a mask stands for index ``idx`` of the squares list,
+so bit 0 is a8 and bit 63 is h1.
+"""
+from typing import Iterator, Optional
+
+PIECE_TYPES = "pnbrqk"
+PIECE_INDEX = {piece_type: idx for idx, piece_type in enumerate(PIECE_TYPES)}
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(len(PIECE_TYPES))
+
+SQUARE_MASKS = [1 << idx for idx in range(64)]
+FULL_BOARD = (1 << 64) - 1
+
+
+def popcount(mask: int) -> int:
+    """
+    popcount counts the set bits of a mask.
+
+    Args:
+        mask (int): mask to count
+
+    Returns:
+        int: amount of set squares
+    """
+    return mask.bit_count()
+
+
+def lsb(mask: int) -> int:
+    """
+    lsb returns the lowest set square of a mask.
+
+    Args:
+        mask (int): non empty mask
+
+    Returns:
+        int: index of the lowest set square
+    """
+    return (mask & -mask).bit_length() - 1
+
+
+def iterate_squares(mask: int) -> Iterator[int]:
+    """
+    iterate_squares yields every set square of a mask from low to high.
+
+    Args:
+        mask (int): mask to iterate
+
+    Yields:
+        int: index of a set square
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def square_name_to_index(square_name: str) -> Optional[int]:
+    """
+    square_name_to_index converts square name (e.g., "a1") to an index in the squares list.
+
+    Args:
+        square_name (str): square name to convert
+
+    Returns:
+        Optional[int]: index in the squares list, or None if invalid input
+    """
+    if square_name == "-":
+        return None
+
+    file_offset = ord(square_name[0]) - ord("a")
+    rank_offset = 8 - int(square_name[1])
+
+    return file_offset + 8 * rank_offset
+
+
+def index_to_square_name(index: int) -> str:
+    """
+    index_to_square_name converts an index in the squares list to a square name (e.g., "a1").
+
+    Args:
+        index (int): index in the squares list to convert
+
+    Returns:
+        str: square name corresponding to the index
+    """
+    file = chr(index % 8 + ord('a'))
+    rank = 8 - (index // 8)
+
+    return f"{file}{rank}"
@@ -0,0 +1,232 @@
+import os
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+import pygame
+
+from chessboard import Chessboard
+from constants import *
+from figures import Figure
+from move import Move
+
+
+class SquareInfo(NamedTuple):
+    x: Union[int, None]
+    y: Union[int, None]
+    piece: Union[Figure, None]
+
+
+class BoardRenderer:
+    """
+    Draws a Chessboard with pygame. The renderer listens to the board and
+    redraws the squares whenever the position changes, the board itself
+    knows nothing about the display.
+    """
+
+    def __init__(self, chessboard: Chessboard, board_surface: pygame.Surface, figure_surface: pygame.Surface) -> None:
+        """
+        Args:
+            chessboard (Chessboard): board to draw
+            board_surface (pygame.Surface): layer for the squares
+            figure_surface (pygame.Surface): layer for the figures
+        """
+        self.chessboard = chessboard
+        self.BOARD_SURFACE = board_surface
+        self.FIGURE_SURFACE = figure_surface
+        self.IMAGES = self.load_figure_images()
+
+        chessboard.add_listener(self.on_position_changed)
+        self.draw_board()
+        self.draw_figures_on_board()
+
+
+    def on_position_changed(self, chessboard: Chessboard) -> None:
+        """
+        on_position_changed clears the highlighted squares after a move, undo or redo.
+
+        Args:
+            chessboard (Chessboard): board that changed
+        """
+        self.draw_board()
+
+
+    def draw_board(self) -> None:
+        """
+        Draw the chessboard with alternating colors for the squares.
+        """
+
+        # Iterate through each square on the chessboard
+        for row in range(8):
+            for col in range(8):
+
+                # Determine the color of the square based on its position
+                color = self._get_square_color(row, col)
+
+                # Draw the square with the determined color
+                self.draw_tile(color, col, row)
+
+        # Update the display to show the drawn chessboard
+        pygame.display.update()
+
+
+    def _get_square_color(self, row: int, col: int) -> Tuple[int, int, int]:
+        """
+        Helper function to get the color of a square on the chessboard.
+
+        Args:
+            row (int): The row number of the square (0-7).
+            col (int): The column number of the square (0-7).
+
+        Returns:
+            Tuple[int, int, int]: The RGB color of the square.
+        """
+        if (row + col) % 2 != 0:
+            return COLOR_BLACK
+        else:
+            return COLOR_WHITE
+
+
+    def draw_tile(self, color: str, cord_y: int, cord_x: int) -> None:
+        """
+        draw_tile draws a single colored rectangle.
+
+        Args:
+            color (str): color of the rectangle
+            cord_y (int): y-coordinate of the rectangle (0-7)
+            cord_x (int): x-coordinate of the rectangle (0-7)
+        """
+        pygame.draw.rect(self.BOARD_SURFACE, color, [SQUARE_SIZE*cord_x, SQUARE_SIZE*cord_y, SQUARE_SIZE, SQUARE_SIZE])
+
+
+    def load_figure_images(self) -> Dict[str, pygame.Surface]:
+        """
+        Load all figure images into a dictionary.
+
+        Returns:
+            dict: Dictionary containing an image for each figure.
+        """
+        images_directory = "./images"
+        images = {}
+
+        try:
+            filenames = next(os.walk(images_directory), (None, None, []))[2]  # [] if no file
+        except StopIteration:
+            raise FileNotFoundError(f"No files found in the images directory: {images_directory}")
+
+        for filename in filenames:
+            path = os.path.join(images_directory, filename)
+
+            # Load the image, scale it, and add it to the images dictionary
+            img = self._load_and_scale_image(path)
+            images[filename] = img
+
+        return images
+
+
+    def _load_and_scale_image(self, path: str) -> pygame.Surface:
+        """
+        Helper function to load an image and scale it to the desired size.
+
+        Args:
+            path (str): Path of the image file to load.
+
+        Returns:
+            pygame.Surface: Scaled image surface.
+        """
+        img = pygame.image.load(path)
+        img = pygame.transform.scale(img, (SQUARE_SIZE, SQUARE_SIZE))
+
+        return img
+
+
+    def draw_figure(self, cord_x: int, cord_y: int, figure: Figure) -> None:
+        """
+        draw_figure draws a single figure.
+
+        Args:
+            cord_x (int): x position to draw
+            cord_y (int): y position to draw
+            figure (Figure): figure to draw
+        """
+        rec = pygame.Rect(cord_x,cord_y,SQUARE_SIZE,SQUARE_SIZE)
+        self.FIGURE_SURFACE.blit(self.IMAGES[figure.NAME], rec)
+
+
+    def draw_figures_on_board(self) -> None:
+        """
+        Draw all the figures on the chessboard and update the display.
+        """
+        for idx, figure in enumerate(self.chessboard.squares):
+            # Skip empty squares
+            if figure is None:
+                continue
+
+            # Calculate the file (column) and rank (row) for the current index
+            file = idx % 8
+            rank = idx // 8
+
+            # Calculate the x and y coordinates for the figure on the board
+            coord_x = file * SQUARE_SIZE
+            coord_y = rank * SQUARE_SIZE
+
+            # Draw the figure at the calculated coordinates
+            self.draw_figure(coord_x, coord_y, figure)
+
+        # Update the display
+        pygame.display.update()
+
+
+    def get_square_under_mouse(self) -> SquareInfo:
+        """
+        Get the x, y position of the mouse and the piece underneath.
+
+        Returns:
+            SquareInfo: NamedTuple containing x, y coordinates and the piece under the mouse
+        """
+        mouse_pos = pygame.Vector2(pygame.mouse.get_pos())
+        pos_x, pos_y = [int(v // SQUARE_SIZE) for v in mouse_pos]
+
+        if 0 <= pos_x < 8 and 0 <= pos_y < 8:
+            return SquareInfo(x=pos_x, y=pos_y, piece=self.chessboard.figure_at(pos_y * 8 + pos_x))
+
+        return SquareInfo(x=None, y=None, piece=None)
+
+
+    def draw_drag(self, figure: Optional[Figure]) -> None:
+        """
+        draw_drag draws the figure being dragged by the mouse.
+
+        Args:
+            figure (Figure): figure to draw while dragging
+        """
+        if figure is None:
+            return
+
+        # Get the current mouse position as a 2D vector
+        mouse_position = pygame.Vector2(pygame.mouse.get_pos())
+
+        # Calculate the drawing position by subtracting half the square size
+        draw_position_x = mouse_position[0] - 0.5 * SQUARE_SIZE
+        draw_position_y = mouse_position[1] - 0.5 * SQUARE_SIZE
+
+        # Draw the figure at the calculated position
+        self.draw_figure(draw_position_x, draw_position_y, figure)
+
+
+    def draw_valid_moves(self, moves: Optional[List[Move]]) -> None:
+        """
+        draw_valid_moves draws the given valid moves of a figure.
+
+        Args:
+            moves (List[Move]): valid moves of the selected figure
+        """
+        if not moves:
+            return
+
+        # Iterate through all valid moves for the given figure
+        for move in moves:
+            # Calculate the rank (row) and file (column) for the end square of the move
+            rank = int(move.END_SQUARE / 8)
+            file = move.END_SQUARE % 8
+
+            # Draw a tile with a distinct color to indicate a valid move
+            self.draw_tile("#90ee90", rank, file)
@@ -1,467 +1,545 @@
-from typing import Tuple, List, Optional, Dict, NamedTuple, Union
+from typing import Callable, Tuple, List, Optional, NamedTuple
 from constants import *
-import pygame
 from figures import *
-import os
-import copy
-
-
-class SquareInfo(NamedTuple):
-    x: Union[int, None]
-    y: Union[int, None]
-    piece: Union[Figure, None]
+from move import Move, DOUBLE_PAWN_PUSH, KING_CASTLE, QUEEN_CASTLE, CAPTURE, EN_PASSANT, PROMOTION, PROMOTION_FIGURES
+from bitboard import PIECE_INDEX, PAWN, KING, lsb, square_name_to_index, index_to_square_name
+from fen import parse_fen, format_fen
+from moveGenerator import calculateAttackMask
+from zobrist import PIECE_KEYS, SIDE_KEY, castle_key, en_passant_key, compute_hash
+from pieceSquareTables import MIDGAME_TABLES, ENDGAME_TABLES, PHASE_WEIGHTS, score_bitboards
+
+
+class UndoRecord(NamedTuple):
+    code: int
+    captured: Optional[Figure]
+    castle_right: str
+    en_passant_square: str
+    half_moves: int
+    game_turn: int
+    zobrist_key: int
 
 #NW, NE, SW, SE, WN, WS, EN, ES
 SQUAREOFFSET_KNIGHT = [-17, -15, 15, 17, -10, 6, -6, 10]
 
+#castle rights that are lost as soon as a figure leaves or enters the square
+CASTLE_RIGHTS_BY_SQUARE = {60: "KQ", 63: "K", 56: "Q", 4: "kq", 7: "k", 0: "q"}
+
+#king source, king destination, rook source, rook destination
+CASTLING_MOVES = {
+    "K": ("e1", "g1", "h1", "f1"),
+    "Q": ("e1", "c1", "a1", "d1"),
+    "k": ("e8", "g8", "h8", "f8"),
+    "q": ("e8", "c8", "a8", "d8"),
+}
+
 class Chessboard:
-    def __init__(self, board_surface: pygame.Surface, figure_surface: pygame.Surface, fen: str = STARTFEN) -> None:
-        self.BOARD_SURFACE = board_surface
-        self.FIGURE_SURFACE = figure_surface
-        self.IMAGES = self.load_figure_images()
+    """
+    Rules and state of a chess position. The board does not draw itself,
+    a renderer (see boardRenderer.BoardRenderer) registers as listener and
+    is told whenever the position changes.
+    """
+
+    def __init__(self, fen: str = STARTFEN) -> None:
+        """
+        Args:
+            fen (str, optional): FEN string with the start position. Defaults to STARTFEN.
+        """
+        self.listeners: List[Callable[["Chessboard"], None]] = []
         self.color_to_move = 0b0
         self.castle_right = "KQkq"
         self.en_passant_square = "-"
         self.half_moves = 0
         self.game_turn = 1
-        self.saved_state = None
+        self.zobrist_key = 0
+        # sums of pieceSquareTables per color, kept up to date like the Zobrist key
+        self.midgame_scores = [0, 0]
+        self.endgame_scores = [0, 0]
+        self.phase = 0
+        # optional first layer of a neural evaluation, see nnue.Accumulator
+        self.accumulator = None
+        self.king_squares: List[Optional[int]] = [None, None]
+        self.version = 0
+        self._attack_maps = [None, None]
+        self._attack_maps_version = None
+        self.move_stack: List[UndoRecord] = []
+        self.redo_stack: List[int] = []
         self.create_board(fen)
 
 
-    def save_state(self) -> None:
+    def add_listener(self, listener: Callable[["Chessboard"], None]) -> None:
         """
-        saves the current state of the game
+        add_listener registers a function that is called with the board after every
+        move, undo, redo and new position. Moves played by searches through
+        make_packed_move and unmake_packed_move are not reported.
+
+        Args:
+            listener (Callable[[Chessboard], None]): function to call
         """
-        state = {
-            'color_to_move': self.color_to_move,
-            'castle_right': self.castle_right,
-            'en_passant_square': self.en_passant_square,
-            'squares': copy.deepcopy(self.squares),
-            'saved_state': copy.deepcopy(self.saved_state)
-        }
-        self.saved_state = state
+        self.listeners.append(listener)
 
 
-    def restore_state(self) -> None:
+    def remove_listener(self, listener: Callable[["Chessboard"], None]) -> None:
         """
-        loads the game from its previous version
+        remove_listener unregisters a function added with add_listener.
+
+        Args:
+            listener (Callable[[Chessboard], None]): function to remove
         """
-        if self.saved_state:
-            self.color_to_move = self.saved_state['color_to_move']
-            self.castle_right = self.saved_state['castle_right']
-            self.en_passant_square = self.saved_state['en_passant_square']
-            self.squares = self.saved_state['squares']
-            self.saved_state = self.saved_state['saved_state']
-        else:
-            print("No saved state available.")
+        self.listeners.remove(listener)
 
 
-    def undo_move(self) -> None:
+    def _notify_listeners(self) -> None:
         """
-        undos the last move and restores the version before the previous version of the game
+        Helper function to tell the listeners that the position changed.
         """
-        self.restore_state()
-        self.restore_state()
+        for listener in self.listeners:
+            listener(self)
 
 
-    def make_move(self, move: Move) -> None:
-        self.save_state()
-        if move.FIGURE.COLOR == 0b1:
-            self.game_turn += 1
-        self.color_to_move = self.color_to_move ^ 0b1
-        self.en_passant_square = move.EN_PASSANT_SQUARE
+    @property
+    def squares(self) -> Tuple[Optional[Figure], ...]:
+        """
+        read-only view of the board as 64 squares, index 0 is a8 and 63 is h1.
+        The position itself is stored in the bitboards.
+        """
+        return tuple(self._squares)
 
-        if move.CAPTURE is not None:
-            self.squares[move.CAPTURE] = None
-            self.half_moves = 0
-        elif move.FIGURE.TYPE == "p":
-            self.half_moves = 0
-        else:
-            self.half_moves += 1
 
-        if move.IS_CASTLE:
-            self.castle(move.CASTLE_TYPE)
-            self.generate_fen_from_current_position()
-            return
+    @property
+    def occupied(self) -> int:
+        """
+        mask of all occupied squares
+        """
+        return self.occupancy[0] | self.occupancy[1]
 
 
-        self.squares[move.START_SQUARE] = None
+    def attack_map(self, color: int) -> int:
+        """
+        attack_map returns the mask of all squares a color attacks in the current position.
+        The map is computed on first use and kept until the position version changes.
 
-        if move.IS_PROMOTION:
-            self.squares[move.END_SQUARE] = move.PROMOTION_PIECE
-        else:
-            self.squares[move.END_SQUARE] = move.FIGURE
-            self.squares[move.END_SQUARE].has_moved = True
+        Args:
+            color (int): color of the attacking figures
 
+        Returns:
+            int: attacked squares
+        """
+        if self._attack_maps_version != self.version:
+            self._attack_maps = [None, None]
+            self._attack_maps_version = self.version
 
-    def _move_castle_pieces(self, king_src: str, king_dst: str, rook_src: str, rook_dst: str) -> None:
+        attacked = self._attack_maps[color]
+        if attacked is None:
+            attacked = calculateAttackMask(self.bitboards[color], color, self.occupied)
+            self._attack_maps[color] = attacked
+        return attacked
+
+
+    def is_attacked(self, square: int, color: int) -> bool:
         """
-        Helper function to move the king and rook during castling.
+        is_attacked checks whether a square is attacked by a color in the current position.
 
         Args:
-            king_src (str): The source square of the king.
-            king_dst (str): The destination square of the king.
-            rook_src (str): The source square of the rook.
-            rook_dst (str): The destination square of the rook.
+            square (int): square to check
+            color (int): color of the attacking figures
+
+        Returns:
+            bool: True if a figure of the color attacks the square
         """
-        king = self.squares[square_name_to_index(king_src)]
-        rook = self.squares[square_name_to_index(rook_src)]
+        return bool(self.attack_map(color) >> square & 1)
 
-        self.squares[square_name_to_index(king_dst)] = king
-        self.squares[square_name_to_index(rook_dst)] = rook
-        self.squares[square_name_to_index(king_dst)].has_moved = True
-        self.squares[square_name_to_index(rook_dst)].has_moved = True
-        self.squares[square_name_to_index(king_src)] = None
-        self.squares[square_name_to_index(rook_src)] = None
-        
 
-    def castle(self, type: str) -> None:
+    def figure_at(self, square: int) -> Optional[Figure]:
         """
-        castle updates the board position for the given castling type.
+        figure_at returns the figure on a single square without copying the board.
 
         Args:
-            type (str): the type of castling ("K", "Q", "k", or "q")
+            square (int): square index, 0 is a8 and 63 is h1
+
+        Returns:
+            Optional[Figure]: figure on the square, None for an empty square
         """
-        if type not in self.castle_right:
-            return
+        return self._squares[square]
 
-        castling_moves = {
-            "K": ("e1", "g1", "h1", "f1"),
-            "Q": ("e1", "c1", "a1", "d1"),
-            "k": ("e8", "g8", "h8", "f8"),
-            "q": ("e8", "c8", "a8", "d8"),
-        }
 
-        king_src, king_dst, rook_src, rook_dst = castling_moves[type]
-        self._move_castle_pieces(king_src, king_dst, rook_src, rook_dst)
-        if type.islower():
-            self.castle_right = self.castle_right.replace("k", "")
-            self.castle_right = self.castle_right.replace("q", "")
-        else:
-            self.castle_right = self.castle_right.replace("K", "")
-            self.castle_right = self.castle_right.replace("Q", "")
+    def _place_piece(self, square: int, figure: Figure) -> None:
+        """
+        Helper function to put a figure on a square and update the bitboards.
 
-        if self.castle_right == "":
-            self.castle_right = "-"
+        Args:
+            square (int): square to put the figure on
+            figure (Figure): figure to put on the square
+        """
+        self._remove_piece(square)
+        mask = 1 << square
+        piece_index = PIECE_INDEX[figure.TYPE]
+        self._squares[square] = figure
+        self.bitboards[figure.COLOR][piece_index] |= mask
+        self.occupancy[figure.COLOR] |= mask
+        self.zobrist_key ^= PIECE_KEYS[figure.COLOR][piece_index][square]
+        self.midgame_scores[figure.COLOR] += MIDGAME_TABLES[figure.COLOR][piece_index][square]
+        self.endgame_scores[figure.COLOR] += ENDGAME_TABLES[figure.COLOR][piece_index][square]
+        self.phase += PHASE_WEIGHTS[piece_index]
+        if piece_index == KING:
+            self.king_squares[figure.COLOR] = square
+        if self.accumulator is not None:
+            self.accumulator.add_piece(square, figure.COLOR, piece_index)
 
 
-    def create_board(self, fen: str) -> None:
+    def _remove_piece(self, square: int) -> None:
         """
-        create_board creates a board from a FEN string.
+        Helper function to clear a square and update the bitboards.
 
         Args:
-            fen (str): FEN string with board position
+            square (int): square to clear
         """
-        self.draw_board()
-        self.squares = self.loadPositionFromFenString(fen)
-        self.draw_figures_on_board()
+        figure = self._squares[square]
+        if figure is None:
+            return
+        mask = ~(1 << square)
+        piece_index = PIECE_INDEX[figure.TYPE]
+        self._squares[square] = None
+        self.bitboards[figure.COLOR][piece_index] &= mask
+        self.occupancy[figure.COLOR] &= mask
+        self.zobrist_key ^= PIECE_KEYS[figure.COLOR][piece_index][square]
+        self.midgame_scores[figure.COLOR] -= MIDGAME_TABLES[figure.COLOR][piece_index][square]
+        self.endgame_scores[figure.COLOR] -= ENDGAME_TABLES[figure.COLOR][piece_index][square]
+        self.phase -= PHASE_WEIGHTS[piece_index]
+        if piece_index == KING and self.king_squares[figure.COLOR] == square:
+            self.king_squares[figure.COLOR] = None
+        if self.accumulator is not None:
+            self.accumulator.remove_piece(square, figure.COLOR, piece_index)
 
 
-    def draw_board(self) -> None:
+    def _position_changed(self) -> None:
         """
-        Draw the chessboard with alternating colors for the squares.
+        Helper function to give the position a new version, so caches built for the old one are dropped.
+        Versions only count up, a position reached again by undo gets a new version as well.
         """
+        self.version += 1
 
-        # Iterate through each square on the chessboard
-        for row in range(8):
-            for col in range(8):
 
-                # Determine the color of the square based on its position
-                color = self._get_square_color(row, col)
-
-                # Draw the square with the determined color
-                self.draw_tile(color, col, row)
+    def _set_castle_right(self, castle_right: str) -> None:
+        """
+        Helper function to change the castle rights and their part of the Zobrist key.
 
-        # Update the display to show the drawn chessboard
-        pygame.display.update()
+        Args:
+            castle_right (str): new castle rights in FEN notation
+        """
+        if castle_right == "":
+            castle_right = "-"
+        self.zobrist_key ^= castle_key(self.castle_right) ^ castle_key(castle_right)
+        self.castle_right = castle_right
 
 
-    def _get_square_color(self, row: int, col: int) -> Tuple[int, int, int]:
+    def _set_en_passant_square(self, en_passant_square: str) -> None:
         """
-        Helper function to get the color of a square on the chessboard.
+        Helper function to change the en passant square and its part of the Zobrist key. The key
+        depends on the pawns of the color to move, so the square is cleared before the color
+        changes and set afterwards.
 
         Args:
-            row (int): The row number of the square (0-7).
-            col (int): The column number of the square (0-7).
-
-        Returns:
-            Tuple[int, int, int]: The RGB color of the square.
+            en_passant_square (str): new en passant square in FEN notation
         """
-        if (row + col) % 2 != 0:
-            return COLOR_BLACK
-        else:
-            return COLOR_WHITE
+        color = self.color_to_move
+        self.zobrist_key ^= en_passant_key(self.en_passant_square, color, self.bitboards) \
+            ^ en_passant_key(en_passant_square, color, self.bitboards)
+        self.en_passant_square = en_passant_square
 
 
-    def draw_tile(self, color: str, cord_y: int, cord_x: int) -> None:
+    def undo_move(self, plies: int = 2) -> None:
         """
-        draw_tile draws a single colored rectangle.
+        undos the last moves, by default the last move of both players
 
         Args:
-            color (str): color of the rectangle
-            cord_y (int): y-coordinate of the rectangle (0-7)
-            cord_x (int): x-coordinate of the rectangle (0-7)
+            plies (int, optional): amount of half moves to take back. Defaults to 2.
         """
-        pygame.draw.rect(self.BOARD_SURFACE, color, [SQUARE_SIZE*cord_x, SQUARE_SIZE*cord_y, SQUARE_SIZE, SQUARE_SIZE])
+        for _ in range(plies):
+            self.unmake_packed_move()
+        self._notify_listeners()
 
 
-    def load_figure_images(self) -> Dict[str, pygame.Surface]:
+    def redo_move(self, plies: int = 2) -> None:
         """
-        Load all figure images into a dictionary.
+        plays the last undone moves again, by default the last move of both players
 
-        Returns:
-            dict: Dictionary containing an image for each figure.
+        Args:
+            plies (int, optional): amount of half moves to play again. Defaults to 2.
         """
-        images_directory = "./images"
-        images = {}
+        for _ in range(plies):
+            if not self.redo_stack:
+                print("No undone move available.")
+                break
+            self._apply_move(self.redo_stack.pop())
+        self._notify_listeners()
 
-        try:
-            filenames = next(os.walk(images_directory), (None, None, []))[2]  # [] if no file
-        except StopIteration:
-            raise FileNotFoundError(f"No files found in the images directory: {images_directory}")
 
-        for filename in filenames:
-            path = os.path.join(images_directory, filename)
+    def make_move(self, move: Move) -> None:
+        """
+        make_move plays a move on the board and remembers how to take it back.
+        Any undone moves can not be redone afterwards.
 
-            # Load the image, scale it, and add it to the images dictionary
-            img = self._load_and_scale_image(path)
-            images[filename] = img
+        Args:
+            move (Move): move to play
+        """
+        self.make_packed_move(move.code)
+        self._notify_listeners()
 
-        return images
 
+    def make_packed_move(self, code: int) -> None:
+        """
+        make_packed_move plays a packed move (see move.encode_move) without creating a Move object.
+        Any undone moves can not be redone afterwards.
 
-    def _load_and_scale_image(self, path: str) -> pygame.Surface:
+        Args:
+            code (int): packed move to play
         """
-        Helper function to load an image and scale it to the desired size.
+        self.redo_stack.clear()
+        self._apply_move(code)
+
+
+    def _capture_square(self, code: int, color: int) -> Optional[int]:
+        """
+        Helper function to find the square of the figure a packed move captures.
 
         Args:
-            path (str): Path of the image file to load.
+            code (int): packed move
+            color (int): color of the moving figure
 
         Returns:
-            pygame.Surface: Scaled image surface.
+            Optional[int]: square of the captured figure, None for moves without capture
         """
-        img = pygame.image.load(path)
-        img = pygame.transform.scale(img, (SQUARE_SIZE, SQUARE_SIZE))
-
-        return img
+        flags = code >> 12
+        if flags == EN_PASSANT:
+            return (code >> 6 & 63) + (8 if color == 0b0 else -8)
+        if flags & CAPTURE:
+            return code >> 6 & 63
+        return None
 
 
-    def draw_figure(self, cord_x: int, cord_y: int, figure: Figure) -> None:
+    def _apply_move(self, code: int) -> None:
         """
-        draw_figure draws a single figure.
+        Helper function to update the board in place for a packed move and push its undo record.
 
         Args:
-            cord_x (int): x position to draw
-            cord_y (int): y position to draw
-            figure (Figure): figure to draw
+            code (int): packed move to play
         """
-        rec = pygame.Rect(cord_x,cord_y,SQUARE_SIZE,SQUARE_SIZE)
-        self.FIGURE_SURFACE.blit(self.IMAGES[figure.NAME], rec)
+        start_square = code & 63
+        end_square = code >> 6 & 63
+        flags = code >> 12
+        figure = self._squares[start_square]
+        color = figure.COLOR
 
+        capture_square = self._capture_square(code, color)
+        captured = self._squares[capture_square] if capture_square is not None else None
 
-    def draw_figures_on_board(self) -> None:
-        """
-        Draw all the figures on the chessboard and update the display.
-        """
-        for idx, figure in enumerate(self.squares):
-            # Skip empty squares
-            if figure is None:
-                continue
+        self.move_stack.append(UndoRecord(
+            code, captured, self.castle_right, self.en_passant_square,
+            self.half_moves, self.game_turn, self.zobrist_key
+        ))
+        if self.accumulator is not None:
+            self.accumulator.push()
 
-            # Calculate the file (column) and rank (row) for the current index
-            file = idx % 8
-            rank = idx // 8
+        if color == 0b1:
+            self.game_turn += 1
+        self._set_en_passant_square("-")
+        self.color_to_move = self.color_to_move ^ 0b1
+        self.zobrist_key ^= SIDE_KEY
+        if flags == DOUBLE_PAWN_PUSH:
+            # the push does not move the pawns that could capture, so the key is right before the pawn moves
+            self._set_en_passant_square(index_to_square_name((start_square + end_square) // 2))
 
-            # Calculate the x and y coordinates for the figure on the board
-            coord_x = file * SQUARE_SIZE
-            coord_y = rank * SQUARE_SIZE
+        if capture_square is not None:
+            self._remove_piece(capture_square)
+            self.half_moves = 0
+        elif figure.TYPE == "p":
+            self.half_moves = 0
+        else:
+            self.half_moves += 1
 
-            # Draw the figure at the calculated coordinates
-            self.draw_figure(coord_x, coord_y, figure)
+        if flags == KING_CASTLE or flags == QUEEN_CASTLE:
+            castle_type = "K" if flags == KING_CASTLE else "Q"
+            self.castle(castle_type if color == 0b0 else castle_type.lower())
+            return
 
-        # Update the display
-        pygame.display.update()
 
+        self._remove_piece(start_square)
+
+        if flags & PROMOTION:
+            self._place_piece(end_square, PROMOTION_FIGURES[flags & 3](color))
+        else:
+            self._place_piece(end_square, figure)
 
-    def get_square_under_mouse(self) -> SquareInfo:
+        self.update_castle_rights(start_square, end_square)
+        self._position_changed()
+
+
+    def unmake_move(self) -> Optional[Move]:
         """
-        Get the x, y position of the mouse and the piece underneath.
+        unmake_move takes back the last move in place using its undo record.
 
         Returns:
-            SquareInfo: NamedTuple containing x, y coordinates and the piece under the mouse
+            Optional[Move]: the move taken back, None if no move was played
         """
-        mouse_pos = pygame.Vector2(pygame.mouse.get_pos())
-        pos_x, pos_y = [int(v // SQUARE_SIZE) for v in mouse_pos]
-
-        if 0 <= pos_x < 8 and 0 <= pos_y < 8:
-            return SquareInfo(x=pos_x, y=pos_y, piece=self.squares[pos_y * 8 + pos_x])
-
-        return SquareInfo(x=None, y=None, piece=None)
+        code = self.unmake_packed_move()
+        if code is None:
+            return None
+        return Move.from_code(self._squares[code & 63], code)
 
 
-    def draw_drag(self, figure: Optional[Figure]) -> None:
+    def unmake_packed_move(self) -> Optional[int]:
         """
-        draw_drag draws the figure being dragged by the mouse.
+        unmake_packed_move takes back the last move in place using its undo record.
 
-        Args:
-            figure (Figure): figure to draw while dragging
-        """
-        if figure is None:
-            return
+        Returns:
+            Optional[int]: the packed move taken back, None if no move was played
+        """
+        if not self.move_stack:
+            print("No move to undo available.")
+            return None
+
+        record = self.move_stack.pop()
+        code = record.code
+        start_square = code & 63
+        end_square = code >> 6 & 63
+        flags = code >> 12
+        color = self.color_to_move ^ 0b1
+
+        if flags == KING_CASTLE or flags == QUEEN_CASTLE:
+            castle_type = "K" if flags == KING_CASTLE else "Q"
+            king_src, king_dst, rook_src, rook_dst = CASTLING_MOVES[castle_type if color == 0b0 else castle_type.lower()]
+            self._move_castle_pieces(king_dst, king_src, rook_dst, rook_src)
+        else:
+            figure = self._squares[end_square]
+            if flags & PROMOTION:
+                figure = FIGURES[color][PAWN]
+            self._remove_piece(end_square)
+            self._place_piece(start_square, figure)
 
-        # Get the current mouse position as a 2D vector
-        mouse_position = pygame.Vector2(pygame.mouse.get_pos())
+        if record.captured is not None:
+            self._place_piece(self._capture_square(code, color), record.captured)
 
-        # Calculate the drawing position by subtracting half the square size
-        draw_position_x = mouse_position[0] - 0.5 * SQUARE_SIZE
-        draw_position_y = mouse_position[1] - 0.5 * SQUARE_SIZE
+        self.color_to_move = color
+        self.castle_right = record.castle_right
+        self.en_passant_square = record.en_passant_square
+        self.half_moves = record.half_moves
+        self.game_turn = record.game_turn
+        self.zobrist_key = record.zobrist_key
+        if self.accumulator is not None:
+            # the accumulator before the move is restored, the updates made while taking it back are dropped
+            self.accumulator.pop()
+        self._position_changed()
 
-        # Draw the figure at the calculated position
-        self.draw_figure(draw_position_x, draw_position_y, figure)
+        self.redo_stack.append(code)
+        return code
 
 
-    def draw_valid_moves(self, figure: Optional[Figure]) -> None:
+    def update_castle_rights(self, start_square: int, end_square: int) -> None:
         """
-        draw_valid_moves draws the valid moves for the given figure.
+        removes the castle rights of a king or rook that moved or got captured.
 
         Args:
-            figure (Figure): figure for which to draw valid moves
+            start_square (int): square the figure left
+            end_square (int): square the figure moved to
         """
-        if figure is None:
+        lost_rights = CASTLE_RIGHTS_BY_SQUARE.get(start_square, "") + CASTLE_RIGHTS_BY_SQUARE.get(end_square, "")
+        if not lost_rights:
             return
 
-        # Iterate through all valid moves for the given figure
-        for move in figure.moves:
-            # Calculate the rank (row) and file (column) for the end square of the move
-            rank = int(move.END_SQUARE / 8)
-            file = move.END_SQUARE % 8
+        castle_right = self.castle_right
+        for castle_type in lost_rights:
+            castle_right = castle_right.replace(castle_type, "")
 
-            # Draw a tile with a distinct color to indicate a valid move
-            self.draw_tile("#90ee90", rank, file)
+        self._set_castle_right(castle_right)
 
 
-    def loadPositionFromFenString(self, fen: str) -> List[Optional[Figure]]:
+    def _move_castle_pieces(self, king_src: str, king_dst: str, rook_src: str, rook_dst: str) -> None:
         """
-        loadPositionFromFenString loads the position from a FEN string.
+        Helper function to move the king and rook during castling.
 
         Args:
-            fen (str): FEN string with board position
-
-        Returns:
-            List[Optional[Figure]]: list of figures on the board
+            king_src (str): The source square of the king.
+            king_dst (str): The destination square of the king.
+            rook_src (str): The source square of the rook.
+            rook_dst (str): The destination square of the rook.
         """
-        symbol_to_piece = {
-            "p": Pawn,
-            "r": Rook,
-            "n": Knight,
-            "b": Bishop,
-            "q": Queen,
-            "k": King
-        }
-
-        chessboard_squares = [None for _ in range(64)]
-
-        rank = 0
-        file = 0
-
-        position_info = fen.split(" ")
-        position = position_info[0]
-
-        for symbol in position:
-            if symbol == "/":
-                file = 0
-                rank += 1
-                continue
-
-            if symbol.isnumeric():
-                file += int(symbol)
-            else:
-                color = 0b1 if symbol.islower() else 0b0
-                piece = symbol_to_piece[symbol.lower()](color)
-                chessboard_squares[rank * 8 + file] = piece
-                file += 1
-
-        self.color_to_move = 0b0 if position_info[1] == "w" else 0b1
-        self.castle_right = position_info[2]
-        self.en_passant_square = position_info[3]
-
-        return chessboard_squares
-    
-    # "2k5/8/4br3/8/8/8/8/2K5 w KQkq - 0 1"
-    # "2k5/8/4br2/8/8/8/2K5/
-    def generate_fen_from_current_position(self) -> str:
-        position = self.squares
-        fen_string = ""
-
-        empty_square_count = 0
-        for idx,figure in enumerate(position):
-            if idx % 8 == 0 and idx > 0:
-                if empty_square_count > 0:
-                    fen_string += str(empty_square_count)
-                    empty_square_count = 0
-                fen_string += "/"
-
-            if figure is None:
-                empty_square_count += 1
-                continue
-
-            if figure.COLOR == 0b0:
-                figure_name = figure.TYPE.upper()
-            else:
-                figure_name = figure.TYPE
-            
-            if empty_square_count > 0:
-                fen_string += str(empty_square_count)
-            fen_string += figure_name
-            empty_square_count = 0
-        
-        if empty_square_count > 0:
-            fen_string += str(empty_square_count)
-        
-        if self.color_to_move == 0b0:
-            fen_string += " w"
-        else:
-            fen_string += " b"
-        
-        fen_string += f" {self.castle_right} {self.en_passant_square} {self.half_moves} {self.game_turn}"
+        king = self._squares[square_name_to_index(king_src)]
+        rook = self._squares[square_name_to_index(rook_src)]
 
-        return fen_string
-            
+        self._remove_piece(square_name_to_index(king_src))
+        self._remove_piece(square_name_to_index(rook_src))
+        self._place_piece(square_name_to_index(king_dst), king)
+        self._place_piece(square_name_to_index(rook_dst), rook)
+        
 
+    def castle(self, type: str) -> None:
+        """
+        castle updates the board position for the given castling type.
 
+        Args:
+            type (str): the type of castling ("K", "Q", "k", or "q")
+        """
+        if type not in self.castle_right:
+            return
 
+        king_src, king_dst, rook_src, rook_dst = CASTLING_MOVES[type]
+        self._move_castle_pieces(king_src, king_dst, rook_src, rook_dst)
+        if type.islower():
+            self._set_castle_right(self.castle_right.replace("k", "").replace("q", ""))
+        else:
+            self._set_castle_right(self.castle_right.replace("K", "").replace("Q", ""))
+        self._position_changed()
 
 
-def square_name_to_index(square_name: str) -> Optional[int]:
-    """
-    square_name_to_index converts square name (e.g., "a1") to an index in the squares list.
+    def create_board(self, fen: str) -> None:
+        """
+        create_board creates a board from a FEN string, the moves played before are forgotten.
 
-    Args:
-        square_name (str): square name to convert
+        Args:
+            fen (str): FEN string with board position
+        """
+        self.start_fen = fen
+        self.move_stack.clear()
+        self.redo_stack.clear()
+        self._squares = self.loadPositionFromFenString(fen)
+        self.zobrist_key = compute_hash(self.bitboards, self.color_to_move, self.castle_right, self.en_passant_square)
+        self.midgame_scores, self.endgame_scores, self.phase = score_bitboards(self.bitboards)
+        if self.accumulator is not None:
+            self.accumulator.reset()
+        self._position_changed()
+        self._notify_listeners()
 
-    Returns:
-        Optional[int]: index in the squares list, or None if invalid input
-    """
-    if square_name == "-":
-        return None
 
-    file_offset = ord(square_name[0]) - ord("a")
-    rank_offset = 8 - int(square_name[1])
+    def loadPositionFromFenString(self, fen: str) -> List[Optional[Figure]]:
+        """
+        loadPositionFromFenString loads the position from a FEN string
+        and builds the bitboards for it.
 
-    return file_offset + 8 * rank_offset
+        Args:
+            fen (str): FEN string with board position
 
+        Returns:
+            List[Optional[Figure]]: list of figures on the board
+        """
+        state = parse_fen(fen)
 
-def index_to_square_name(index: int) -> str:
-    """
-    index_to_square_name converts an index in the squares list to a square name (e.g., "a1").
+        self.bitboards = state.bitboards
+        self.occupancy = state.occupancy
+        self.king_squares = [lsb(masks[KING]) if masks[KING] else None for masks in state.bitboards]
+        self.color_to_move = state.color_to_move
+        self.castle_right = state.castle_right
+        self.en_passant_square = state.en_passant_square
+        self.half_moves = state.half_moves
+        self.game_turn = state.game_turn
 
-    Args:
-        index (int): index in the squares list to convert
+        return state.squares
 
-    Returns:
-        str: square name corresponding to the index
-    """
-    file = chr(index % 8 + ord('a'))
-    rank = 8 - (index // 8)
+    def generate_fen_from_current_position(self) -> str:
+        """
+        generate_fen_from_current_position writes the current position as FEN string.
 
-    return f"{file}{rank}"
\ No newline at end of file
+        Returns:
+            str: FEN string of the position
+        """
+        return format_fen(self._squares, self.color_to_move, self.castle_right,
+                          self.en_passant_square, self.half_moves, self.game_turn)
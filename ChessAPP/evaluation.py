@@ -0,0 +1,137 @@
+"""
+Static evaluation of chess positions for the search.
+
+Scores are in centipawns from the view of the color to move, positive
+scores are good for the side whose turn it is. Material and piece-square
+tables (see pieceSquareTables.py) are blended by the game phase from the
+middlegame to the endgame values.
+
+evaluate reads the sums the Chessboard keeps up to date on every move, so
+it costs the same for every position. evaluate_batch scores a whole
+PositionBatch with NumPy, e.g. to label datasets.
+
+Usage:
+    python evaluation.py positions.epd.gz
+    python evaluation.py positions.txt --chunk 100000 --output labels.csv
+"""
+import argparse
+import itertools
+import time
+
+import numpy as np
+
+from batch import PositionBatch, load_positions
+from bitboard import PIECE_TYPES
+from chessboard import Chessboard
+from fen import read_fens
+from pieceSquareTables import ENDGAME_TABLES, MAX_PHASE, MIDGAME_TABLES, PHASE_WEIGHTS
+
+# middlegame score, endgame score and phase weight of every figure on every square, in the order of
+# PositionBatch.bitboards with black figures counting negative. float32 lets the product run on BLAS,
+# all sums stay far below 2 ** 24 and are exact.
+BATCH_MATRIX = np.array([
+    [table[color][piece_index][square] * (1 if color == 0b0 else -1) for table in (MIDGAME_TABLES, ENDGAME_TABLES)]
+    + [PHASE_WEIGHTS[piece_index]]
+    for color in (0b0, 0b1) for piece_index in range(len(PIECE_TYPES)) for square in range(64)
+], dtype=np.float32)
+
+# positions unpacked into squares at once by evaluate_batch
+BATCH_CHUNK = 16384
+
+
+def taper(midgame: int, endgame: int, phase: int) -> int:
+    """
+    taper blends a middlegame and an endgame score by the game phase.
+
+    Args:
+        midgame (int): middlegame score
+        endgame (int): endgame score
+        phase (int): game phase, MAX_PHASE with all figures on the board, 0 with pawns and kings only
+
+    Returns:
+        int: blended score
+    """
+    phase = min(phase, MAX_PHASE)
+    return (midgame * phase + endgame * (MAX_PHASE - phase)) // MAX_PHASE
+
+
+def evaluate(chessboard: Chessboard) -> int:
+    """
+    evaluate scores the position on the board by material and piece-square tables.
+
+    Args:
+        chessboard (Chessboard): board with the position
+
+    Returns:
+        int: score in centipawns for the color to move
+    """
+    midgame_scores = chessboard.midgame_scores
+    endgame_scores = chessboard.endgame_scores
+    score = taper(midgame_scores[0] - midgame_scores[1], endgame_scores[0] - endgame_scores[1], chessboard.phase)
+    return score if chessboard.color_to_move == 0b0 else -score
+
+
+def evaluate_batch(batch: PositionBatch) -> np.ndarray:
+    """
+    evaluate_batch scores many positions at once, with the same result as evaluate for every position.
+
+    Args:
+        batch (PositionBatch): positions to score
+
+    Returns:
+        np.ndarray: int32 scores in centipawns for the color to move of every position
+    """
+    count = len(batch.bitboards)
+    scores = np.empty(count, dtype=np.int32)
+
+    for start in range(0, count, BATCH_CHUNK):
+        bitboards = np.ascontiguousarray(batch.bitboards[start:start + BATCH_CHUNK], dtype="<u8")
+        # one byte per square of every bitboard, square 0 is the lowest bit
+        squares = np.unpackbits(bitboards.view(np.uint8), axis=1, bitorder="little").astype(np.float32)
+
+        midgame, endgame, phase = (squares @ BATCH_MATRIX).astype(np.int32).T
+        phase = np.minimum(phase, MAX_PHASE)
+
+        score = (midgame * phase + endgame * (MAX_PHASE - phase)) // MAX_PHASE
+        colors = batch.color_to_move[start:start + BATCH_CHUNK]
+        scores[start:start + BATCH_CHUNK] = np.where(colors == 0, score, -score)
+
+    return scores
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Score many positions at once.")
+    parser.add_argument("file", help="FEN or EPD file with one position per line, may be gzip compressed")
+    parser.add_argument("--chunk", type=int, default=65536, help="positions loaded into memory at once")
+    parser.add_argument("--output", help="CSV file for the scores, one 'FEN,score' line per position")
+    args = parser.parse_args()
+
+    fens = read_fens(args.file)
+    output = open(args.output, "w", encoding="utf-8") if args.output else None
+    positions = 0
+    seconds = 0.0
+
+    try:
+        while True:
+            chunk = list(itertools.islice(fens, args.chunk))
+            if not chunk:
+                break
+
+            start = time.perf_counter()
+            batch = load_positions(chunk)
+            scores = evaluate_batch(batch)
+            seconds += time.perf_counter() - start
+            positions += len(chunk)
+
+            if output is not None:
+                output.writelines(f"{fen},{score}\n" for fen, score in zip(chunk, scores.tolist()))
+    finally:
+        if output is not None:
+            output.close()
+
+    positions_per_second = positions / seconds if seconds > 0 else float("inf")
+    print(f"{positions} positions in {seconds:.3f}s ({positions_per_second:.0f} positions/s)")
+
+
+if __name__ == "__main__":
+    main()
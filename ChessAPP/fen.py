@@ -0,0 +1,262 @@
+"""
+Reading and writing of FEN strings without a Chessboard or any display.
+
+parse_fen turns a FEN string into a BoardState with the shared figure
+instances and the bitboards of the position, format_fen writes a position
+back. read_positions streams the positions of FEN or EPD files line by
+line, gzip compressed files are recognised by their magic bytes.
+"""
+import gzip
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, TextIO
+
+from bitboard import PIECE_INDEX
+from constants import STARTFEN
+from figures import FIGURES, Figure
+
+
+class BoardState(NamedTuple):
+    squares: List[Optional[Figure]]
+    bitboards: List[List[int]]
+    occupancy: List[int]
+    color_to_move: int
+    castle_right: str
+    en_passant_square: str
+    half_moves: int
+    game_turn: int
+
+
+class PositionRecord(NamedTuple):
+    fen: str
+    operations: Dict[str, str]
+
+
+# FEN symbol -> color, piece index and shared figure
+SYMBOLS = {
+    symbol if color == 0b1 else symbol.upper(): (color, piece_index, FIGURES[color][piece_index])
+    for symbol, piece_index in PIECE_INDEX.items()
+    for color in (0b0, 0b1)
+}
+
+FIGURE_SYMBOLS = {figure: symbol for symbol, (_, _, figure) in SYMBOLS.items()}
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def parse_fen(fen: str = STARTFEN) -> BoardState:
+    """
+    parse_fen reads a FEN string. The move counters may be missing, as in EPD.
+
+    Args:
+        fen (str, optional): FEN string. Defaults to STARTFEN.
+
+    Raises:
+        ValueError: if the piece placement or the side to move is malformed
+
+    Returns:
+        BoardState: position described by the FEN string
+    """
+    fields = fen.split()
+    if len(fields) < 2:
+        raise ValueError(f"FEN needs at least a piece placement and a side to move: {fen!r}")
+
+    squares = [None] * 64
+    bitboards = [[0] * 6, [0] * 6]
+    occupancy = [0, 0]
+
+    ranks = fields[0].split("/")
+    if len(ranks) != 8:
+        raise ValueError(f"FEN piece placement has {len(ranks)} ranks: {fen!r}")
+
+    for rank_index, rank in enumerate(ranks):
+        # squares of the rank covered so far, a piece or digit must not run into the next rank
+        file = 0
+        for symbol in rank:
+            if "0" <= symbol <= "9":
+                if symbol == "0" or symbol == "9":
+                    raise ValueError(f"FEN digit {symbol} is not between 1 and 8: {fen!r}")
+                file += ord(symbol) - 48
+                continue
+
+            piece = SYMBOLS.get(symbol)
+            if piece is None:
+                raise ValueError(f"invalid FEN piece {symbol!r}: {fen!r}")
+            if file > 7:
+                raise ValueError(f"FEN rank {8 - rank_index} covers more than 8 squares: {fen!r}")
+            square = rank_index * 8 + file
+            color, piece_index, figure = piece
+            squares[square] = figure
+            bitboards[color][piece_index] |= 1 << square
+            occupancy[color] |= 1 << square
+            file += 1
+
+        if file != 8:
+            raise ValueError(f"FEN rank {8 - rank_index} covers {file} squares: {fen!r}")
+    if fields[1] not in ("w", "b"):
+        raise ValueError(f"invalid side to move {fields[1]!r}: {fen!r}")
+
+    castle_right = fields[2] if len(fields) > 2 else "-"
+    en_passant_square = fields[3] if len(fields) > 3 else "-"
+    half_moves = int(fields[4]) if len(fields) > 4 else 0
+    game_turn = int(fields[5]) if len(fields) > 5 else 1
+
+    return BoardState(
+        squares, bitboards, occupancy, 0b0 if fields[1] == "w" else 0b1,
+        castle_right, en_passant_square, half_moves, game_turn
+    )
+
+
+def format_placement(squares: Sequence[Optional[Figure]]) -> str:
+    """
+    format_placement writes the piece placement field of a FEN string.
+
+    Args:
+        squares (Sequence[Optional[Figure]]): figures of the 64 squares, index 0 is a8
+
+    Returns:
+        str: piece placement, e.g. "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR"
+    """
+    ranks = []
+    for rank_start in range(0, 64, 8):
+        rank = []
+        empty = 0
+        for figure in squares[rank_start:rank_start + 8]:
+            if figure is None:
+                empty += 1
+                continue
+            if empty:
+                rank.append("12345678"[empty - 1])
+                empty = 0
+            rank.append(FIGURE_SYMBOLS[figure])
+        if empty:
+            rank.append("12345678"[empty - 1])
+        ranks.append("".join(rank))
+    return "/".join(ranks)
+
+
+def format_fen(squares: Sequence[Optional[Figure]], color_to_move: int, castle_right: str = "-",
+               en_passant_square: str = "-", half_moves: int = 0, game_turn: int = 1) -> str:
+    """
+    format_fen writes a position as FEN string.
+
+    Args:
+        squares (Sequence[Optional[Figure]]): figures of the 64 squares, index 0 is a8
+        color_to_move (int): 0b0 for white, 0b1 for black
+        castle_right (str, optional): castle rights in FEN notation. Defaults to "-".
+        en_passant_square (str, optional): en passant square in FEN notation. Defaults to "-".
+        half_moves (int, optional): half moves since the last capture or pawn move. Defaults to 0.
+        game_turn (int, optional): number of the full move. Defaults to 1.
+
+    Returns:
+        str: FEN string
+    """
+    side = "w" if color_to_move == 0b0 else "b"
+    return f"{format_placement(squares)} {side} {castle_right or '-'} {en_passant_square} {half_moves} {game_turn}"
+
+
+def open_text(path: str) -> TextIO:
+    """
+    open_text opens a text file for reading, gzip compressed files are recognised by their magic bytes.
+
+    Args:
+        path (str): path of the file
+
+    Returns:
+        TextIO: the opened file
+    """
+    with open(path, "rb") as probe:
+        compressed = probe.read(2) == GZIP_MAGIC
+    if compressed:
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def _parse_operations(text: str) -> Dict[str, str]:
+    """
+    Helper function to read the operations of an EPD line, e.g. 'bm Nf3; id "test 1";'.
+    """
+    # split on semicolons outside of quoted strings, a comment like c0 "a; b"; is one operation
+    parts = []
+    part = []
+    quoted = False
+    for character in text:
+        if character == '"':
+            quoted = not quoted
+        elif character == ";" and not quoted:
+            parts.append("".join(part))
+            part = []
+            continue
+        part.append(character)
+    parts.append("".join(part))
+
+    operations = {}
+    for operation in parts:
+        operation = operation.strip()
+        if not operation:
+            continue
+        opcode, _, operand = operation.partition(" ")
+        operations[opcode] = operand.strip().strip('"')
+    return operations
+
+
+def parse_position_line(line: str) -> Optional[PositionRecord]:
+    """
+    parse_position_line reads one line of a FEN or EPD file.
+
+    EPD lines carry four position fields followed by operations, the move
+    counters are then taken from the "hmvc" and "fmvn" operations if present.
+
+    Args:
+        line (str): line of the file
+
+    Returns:
+        Optional[PositionRecord]: complete FEN string and the EPD operations, None for empty lines and comments
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+
+    fields = line.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError(f"line is neither FEN nor EPD: {line!r}")
+
+    rest = fields[4] if len(fields) > 4 else ""
+    counters = rest.split()
+    # a FEN line ends with the two move counters and nothing else
+    if len(counters) == 2 and counters[0].isdigit() and counters[1].isdigit():
+        return PositionRecord(line, {})
+
+    operations = _parse_operations(rest)
+    half_moves = operations.get("hmvc", "0")
+    game_turn = operations.get("fmvn", "1")
+    return PositionRecord(" ".join(fields[:4] + [half_moves, game_turn]), operations)
+
+
+def read_positions(path: str) -> Iterator[PositionRecord]:
+    """
+    read_positions streams the positions of a FEN or EPD file, one line is read at a time.
+
+    Args:
+        path (str): path of the file, may be gzip compressed
+
+    Yields:
+        PositionRecord: FEN string and EPD operations of every position
+    """
+    with open_text(path) as position_file:
+        for line in position_file:
+            record = parse_position_line(line)
+            if record is not None:
+                yield record
+
+
+def read_fens(path: str) -> Iterator[str]:
+    """
+    read_fens streams the FEN strings of a FEN or EPD file.
+
+    Args:
+        path (str): path of the file, may be gzip compressed
+
+    Yields:
+        str: FEN string of every position
+    """
+    for record in read_positions(path):
+        yield record.fen
@@ -1,20 +1,34 @@
-from move import Move
+class Figure():
+    """Base class of the figures.
 
+    Figures carry no state of their own, so every figure type exists only
+    once per color. Constructing a figure again returns the shared instance,
+    e.g. ``Queen(0b0) is Queen(0b0)``.
+    """
+    __slots__ = ("COLOR", "NAME")
 
-class Figure():
-    def __init__(
-        self, 
-        color, 
+    TYPE = None
+    HAS_RANGE_MOVEMENT = False
+    IMAGE = None
+
+    _instances = {}
+
+    def __new__(cls, color: int) -> "Figure":
+        figure = Figure._instances.get((cls, color))
+        if figure is None:
+            figure = super().__new__(cls)
+            figure.COLOR = color
+            figure.NAME = fr"{color}_{cls.IMAGE}.png"
+            Figure._instances[(cls, color)] = figure
+        return figure
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.COLOR})"
 
-        ) -> None:
-        self.COLOR = color
-        self.NAME = None
-        self.TYPE = None
-        self.HAS_RANGE_MOVEMENT = False
-        self.has_moved = False
+    def __reduce__(self):
+        # unpickling goes through the constructor so it returns the shared instance again
+        return (type(self), (self.COLOR,))
 
-        self.moves: list[Move] = []
-        
 
 class Pawn(Figure):
     """Class for the pawn figure
@@ -22,10 +36,9 @@ class Pawn(Figure):
     :param Figure: superclass for this figure
     :type Figure: Figure
     """
-    def __init__(self, color: str) -> None:
-        super().__init__(color)
-        self.NAME = fr"{color}_pawn.png"
-        self.TYPE = "p"
+    __slots__ = ()
+    TYPE = "p"
+    IMAGE = "pawn"
 
 
 class Rook(Figure):
@@ -34,11 +47,10 @@ class Rook(Figure):
     :param Figure: superclass for this figure
     :type Figure: Figure
     """
-    def __init__(self, color: str) -> None:
-        super().__init__(color)
-        self.NAME = fr"{color}_rook.png"
-        self.TYPE = "r"
-        self.HAS_RANGE_MOVEMENT = True
+    __slots__ = ()
+    TYPE = "r"
+    IMAGE = "rook"
+    HAS_RANGE_MOVEMENT = True
 
 class Knight(Figure):
     """Class for the knight figure
@@ -46,10 +58,9 @@ class Knight(Figure):
     :param Figure: superclass for this figure
     :type Figure: Figure
     """
-    def __init__(self, color: str) -> None:
-        super().__init__(color)
-        self.NAME = fr"{color}_knight.png"
-        self.TYPE = "n"
+    __slots__ = ()
+    TYPE = "n"
+    IMAGE = "knight"
 
 class Bishop(Figure):
     """Class for the bishop figure
@@ -57,11 +68,10 @@ class Bishop(Figure):
     :param Figure: superclass for this figure
     :type Figure: Figure
     """
-    def __init__(self, color: str) -> None:
-        super().__init__(color)
-        self.HAS_RANGE_MOVEMENT = True
-        self.NAME = fr"{color}_bishop.png"
-        self.TYPE = "b"
+    __slots__ = ()
+    TYPE = "b"
+    IMAGE = "bishop"
+    HAS_RANGE_MOVEMENT = True
 
 class Queen(Figure):
     """Class for the queen figure
@@ -69,11 +79,10 @@ class Queen(Figure):
     :param Figure: superclass for this figure
     :type Figure: Figure
     """
-    def __init__(self, color: str) -> None:
-        super().__init__(color)
-        self.HAS_RANGE_MOVEMENT = True
-        self.NAME = fr"{color}_queen.png"
-        self.TYPE = "q"
+    __slots__ = ()
+    TYPE = "q"
+    IMAGE = "queen"
+    HAS_RANGE_MOVEMENT = True
 
 class King(Figure):
     """Class for the king figure
@@ -81,10 +90,10 @@ class King(Figure):
     :param Figure: superclass for this figure
     :type Figure: Figure
     """
-    def __init__(self, color: str) -> None:
-        super().__init__(color)
-        self.NAME = fr"{color}_king.png"
-        self.TYPE = "k"
+    __slots__ = ()
+    TYPE = "k"
+    IMAGE = "king"
 
-        self.is_checked = False
 
+# shared instances indexed by [color][PIECE_INDEX], see bitboard.PIECE_TYPES
+FIGURES = [[figure_class(color) for figure_class in (Pawn, Knight, Bishop, Rook, Queen, King)] for color in (0b0, 0b1)]
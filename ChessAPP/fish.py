@@ -1,46 +1,79 @@
-import stockfish
 from figures import *
 
 from chessboard import Chessboard, square_name_to_index
 from moveGenerator import MoveGenerator
+from evaluation import evaluate as evaluate_position
+from nnue import NnueEvaluator, load_network
+from parallelSearch import ParallelSearcher
+from search import Searcher, format_score
+from uci import UciEngine
+
+# player name of the bot when it searches with the built-in engine, e.g. for PGN headers
+BUILT_IN_ENGINE_NAME = "pychess engine"
 
 class Bot:
-    def __init__(self, chessboard: Chessboard, color, stockfish_path) -> None:    
-        self.fisher = stockfish.Stockfish(stockfish_path)
-        self.fisher.set_elo_rating(2000)
+    def __init__(self, chessboard: Chessboard, color, stockfish_path=None, think_time=1.0, network_path=None,
+                 processes=1, engine_depth=None) -> None:
+        """
+        Args:
+            chessboard (Chessboard): board the bot plays on
+            color (int): color of the bot
+            stockfish_path (str, optional): path of the Stockfish executable, or of any other UCI engine.
+            Defaults to None, which makes the bot search with the built-in engine.
+            think_time (float, optional): seconds the bot thinks about a move. Defaults to 1.0.
+            network_path (str, optional): .npz file of an NNUE network the built-in engine
+            evaluates with. Defaults to None, which uses the piece-square tables.
+            processes (int, optional): processes the built-in engine searches with, more than one
+            starts a Lazy SMP search, see parallelSearch.py. Defaults to 1.
+            engine_depth (int, optional): depth after which a UCI engine answers, even if think_time
+            is not used up. Defaults to None, which searches for the whole think_time.
+        """
+        if stockfish_path:
+            # the engine process is kept for the whole game, so it keeps its hash table between moves
+            self.engine = UciEngine(stockfish_path, {"UCI_LimitStrength": "true", "UCI_Elo": 2000})
+            self.searcher = None
+            self.name = self.engine.name or "UCI engine"
+        else:
+            self.engine = None
+            self.name = BUILT_IN_ENGINE_NAME
+            evaluate = NnueEvaluator(load_network(network_path)) if network_path else evaluate_position
+            if processes > 1:
+                self.searcher = ParallelSearcher(processes, evaluate=evaluate)
+            else:
+                self.searcher = Searcher(evaluate=evaluate)
         self.chessboard = chessboard
         self.move_generator = MoveGenerator(self.chessboard)
         self.color = color
-        
+        self.think_time = think_time
+        self.engine_depth = engine_depth
+
+    def close(self) -> None:
+        """
+        close ends the engine process or the processes of a parallel search.
+        """
+        if self.engine is not None:
+            self.engine.close()
+        if isinstance(self.searcher, ParallelSearcher):
+            self.searcher.close()
+
     def get_move(self):
-        fen = self.chessboard.generate_fen_from_current_position()
-        if not self.fisher.is_fen_valid(fen):
-            print("Wrong fen generated")
-            return None
-        self.fisher.set_fen_position(fen)
-        dict = self.fisher.get_evaluation()
-        print(dict)
-        bot_move = self.fisher.get_best_move_time(1000)
+        if self.searcher is not None:
+            result = self.searcher.search(self.chessboard, time_limit=self.think_time)
+            print(f"depth {result.depth} score {format_score(result.score)} nodes {result.nodes}")
+            if result.move is None:
+                return None
+            return self.move_generator.generateMoves().by_uci(result.move.uci())
+
+        result = self.engine.play(self.chessboard, self.think_time, self.engine_depth)
+        score = format_score(result.score) if result.score is not None else "-"
+        print(f"{result.best_move} depth {result.depth} score {score} nodes {result.nodes}")
         valid_moves = self.move_generator.generateMoves()
-        print(bot_move)
-        start_square = square_name_to_index(bot_move[:2])
-        end_square = square_name_to_index(bot_move[2:])
-        for move in valid_moves:
-            if  start_square == move.START_SQUARE and end_square == move.END_SQUARE:
-                if move.IS_PROMOTION:
-                    promotion_piece_type = bot_move[4]
-                    if promotion_piece_type.lower() == "q":
-                        promotion_piece = Queen(self.color)
-                    elif promotion_piece_type.lower() == "r":
-                        promotion_piece = Rook(self.color)
-                    elif promotion_piece_type.lower() == "n":
-                        promotion_piece = Knight(self.color)
-                    elif promotion_piece_type.lower() == "b":
-                        promotion_piece = Bishop(self.color)
+        if result.best_move is None or not valid_moves:
+            return None
+        move = valid_moves.by_uci(result.best_move)
+        if move is not None:
+            return move
 
-                    move.set_promotion_piece(promotion_piece)
-                return move
-            
+        move = valid_moves[-1]
         print(f"playing random move {move.START_SQUARE} to {move.END_SQUARE}")
         return move
-    
\ No newline at end of file
@@ -0,0 +1,342 @@
+"""
+Binary game database with memory-mapped random access.
+
+Every game is stored as the sequence of its packed moves (see move.py),
+two bytes per move, so games are read back without parsing SAN and are
+replayed on a Chessboard without generating moves. The file layout, all
+numbers little-endian:
+
+    header          64 bytes, see HEADER_FORMAT
+    moves           uint16 per move of all games, one game after another
+    move index      uint64 per game + 1, position of the first move of every game
+    results         uint8 per game, index into pgn.RESULTS
+    tag index       uint64 per game + 1, position of the tag pairs of every game
+    tag data        UTF-8 tag pairs, see _encode_tags
+
+GameDatabase maps the file into memory, so only the pages of the games that
+are read are loaded, whatever the size of the file.
+
+Usage:
+    python gamedb.py import games.pgn.gz games.db
+    python gamedb.py show games.db 42
+    python gamedb.py bench games.db
+"""
+import argparse
+import array
+import mmap
+import random
+import shutil
+import struct
+import tempfile
+import time
+from typing import Dict, Iterable, NamedTuple, Optional
+
+import numpy as np
+
+from constants import STARTFEN
+from chessboard import Chessboard
+from move import Move, uci_from_code
+from pgn import RESULTS, PgnGame, read_games, replay_game
+
+MAGIC = b"PYCHESDB"
+VERSION = 1
+
+# magic, version, game count, move count and the offsets of the move index, results, tag index and tag data
+HEADER_FORMAT = "<8sI4xQQQQQQ"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+TAG_SEPARATOR = "\x1f"
+PAIR_SEPARATOR = "\x1e"
+
+
+class ImportStats(NamedTuple):
+    games: int
+    skipped: int
+    moves: int
+    seconds: float
+
+
+def _encode_tags(tags: Dict[str, str]) -> bytes:
+    """
+    Helper function to write tag pairs as "tag\\x1fvalue" joined by "\\x1e".
+    """
+    return PAIR_SEPARATOR.join(f"{tag}{TAG_SEPARATOR}{value}" for tag, value in tags.items()).encode("utf-8")
+
+
+def _decode_tags(data: bytes) -> Dict[str, str]:
+    """
+    Helper function to read tag pairs written by _encode_tags.
+    """
+    if not data:
+        return {}
+    return dict(pair.split(TAG_SEPARATOR, 1) for pair in data.decode("utf-8").split(PAIR_SEPARATOR))
+
+
+def _pad(database_file) -> int:
+    """
+    Helper function to align the end of the file to 8 bytes so the following array can be mapped.
+
+    Returns:
+        int: aligned position
+    """
+    position = database_file.tell()
+    padding = -position % 8
+    database_file.write(b"\0" * padding)
+    return position + padding
+
+
+def write_database(games: Iterable[PgnGame], path: str) -> ImportStats:
+    """
+    write_database stores games in a new database file. Every game is replayed
+    once to check its moves and pack them, games with illegal moves are skipped.
+    Moves and tag pairs are written while the games are read, only the
+    indexes of 17 bytes per game are kept in memory.
+
+    Args:
+        games (Iterable[PgnGame]): games to store, e.g. from pgn.read_games
+        path (str): path of the database file, an existing file is replaced
+
+    Returns:
+        ImportStats: amount of stored and skipped games, stored moves and the time taken
+    """
+    move_index = array.array("Q", [0])
+    tag_index = array.array("Q", [0])
+    results = array.array("B")
+    skipped = 0
+    chessboard = Chessboard()
+
+    start = time.perf_counter()
+    with open(path, "wb") as database_file, tempfile.TemporaryFile() as tag_file:
+        database_file.write(b"\0" * HEADER_SIZE)
+
+        for game in games:
+            try:
+                replay_game(game, chessboard)
+            except ValueError as error:
+                skipped += 1
+                print(f"skipped game {len(results) + skipped}: {error}")
+                continue
+
+            codes = array.array("H", (record.code for record in chessboard.move_stack))
+            database_file.write(codes.tobytes())
+            move_index.append(move_index[-1] + len(codes))
+
+            tag_file.write(_encode_tags(game.headers))
+            tag_index.append(tag_file.tell())
+            results.append(RESULTS.index(game.result) if game.result in RESULTS else RESULTS.index("*"))
+
+        index_offset = _pad(database_file)
+        database_file.write(move_index.tobytes())
+        results_offset = database_file.tell()
+        database_file.write(results.tobytes())
+        tag_index_offset = _pad(database_file)
+        database_file.write(tag_index.tobytes())
+        tag_data_offset = database_file.tell()
+        tag_file.seek(0)
+        shutil.copyfileobj(tag_file, database_file)
+
+        database_file.seek(0)
+        database_file.write(struct.pack(
+            HEADER_FORMAT, MAGIC, VERSION, len(results), move_index[-1],
+            index_offset, results_offset, tag_index_offset, tag_data_offset
+        ))
+
+    return ImportStats(len(results), skipped, move_index[-1], time.perf_counter() - start)
+
+
+def import_pgn(pgn_path: str, path: str) -> ImportStats:
+    """
+    import_pgn stores the games of a PGN file in a new database file.
+
+    Args:
+        pgn_path (str): path of the PGN file, may be gzip compressed
+        path (str): path of the database file, an existing file is replaced
+
+    Returns:
+        ImportStats: amount of stored and skipped games, stored moves and the time taken
+    """
+    return write_database(read_games(pgn_path), path)
+
+
+class GameDatabase:
+    """
+    Read access to a database file written by write_database. The arrays of
+    the file are NumPy views on the memory map, nothing is copied on open.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, game_count, move_count, index_offset, results_offset, tag_index_offset, tag_data_offset = \
+            struct.unpack_from(HEADER_FORMAT, self._map)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is no game database of version {VERSION}")
+
+        self.game_count = game_count
+        self.move_count = move_count
+        self.move_data = np.frombuffer(self._map, dtype="<u2", count=move_count, offset=HEADER_SIZE)
+        self.move_index = np.frombuffer(self._map, dtype="<u8", count=game_count + 1, offset=index_offset)
+        self.results = np.frombuffer(self._map, dtype=np.uint8, count=game_count, offset=results_offset)
+        self.tag_index = np.frombuffer(self._map, dtype="<u8", count=game_count + 1, offset=tag_index_offset)
+        self._tag_data_offset = tag_data_offset
+
+    def __len__(self) -> int:
+        return self.game_count
+
+    def __enter__(self) -> "GameDatabase":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        close releases the memory map, arrays taken from the database must not be used afterwards.
+        """
+        self.move_data = self.move_index = self.results = self.tag_index = None
+        try:
+            self._map.close()
+        except BufferError:
+            # a view is still alive somewhere, the map is released with it
+            pass
+        self._file.close()
+
+    def moves(self, game_id: int) -> np.ndarray:
+        """
+        moves returns the packed moves of a game.
+
+        Args:
+            game_id (int): number of the game, starting at 0
+
+        Returns:
+            np.ndarray: uint16 view on the packed moves in the memory map
+        """
+        if not 0 <= game_id < self.game_count:
+            raise IndexError(f"game {game_id} not in database with {self.game_count} games")
+        return self.move_data[self.move_index[game_id]:self.move_index[game_id + 1]]
+
+    def tags(self, game_id: int) -> Dict[str, str]:
+        """
+        tags returns the tag pairs of a game.
+
+        Args:
+            game_id (int): number of the game, starting at 0
+
+        Returns:
+            Dict[str, str]: tag pairs as read from the PGN file
+        """
+        if not 0 <= game_id < self.game_count:
+            raise IndexError(f"game {game_id} not in database with {self.game_count} games")
+        start = self._tag_data_offset + int(self.tag_index[game_id])
+        end = self._tag_data_offset + int(self.tag_index[game_id + 1])
+        return _decode_tags(self._map[start:end])
+
+    def result(self, game_id: int) -> str:
+        """
+        result returns the result of a game.
+
+        Args:
+            game_id (int): number of the game, starting at 0
+
+        Returns:
+            str: "1-0", "0-1", "1/2-1/2" or "*"
+        """
+        return RESULTS[self.results[game_id]]
+
+    def start_fen(self, game_id: int) -> str:
+        """
+        start_fen returns the position a game starts from.
+
+        Args:
+            game_id (int): number of the game, starting at 0
+
+        Returns:
+            str: FEN string of the start position
+        """
+        return self.tags(game_id).get("FEN", STARTFEN)
+
+    def replay(self, game_id: int, chessboard: Optional[Chessboard] = None, plies: Optional[int] = None) -> Chessboard:
+        """
+        replay plays the moves of a game on a board. The moves were checked on
+        import, so they are played without generating the legal moves.
+
+        Args:
+            game_id (int): number of the game, starting at 0
+            chessboard (Chessboard, optional): board to play on, it is set to the start position of the game.
+            Defaults to a new board.
+            plies (int, optional): amount of half moves to play. Defaults to the whole game.
+
+        Returns:
+            Chessboard: board after the played moves
+        """
+        codes = self.moves(game_id)[:plies].tolist()
+        start_fen = self.start_fen(game_id)
+        if chessboard is None:
+            chessboard = Chessboard(start_fen)
+        else:
+            chessboard.create_board(start_fen)
+
+        for code in codes[:-1]:
+            chessboard.make_packed_move(code)
+        if codes:
+            # the last move goes through make_move so listeners see the final position
+            chessboard.make_move(Move.from_code(chessboard.figure_at(codes[-1] & 63), codes[-1]))
+        return chessboard
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Binary game database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="store the games of a PGN file in a new database")
+    import_parser.add_argument("pgn", help="PGN file, may be gzip compressed")
+    import_parser.add_argument("database", help="database file to write")
+
+    show_parser = commands.add_parser("show", help="print a game of the database")
+    show_parser.add_argument("database", help="database file")
+    show_parser.add_argument("game", type=int, help="number of the game, starting at 0")
+
+    bench_parser = commands.add_parser("bench", help="time random reads and replays of games")
+    bench_parser.add_argument("database", help="database file")
+    bench_parser.add_argument("--reads", type=int, default=100000, help="amount of random reads")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        stats = import_pgn(args.pgn, args.database)
+        print(f"{stats.games} games with {stats.moves} moves stored, {stats.skipped} skipped")
+        print(f"Time: {stats.seconds:.3f}s ({stats.games / stats.seconds if stats.seconds else 0:.0f} games/s)")
+        return
+
+    with GameDatabase(args.database) as database:
+        if args.command == "show":
+            for tag, value in database.tags(args.game).items():
+                print(f'[{tag} "{value}"]')
+            print(" ".join(uci_from_code(code) for code in database.moves(args.game).tolist()), database.result(args.game))
+            print(database.replay(args.game).generate_fen_from_current_position())
+            return
+
+        if not len(database):
+            print("database is empty")
+            return
+        game_ids = [random.randrange(len(database)) for _ in range(args.reads)]
+
+        start = time.perf_counter()
+        for game_id in game_ids:
+            database.moves(game_id).tolist()
+        seconds = time.perf_counter() - start
+        print(f"read:   {seconds / args.reads * 1e6:.2f} µs per game")
+
+        chessboard = Chessboard()
+        replays = game_ids[:max(args.reads // 100, 1)]
+        start = time.perf_counter()
+        for game_id in replays:
+            database.replay(game_id, chessboard)
+        seconds = time.perf_counter() - start
+        print(f"replay: {seconds / len(replays) * 1e6:.2f} µs per game")
+
+
+if __name__ == "__main__":
+    main()
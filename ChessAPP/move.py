@@ -1,15 +1,315 @@
+"""
+Moves are packed into 16 bit integers for internal use:
+
+    bits 0-5    start square
+    bits 6-11   end square
+    bits 12-15  flags, see below
+
+The Move class is a view on such a code together with the moving figure
+and is only created where moves leave the move generator.
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bitboard import index_to_square_name, square_name_to_index
+from figures import Figure, Knight, Bishop, Rook, Queen
+
+QUIET = 0
+DOUBLE_PAWN_PUSH = 1
+KING_CASTLE = 2
+QUEEN_CASTLE = 3
+CAPTURE = 4
+EN_PASSANT = 5
+# promotion flags, the lowest two bits select the figure, CAPTURE is added for capturing promotions
+PROMOTION = 8
+
+# indexed by the lowest two bits of a promotion flag
+PROMOTION_FIGURES = [Knight, Bishop, Rook, Queen]
+PROMOTION_BITS = {"n": 0, "b": 1, "r": 2, "q": 3}
+
+CAPTURE_FLAG = CAPTURE << 12
+
+# figure, start file, start rank, end square and promotion figure of a SAN move other than castling
+SAN_PATTERN = re.compile(r"([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQnbrq]))?$")
+
+
+def encode_move(start_square: int, end_square: int, flags: int = QUIET) -> int:
+    """
+    encode_move packs a move into a 16 bit integer.
+
+    Args:
+        start_square (int): square the figure leaves
+        end_square (int): square the figure moves to
+        flags (int, optional): kind of the move. Defaults to QUIET.
+
+    Returns:
+        int: packed move
+    """
+    return start_square | end_square << 6 | flags << 12
+
+
+def uci_from_code(code: int) -> str:
+    """
+    uci_from_code names a packed move by its start and end square (e.g. "e2e4", "e7e8q").
+
+    Args:
+        code (int): packed move
+
+    Returns:
+        str: move in UCI notation
+    """
+    name = index_to_square_name(code & 63) + index_to_square_name(code >> 6 & 63)
+    if code >> 12 & PROMOTION:
+        name += PROMOTION_FIGURES[code >> 12 & 3].TYPE
+    return name
+
+
 class Move():
-    def __init__(self, figure, start, end, capture=None, castle = "-", en_passant_square="-", is_promotion = False) -> None:
+    __slots__ = ("FIGURE", "code")
+
+    def __init__(self, figure: Figure, start: int, end: int, flags: int = QUIET) -> None:
         self.FIGURE = figure
-        self.START_SQUARE = start
-        self.END_SQUARE = end
-        self.CAPTURE = capture
-        self.EN_PASSANT_SQUARE = en_passant_square
-        self.IS_CASTLE = False
-        self.CASTLE_TYPE = castle
-        if castle != "-":
-            self.IS_CASTLE = True
-        self.IS_PROMOTION = is_promotion
-
-    def set_promotion_piece(self, piece):
-        self.PROMOTION_PIECE = piece
\ No newline at end of file
+        self.code = encode_move(start, end, flags)
+
+    @classmethod
+    def from_code(cls, figure: Figure, code: int) -> "Move":
+        """
+        from_code creates the view of a packed move.
+
+        Args:
+            figure (Figure): moving figure
+            code (int): packed move
+
+        Returns:
+            Move: view on the packed move
+        """
+        move = cls.__new__(cls)
+        move.FIGURE = figure
+        move.code = code
+        return move
+
+    @property
+    def START_SQUARE(self) -> int:
+        return self.code & 63
+
+    @property
+    def END_SQUARE(self) -> int:
+        return self.code >> 6 & 63
+
+    @property
+    def FLAGS(self) -> int:
+        return self.code >> 12
+
+    @property
+    def CAPTURE(self) -> Optional[int]:
+        """square of the captured figure, None for moves without capture"""
+        flags = self.code >> 12
+        if flags == EN_PASSANT:
+            # the captured pawn stands behind the end square
+            return self.END_SQUARE + (8 if self.FIGURE.COLOR == 0b0 else -8)
+        if flags & CAPTURE:
+            return self.END_SQUARE
+        return None
+
+    @property
+    def EN_PASSANT_SQUARE(self) -> str:
+        """square skipped by a double pawn push, "-" for every other move"""
+        if self.code >> 12 != DOUBLE_PAWN_PUSH:
+            return "-"
+        return index_to_square_name((self.START_SQUARE + self.END_SQUARE) // 2)
+
+    @property
+    def IS_CASTLE(self) -> bool:
+        return self.code >> 12 in (KING_CASTLE, QUEEN_CASTLE)
+
+    @property
+    def CASTLE_TYPE(self) -> str:
+        """"K", "Q", "k" or "q" for castle moves, "-" for every other move"""
+        flags = self.code >> 12
+        if flags == KING_CASTLE:
+            castle_type = "K"
+        elif flags == QUEEN_CASTLE:
+            castle_type = "Q"
+        else:
+            return "-"
+        return castle_type if self.FIGURE.COLOR == 0b0 else castle_type.lower()
+
+    @property
+    def IS_PROMOTION(self) -> bool:
+        return bool(self.code >> 12 & PROMOTION)
+
+    @property
+    def PROMOTION_PIECE(self) -> Optional[Figure]:
+        if not self.IS_PROMOTION:
+            return None
+        return PROMOTION_FIGURES[self.code >> 12 & 3](self.FIGURE.COLOR)
+
+    def set_promotion_piece(self, piece: Figure):
+        if not self.IS_PROMOTION:
+            return
+        self.code = self.code & ~(3 << 12) | PROMOTION_BITS[piece.TYPE] << 12
+
+    def uci(self) -> str:
+        """
+        uci names the move by its start and end square (e.g. "e2e4", "e7e8q").
+
+        Returns:
+            str: move in UCI notation
+        """
+        return uci_from_code(self.code)
+
+    def __repr__(self) -> str:
+        return f"Move({self.uci()})"
+
+
+class MoveList(list):
+    """
+    List of the legal moves of one position with constant time lookups by
+    squares, start square, UCI and SAN. MoveGenerator.generateMoves builds it
+    once per position, it must not be changed afterwards.
+    """
+
+    def __init__(self, moves: Iterable[Move] = ()) -> None:
+        super().__init__(moves)
+        self._by_squares: Dict[Tuple[int, int, Optional[str]], Move] = {}
+        self._by_start: Dict[int, List[Move]] = {}
+        self._by_end: Dict[int, List[Move]] = {}
+
+        for move in self:
+            code = move.code
+            start_square = code & 63
+            end_square = code >> 6 & 63
+            promotion = PROMOTION_FIGURES[code >> 12 & 3].TYPE if code >> 12 & PROMOTION else None
+
+            self._by_squares[(start_square, end_square, promotion)] = move
+            # without a promotion figure the first promotion move is found, the generator puts the queen first
+            self._by_squares.setdefault((start_square, end_square, None), move)
+            self._by_start.setdefault(start_square, []).append(move)
+            self._by_end.setdefault(end_square, []).append(move)
+
+    def get(self, start_square: int, end_square: int, promotion: Optional[str] = None) -> Optional[Move]:
+        """
+        get finds the move between two squares.
+
+        Args:
+            start_square (int): square the figure leaves
+            end_square (int): square the figure moves to
+            promotion (str, optional): figure type a pawn promotes to, e.g. "q". Defaults to None.
+
+        Returns:
+            Optional[Move]: the move, None if it is not in the list
+        """
+        if promotion is not None:
+            promotion = promotion.lower()
+        return self._by_squares.get((start_square, end_square, promotion))
+
+    def from_square(self, square: int) -> List[Move]:
+        """
+        from_square returns the moves of the figure on a square.
+
+        Args:
+            square (int): start square of the moves
+
+        Returns:
+            List[Move]: moves starting on the square, empty if there are none
+        """
+        return self._by_start.get(square, [])
+
+    def by_uci(self, uci: str) -> Optional[Move]:
+        """
+        by_uci finds a move by its UCI notation, e.g. "e2e4" or "e7e8q".
+
+        Args:
+            uci (str): move in UCI notation
+
+        Returns:
+            Optional[Move]: the move, None if it is not in the list or the string is no UCI move
+        """
+        if len(uci) not in (4, 5) or uci[0] not in "abcdefgh" or uci[2] not in "abcdefgh" \
+                or uci[1] not in "12345678" or uci[3] not in "12345678":
+            return None
+        start_square = square_name_to_index(uci[:2])
+        end_square = square_name_to_index(uci[2:4])
+        return self._by_squares.get((start_square, end_square, uci[4:].lower() or None))
+
+    def by_san(self, san: str) -> Optional[Move]:
+        """
+        by_san finds a move by its standard algebraic notation, e.g. "Nf3", "exd5" or "O-O".
+        Check marks and annotations are ignored, a promotion without figure promotes to a queen.
+
+        Args:
+            san (str): move in SAN
+
+        Returns:
+            Optional[Move]: the move, None if it is not in the list or not unique
+        """
+        san = san.rstrip("+#!?").replace("0", "O")
+        if san in ("O-O", "O-O-O"):
+            flags = KING_CASTLE if san == "O-O" else QUEEN_CASTLE
+            return next((move for move in self if move.code >> 12 == flags), None)
+
+        match = SAN_PATTERN.match(san)
+        if match is None:
+            return None
+        figure_type, start_file, start_rank, end_name, promotion = match.groups()
+        figure_type = figure_type.lower() if figure_type else "p"
+        end_square = square_name_to_index(end_name)
+
+        found = None
+        for move in self._by_end.get(end_square, ()):
+            if move.FIGURE.TYPE != figure_type:
+                continue
+            start_name = index_to_square_name(move.code & 63)
+            if start_file and start_name[0] != start_file or start_rank and start_name[1] != start_rank:
+                continue
+            flags = move.code >> 12
+            if flags & PROMOTION:
+                if PROMOTION_FIGURES[flags & 3].TYPE != (promotion or "q").lower():
+                    continue
+            elif promotion:
+                continue
+            if found is not None:
+                return None
+            found = move
+        return found
+
+    def san(self, move: Move) -> str:
+        """
+        san names a move of this list in standard algebraic notation without check marks.
+        The other moves of the list decide whether the start file or rank has to be given.
+
+        Args:
+            move (Move): move of this list
+
+        Returns:
+            str: move in SAN, e.g. "Nbd7", "exd5", "e8=Q" or "O-O"
+        """
+        flags = move.code >> 12
+        if flags == KING_CASTLE:
+            return "O-O"
+        if flags == QUEEN_CASTLE:
+            return "O-O-O"
+
+        start_name = index_to_square_name(move.START_SQUARE)
+        end_name = index_to_square_name(move.END_SQUARE)
+        capture = "x" if flags & CAPTURE else ""
+
+        if move.FIGURE.TYPE == "p":
+            name = (start_name[0] + capture if capture else "") + end_name
+            if flags & PROMOTION:
+                name += "=" + PROMOTION_FIGURES[flags & 3].TYPE.upper()
+            return name
+
+        # other figures of the same type that can reach the end square
+        rivals = [other.START_SQUARE for other in self._by_end.get(move.END_SQUARE, ())
+                  if other.FIGURE is move.FIGURE and other.START_SQUARE != move.START_SQUARE]
+        disambiguation = ""
+        if rivals:
+            if all(rival % 8 != move.START_SQUARE % 8 for rival in rivals):
+                disambiguation = start_name[0]
+            elif all(rival // 8 != move.START_SQUARE // 8 for rival in rivals):
+                disambiguation = start_name[1]
+            else:
+                disambiguation = start_name
+
+        return move.FIGURE.TYPE.upper() + disambiguation + capture + end_name
@@ -1,6 +1,8 @@
-from move import Move
-from chessboard import square_name_to_index, index_to_square_name
+from typing import Iterator, Optional, Tuple
+from move import Move, MoveList, encode_move, CAPTURE, QUIET, DOUBLE_PAWN_PUSH, KING_CASTLE, QUEEN_CASTLE, EN_PASSANT, PROMOTION, PROMOTION_BITS, CAPTURE_FLAG
+from bitboard import PIECE_INDEX, SQUARE_MASKS, FULL_BOARD, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, iterate_squares, lsb, popcount, square_name_to_index
 import numpy as np
+import itertools
 
 
 def calculateSquaresToBorderArray():
@@ -31,302 +33,722 @@ SQUAREOFFSET = [-8, 8, -1, 1, -9, 9, -7, 7]
 #NW, NE, SW, SE, WN, WS, EN, ES
 SQUAREOFFSET_KNIGHT = [-17, -15, 15, 17, -10, 6, -6, 10]
 
+def calculateLeaperAttackArray(steps):
+    """
+    Args:
+            steps (List[Tuple[int, int]]): (file, rank) steps of the figure
+
+    Returns:
+            List[int]: Mask of the attacked squares for each square
+    """
+    attacks = []
+    for idx in range(64):
+
+        file = idx % 8
+        rank = int(idx/8)
+
+        mask = 0
+        for file_step, rank_step in steps:
+            if 0 <= file + file_step < 8 and 0 <= rank + rank_step < 8:
+                mask |= 1 << ((rank + rank_step)*8 + file + file_step)
+        attacks.append(mask)
+
+    return attacks
+
 BORDER_OFFSETS = calculateSquaresToBorderArray()
 
+#same order as SQUAREOFFSET_KNIGHT
+KNIGHT_ATTACKS = calculateLeaperAttackArray([(-1, -2), (1, -2), (-1, 2), (1, 2), (-2, -1), (-2, 1), (2, -1), (2, 1)])
+
+#same order as SQUAREOFFSET
+KING_ATTACKS = calculateLeaperAttackArray([(0, -1), (0, 1), (-1, 0), (1, 0), (-1, -1), (1, 1), (1, -1), (-1, 1)])
+
+#indexed by color, white pawns walk towards rank 8 (index 0)
+PAWN_ATTACKS = [
+    calculateLeaperAttackArray([(-1, -1), (1, -1)]),
+    calculateLeaperAttackArray([(-1, 1), (1, 1)]),
+]
+
+def calculateSquaresBetweenArray():
+    """
+    Returns:
+            List[List[int]]: Mask of the squares strictly between two squares on a common line, 0 otherwise
+    """
+    between = [[0] * 64 for _ in range(64)]
+    for idx in range(64):
+        for border_offset, square_offset in zip(BORDER_OFFSETS[idx], SQUAREOFFSET):
+            ray = 0
+            for x in range(1, border_offset+1):
+                end_square = idx + x*square_offset
+                between[idx][end_square] = ray
+                ray |= 1 << end_square
+
+    return between
+
+SQUARES_BETWEEN = calculateSquaresBetweenArray()
+
+def calculateSlidingAttackTables(directions):
+    """
+    Every ray is enumerated on its own and the rays are combined afterwards,
+    the blocker squares of one ray have no influence on the others.
+
+    Args:
+            directions (List[int]): indices into SQUAREOFFSET the figure moves along
+
+    Returns:
+            Tuple[List[int], List[Dict[int, int]]]: relevant occupancy mask for each square and
+            a lookup from the masked occupancy to the attacked squares for each square
+    """
+    masks = []
+    tables = []
+    for idx in range(64):
+
+        mask = 0
+        ray_tables = []
+        for direction in directions:
+            ray = [idx + x*SQUAREOFFSET[direction] for x in range(1, BORDER_OFFSETS[idx][direction]+1)]
+
+            #the last square of a ray is attacked whether it is occupied or not
+            relevant_squares = ray[:-1]
+            for square in relevant_squares:
+                mask |= SQUARE_MASKS[square]
+
+            ray_table = []
+            for subset in range(1 << len(relevant_squares)):
+                occupancy = 0
+                for bit, square in enumerate(relevant_squares):
+                    if subset >> bit & 1:
+                        occupancy |= SQUARE_MASKS[square]
+
+                attacks = 0
+                for square in ray:
+                    attacks |= SQUARE_MASKS[square]
+                    if occupancy & SQUARE_MASKS[square]:
+                        break
+                ray_table.append((occupancy, attacks))
+            ray_tables.append(ray_table)
+
+        table = {}
+        for combination in itertools.product(*ray_tables):
+            occupancy = 0
+            attacks = 0
+            for ray_occupancy, ray_attacks in combination:
+                occupancy |= ray_occupancy
+                attacks |= ray_attacks
+            table[occupancy] = attacks
+
+        masks.append(mask)
+        tables.append(table)
+
+    return masks, tables
+
+ROOK_MASKS, ROOK_ATTACKS = calculateSlidingAttackTables(range(4))
+BISHOP_MASKS, BISHOP_ATTACKS = calculateSlidingAttackTables(range(4, 8))
+
+#king start, king target, rook start, squares that have to be empty, squares the king walks over
+CASTLE_SQUARES = {
+    "K": (60, 62, 63, SQUARE_MASKS[61] | SQUARE_MASKS[62], SQUARE_MASKS[61] | SQUARE_MASKS[62]),
+    "Q": (60, 58, 56, SQUARE_MASKS[57] | SQUARE_MASKS[58] | SQUARE_MASKS[59], SQUARE_MASKS[58] | SQUARE_MASKS[59]),
+    "k": (4, 6, 7, SQUARE_MASKS[5] | SQUARE_MASKS[6], SQUARE_MASKS[5] | SQUARE_MASKS[6]),
+    "q": (4, 2, 0, SQUARE_MASKS[1] | SQUARE_MASKS[2] | SQUARE_MASKS[3], SQUARE_MASKS[2] | SQUARE_MASKS[3]),
+}
+
+def calculateAttackMask(bitboards, color: int, occupancy: int) -> int:
+    """
+    Args:
+            bitboards (List[int]): masks of the figures of one color, indexed by PIECE_INDEX
+            color (int): color of the figures
+            occupancy (int): mask of the occupied squares the range figures are blocked by
+
+    Returns:
+            int: Mask of the squares attacked by the figures
+    """
+    attacked = 0
+    pawn_attacks = PAWN_ATTACKS[color]
+    for square in iterate_squares(bitboards[PAWN]):
+        attacked |= pawn_attacks[square]
+    for square in iterate_squares(bitboards[KNIGHT]):
+        attacked |= KNIGHT_ATTACKS[square]
+    for square in iterate_squares(bitboards[ROOK] | bitboards[QUEEN]):
+        attacked |= ROOK_ATTACKS[square][occupancy & ROOK_MASKS[square]]
+    for square in iterate_squares(bitboards[BISHOP] | bitboards[QUEEN]):
+        attacked |= BISHOP_ATTACKS[square][occupancy & BISHOP_MASKS[square]]
+    for square in iterate_squares(bitboards[KING]):
+        attacked |= KING_ATTACKS[square]
+    return attacked
+
+#flag bits of the moves yielded in the first stage of iter_packed_moves
+NOISY_FLAGS = (CAPTURE | PROMOTION) << 12
+
+#flags of the promotion moves, the queen first
+PROMOTION_FLAGS = [PROMOTION | PROMOTION_BITS[figure_type] for figure_type in "qrbn"]
+
 class MoveGenerator:
 
     def __init__(self, chessboard) -> None:
         self.chessboard = chessboard          
 
+        #moves of the position with this version, see Chessboard.version
+        self.cached_version = None
+        self.cached_moves = {}
+        self.cached_has_legal_move = {}
+
     def generateMoves(self, color=None, figures = "rnbqkp"):
-        """generates all possible moves for every figure on the board
+        """generates all legal moves for every figure on the board
 
-        :return: list of possible moves
-        :rtype: list[Move]
+        The moves come from generate_packed_moves and are wrapped into Move views.
+        The result is cached until the position on the board changes.
+
+        :return: list of possible moves with lookups by squares, UCI and SAN
+        :rtype: MoveList
         """
         if color == None:
             color = self.chessboard.color_to_move
 
-        player_moves = []
-        for idx, figure in enumerate(self.chessboard.squares):
-            if figure == None: continue
-            if figure.COLOR != color: continue
+        self._update_cache_version()
 
-            if figure.HAS_RANGE_MOVEMENT and figure.TYPE in figures: 
-                figure.moves = self.generateRangeMoves(idx)
+        cache_key = (color, figures)
+        if cache_key in self.cached_moves:
+            return self.cached_moves[cache_key]
 
-            elif figure.TYPE == "k" and figure.TYPE in figures:
-                figure.moves = self.generateKingMoves(idx)
+        figure_at = self.chessboard.figure_at
+        moves = MoveList(Move.from_code(figure_at(code & 63), code) for code in self.generate_packed_moves(color, figures))
+        self.cached_moves[cache_key] = moves
+        return moves
 
-            elif figure.TYPE == "p" and figure.TYPE in figures:
-                figure.moves = self.generatePawnMoves(idx)
+    def _update_cache_version(self) -> None:
+        """
+        Helper function to forget the cached results once the position on the board changed.
+        """
+        if self.cached_version != self.chessboard.version:
+            self.cached_version = self.chessboard.version
+            self.cached_moves = {}
+            self.cached_has_legal_move = {}
 
-            elif figure.TYPE == "n" and figure.TYPE in figures:
-                figure.moves = self.generateKnightMoves(idx)
-            else:
-                figure.moves = []
+    def generate_packed_moves(self, color=None, figures = "rnbqkp") -> list[int]:
+        """generates all legal moves as packed 16 bit codes, see move.encode_move
 
-            if figure.moves: player_moves.append(figure.moves)
-        tmp =[move for sublist in player_moves for move in sublist]
-        return tmp
+        The checkers and pinned figures are computed once for the position,
+        every figure then only gets the targets that keep the king safe.
+        No Move objects are created, which makes this the method for searches.
 
-    def generateRangeMoves(self, start_square: int) -> list[Move]:
-        """generate all possible moves for a range movement figure on the board
+        Args:
+            color (int, optional): color to generate the moves for. Defaults to the color to move.
+            figures (str, optional): figure types to generate moves for. Defaults to "rnbqkp".
 
-        :param figure: figure to generate the moves for
-        :type figure: Figure
-        :param square_id: square id in the array
-        :type square_id: int
-        :return: list of moves for the figure
-        :rtype: list[Move]
+        Returns:
+            list[int]: packed legal moves
         """
-        border_offsets = BORDER_OFFSETS[start_square]
-        figure = self.chessboard.squares[start_square]
+        if color == None:
+            color = self.chessboard.color_to_move
 
+        own_boards = self.chessboard.bitboards[color]
+        own = self.chessboard.occupancy[color]
+        enemy = self.chessboard.occupancy[color ^ 0b1]
+        occupied = own | enemy
+        king_square, checkers, check_mask, pins = self.get_legality_masks(color)
 
-        figure_border_offets = []
-        figure_square_offsets = []
         moves = []
 
+        #figures other than the king can only move if there is no double check, check_mask is zero then
+        if check_mask:
+            if "p" in figures:
+                for start_square in iterate_squares(own_boards[PAWN]):
+                    moves.extend(self.generatePawnMoves(start_square, check_mask & pins.get(start_square, FULL_BOARD)))
 
-        if figure.TYPE != "b":
-            figure_border_offets.append(border_offsets[:4])
-            figure_square_offsets.append(SQUAREOFFSET[:4])
-        
-        if figure.TYPE != "r":
-            figure_border_offets.append(border_offsets[4:])
-            figure_square_offsets.append(SQUAREOFFSET[4:])
-
-        figure_border_offets = [item for sublist in figure_border_offets for item in sublist]
-        figure_square_offsets = [item for sublist in figure_square_offsets for item in sublist]
-        for border_offset, square_offset in zip(figure_border_offets, figure_square_offsets):
-            for x in range(1, border_offset+1):
+            for figure_type in "nbrq":
+                if figure_type not in figures:
+                    continue
+                for start_square in iterate_squares(own_boards[PIECE_INDEX[figure_type]]):
+                    targets = self.get_attacks(start_square, figure_type, color, occupied) & ~own
+                    targets &= check_mask & pins.get(start_square, FULL_BOARD)
+                    moves.extend(self.get_moves_to_targets(start_square, targets, enemy))
 
-                end_square = start_square + x*square_offset
-                move = Move(figure, start_square, end_square)
+        if "k" in figures and king_square is not None:
+            moves.extend(self.generateKingMoves(king_square, checkers))
 
-                if self.chessboard.squares[end_square] == None:
-                    if self.check_valid_move(move): moves.append(move)
-                    
-                elif self.chessboard.squares[end_square].COLOR != self.chessboard.color_to_move:
-                    move.CAPTURE = end_square
-                    if self.check_valid_move(move): moves.append(move)
-                    break
-                
-                else:
-                    break
         return moves
 
+    def iter_packed_moves(self, color=None) -> Iterator[int]:
+        """lazily generates the legal moves as packed codes in two stages
 
-    def generateKingMoves(self, start_square: int) -> list[Move]:
-        """generates all King moves
+        Captures and promotions are yielded first, quiet moves and castles
+        afterwards. Every figure is only looked at once the caller asks for
+        more moves, so callers that stop early skip most of the work.
 
         Args:
-            start_square (int): square of the figure
+            color (int, optional): color to generate the moves for. Defaults to the color to move.
+
+        Yields:
+            int: packed legal moves
+        """
+        if color == None:
+            color = self.chessboard.color_to_move
+
+        own_boards = self.chessboard.bitboards[color]
+        own = self.chessboard.occupancy[color]
+        enemy = self.chessboard.occupancy[color ^ 0b1]
+        occupied = own | enemy
+        king_square, checkers, check_mask, pins = self.get_legality_masks(color)
+
+        quiet_pawn_moves = []
+        king_moves = []
+
+        #captures and promotions
+        if check_mask:
+            for start_square in iterate_squares(own_boards[PAWN]):
+                for code in self.generatePawnMoves(start_square, check_mask & pins.get(start_square, FULL_BOARD)):
+                    if code & NOISY_FLAGS:
+                        yield code
+                    else:
+                        quiet_pawn_moves.append(code)
+
+            for figure_type in "nbrq":
+                for start_square in iterate_squares(own_boards[PIECE_INDEX[figure_type]]):
+                    targets = self.get_attacks(start_square, figure_type, color, occupied) & enemy
+                    targets &= check_mask & pins.get(start_square, FULL_BOARD)
+                    yield from self.get_moves_to_targets(start_square, targets, enemy)
+
+        if king_square is not None:
+            king_moves = self.generateKingMoves(king_square, checkers)
+            for code in king_moves:
+                if code & NOISY_FLAGS:
+                    yield code
+
+        #quiet moves
+        if check_mask:
+            yield from quiet_pawn_moves
+
+            for figure_type in "nbrq":
+                for start_square in iterate_squares(own_boards[PIECE_INDEX[figure_type]]):
+                    targets = self.get_attacks(start_square, figure_type, color, occupied) & ~occupied
+                    targets &= check_mask & pins.get(start_square, FULL_BOARD)
+                    yield from self.get_moves_to_targets(start_square, targets, enemy)
+
+        for code in king_moves:
+            if not code & NOISY_FLAGS:
+                yield code
+
+    def has_legal_move(self, color=None) -> bool:
+        """checks whether a color has any legal move, stops at the first one found
+
+        Args:
+            color (int, optional): color to check. Defaults to the color to move.
 
         Returns:
-            list[Move]: list of valid moves
+            bool: False for checkmate and stalemate
         """
-        borderOffsets = BORDER_OFFSETS[start_square]
-        figure = self.chessboard.squares[start_square]
+        if color == None:
+            color = self.chessboard.color_to_move
 
-        moves = []
+        self._update_cache_version()
+        if color in self.cached_has_legal_move:
+            return self.cached_has_legal_move[color]
+        if (color, "rnbqkp") in self.cached_moves:
+            return bool(self.cached_moves[(color, "rnbqkp")])
 
-        for border_offset, square_offset in zip(borderOffsets, SQUAREOFFSET):
-            if border_offset > 0:
-                end_square = start_square + square_offset
-                move = Move(figure, start_square, end_square)
+        # the answer is cached as well, the game loop asks every frame
+        has_move = next(self.iter_packed_moves(color), None) is not None
+        self.cached_has_legal_move[color] = has_move
+        return has_move
 
-                if self.chessboard.squares[end_square] == None:
-                    if self.check_valid_move(move): moves.append(move)
+    def count_legal_moves(self, color=None) -> int:
+        """counts the legal moves without creating them
 
-                elif self.chessboard.squares[end_square].COLOR != self.chessboard.color_to_move:
-                    move.CAPTURE = end_square
-                    if self.check_valid_move(move): moves.append(move)
-        
-        moves.extend(self.getCastleMoves())
+        Figures other than pawns contribute the popcount of their legal targets.
 
-        return moves   
-    
-    def getCastleMoves(self) -> list:
-        """helper function for king moves
+        Args:
+            color (int, optional): color to count the moves for. Defaults to the color to move.
 
         Returns:
-            list: valid castle moves
+            int: amount of legal moves
         """
-        king_square = self.find_king_square(self.chessboard.squares)
-        king_figure = self.chessboard.squares[king_square]
-        moves = []
-        if king_figure.has_moved or self.check_for_checks(self.chessboard.squares)>0:
-            return moves
+        if color == None:
+            color = self.chessboard.color_to_move
+
+        own_boards = self.chessboard.bitboards[color]
+        own = self.chessboard.occupancy[color]
+        occupied = own | self.chessboard.occupancy[color ^ 0b1]
+        king_square, checkers, check_mask, pins = self.get_legality_masks(color)
 
+        count = 0
+        if check_mask:
+            for start_square in iterate_squares(own_boards[PAWN]):
+                count += len(self.generatePawnMoves(start_square, check_mask & pins.get(start_square, FULL_BOARD)))
 
-        if king_figure.COLOR == 0b0:
-            queenside_rook = self.chessboard.squares[56]
-            kingside_rook = self.chessboard.squares[63]
+            for figure_type in "nbrq":
+                for start_square in iterate_squares(own_boards[PIECE_INDEX[figure_type]]):
+                    targets = self.get_attacks(start_square, figure_type, color, occupied) & ~own
+                    count += popcount(targets & check_mask & pins.get(start_square, FULL_BOARD))
+
+        if king_square is not None:
+            count += len(self.generateKingMoves(king_square, checkers))
+
+        return count
+
+    def find_move(self, start_square: int, end_square: int, promotion: Optional[str] = None) -> Optional[Move]:
+        """finds the legal move between two squares, stops as soon as it is found
+
+        Args:
+            start_square (int): square the figure leaves
+            end_square (int): square the figure moves to
+            promotion (str, optional): figure type a pawn promotes to, e.g. "q". Defaults to the first promotion found.
+
+        Returns:
+            Optional[Move]: the legal move, None if there is none
+        """
+        figure = self.chessboard.figure_at(start_square)
+        if figure == None:
+            return None
+
+        squares = start_square | end_square << 6
+        for code in self.iter_packed_moves(figure.COLOR):
+            if code & 0xFFF != squares:
+                continue
+            if promotion and code >> 12 & PROMOTION and code >> 12 & 3 != PROMOTION_BITS[promotion.lower()]:
+                continue
+            return Move.from_code(figure, code)
+        return None
+
+    def get_legality_masks(self, color: int) -> Tuple[Optional[int], int, int, dict]:
+        """computes what every move of a color has to respect to keep its king safe
+
+        Args:
+            color (int): color to move
+
+        Returns:
+            Tuple[Optional[int], int, int, dict]: king square, mask of the checkers,
+            check mask (see get_check_mask) and pins (see get_pins)
+        """
+        king_square = self.chessboard.king_squares[color]
+        if king_square is None:
+            checkers = 0
         else:
-            queenside_rook = self.chessboard.squares[0]
-            kingside_rook = self.chessboard.squares[7]
-        
-        if queenside_rook != None:
-            if not queenside_rook.has_moved:
-                if self.chessboard.squares[king_square-1] == None and self.chessboard.squares[king_square-2] == None:
-                    move1 = Move(king_figure, king_square, king_square-1)
-                    move2 = Move(king_figure, king_square, king_square-2)
-
-                    if self.check_valid_move(move1) and self.check_valid_move(move2):
-                        castle_type = "Q" if king_figure.COLOR == 0b0 else "q"
-                        moves.append(Move(king_figure, king_square, king_square-2, castle=castle_type))
-        
-        if kingside_rook != None:
-            if not kingside_rook.has_moved:
-                if self.chessboard.squares[king_square+1] == None and self.chessboard.squares[king_square+2] == None:
-                    move1 = Move(king_figure, king_square, king_square+1)
-                    move2 = Move(king_figure, king_square, king_square+2)
-
-                    if self.check_valid_move(move1) and self.check_valid_move(move2):
-                        castle_type = "K" if king_figure.COLOR == 0b0 else "k"
-                        moves.append(Move(king_figure, king_square, king_square+2, castle=castle_type))
+            checkers = self.get_attackers(king_square, color ^ 0b1, self.chessboard.bitboards)
+        return king_square, checkers, self.get_check_mask(king_square, checkers), self.get_pins(king_square, color)
+
+    def get_piece_moves(self, square: int) -> list[Move]:
+        """legal moves of the figure on a square, taken from the cache of the current position
+
+        Args:
+            square (int): square of the figure
+
+        Returns:
+            list[Move]: legal moves of the figure, empty for an empty square
+        """
+        figure = self.chessboard.figure_at(square)
+        if figure == None:
+            return []
+
+        return self.generateMoves(figure.COLOR).from_square(square)
+
+    def get_check_mask(self, king_square, checkers: int) -> int:
+        """computes the squares a figure other than the king may move to
+
+        Args:
+            king_square (int): square of the king in check
+            checkers (int): mask of the figures giving check
+
+        Returns:
+            int: every square if there is no check, the checker and the squares
+            between it and the king for a single check and no square for a double check
+        """
+        if not checkers:
+            return FULL_BOARD
+        if checkers & (checkers - 1):
+            return 0
+        return checkers | SQUARES_BETWEEN[king_square][lsb(checkers)]
+
+    def get_pins(self, king_square, color: int) -> dict:
+        """finds the figures pinned to their king
+
+        Args:
+            king_square (int): square of the king
+            color (int): color of the king
+
+        Returns:
+            dict: pinned square -> mask of the ray it may still move on
+        """
+        pins = {}
+        if king_square is None:
+            return pins
+
+        enemy = self.chessboard.bitboards[color ^ 0b1]
+        enemy_occupancy = self.chessboard.occupancy[color ^ 0b1]
+        occupied = self.chessboard.occupied
+        own = self.chessboard.occupancy[color]
+
+        #own figures are looked through to find the enemy range figures behind them
+        snipers = self.get_range_attacks(king_square, "r", enemy_occupancy) & (enemy[ROOK] | enemy[QUEEN])
+        snipers |= self.get_range_attacks(king_square, "b", enemy_occupancy) & (enemy[BISHOP] | enemy[QUEEN])
+
+        for sniper in iterate_squares(snipers):
+            between = SQUARES_BETWEEN[king_square][sniper]
+            blockers = between & occupied
+            if blockers & own and not blockers & (blockers - 1):
+                pins[lsb(blockers)] = between | SQUARE_MASKS[sniper]
+        return pins
+
+    def generateRangeMoves(self, start_square: int, legal_mask: int = FULL_BOARD) -> list[int]:
+        """generate all possible moves for a range movement figure on the board
+
+        :param start_square: square id in the array
+        :type start_square: int
+        :param legal_mask: squares the figure may move to without exposing its king
+        :type legal_mask: int
+        :return: packed moves for the figure
+        :rtype: list[int]
+        """
+        figure = self.chessboard.figure_at(start_square)
+        own = self.chessboard.occupancy[figure.COLOR]
+        enemy = self.chessboard.occupancy[figure.COLOR ^ 0b1]
+
+        targets = self.get_range_attacks(start_square, figure.TYPE, own | enemy) & ~own & legal_mask
+        return self.get_moves_to_targets(start_square, targets, enemy)
 
+    def get_moves_to_targets(self, start_square: int, targets: int, enemy: int) -> list[int]:
+        """creates the packed moves of a figure to every target square
+
+        Args:
+            start_square (int): square of the figure
+            targets (int): mask of legal target squares
+            enemy (int): mask of the enemy figures
+
+        Returns:
+            list[int]: packed moves to the targets
+        """
+        moves = []
+        while targets:
+            target = targets & -targets
+            end_square = target.bit_length() - 1
+            code = start_square | end_square << 6
+            if enemy & target:
+                code |= CAPTURE_FLAG
+            moves.append(code)
+            targets ^= target
         return moves
 
-        
-        
+    def get_range_attacks(self, start_square: int, figure_type: str, occupancy: int) -> int:
+        """looks up the squares a range movement figure attacks
 
-    def generateKnightOffsets(self, figure_square: int) -> list:
-        """generates the valid knight offsets to the border
+        Args:
+            start_square (int): square of the figure
+            figure_type (str): "r", "b" or "q"
+            occupancy (int): mask of all occupied squares
+
+        Returns:
+            int: mask of the attacked squares, including the blockers
+        """
+        if figure_type == "r":
+            return ROOK_ATTACKS[start_square][occupancy & ROOK_MASKS[start_square]]
+        if figure_type == "b":
+            return BISHOP_ATTACKS[start_square][occupancy & BISHOP_MASKS[start_square]]
+        return (ROOK_ATTACKS[start_square][occupancy & ROOK_MASKS[start_square]]
+                | BISHOP_ATTACKS[start_square][occupancy & BISHOP_MASKS[start_square]])
+
+
+    def generateKingMoves(self, start_square: int, checkers: int = None) -> list[int]:
+        """generates all King moves
 
         Args:
-            figure_square (int): square of the figure
+            start_square (int): square of the figure
+            checkers (int, optional): mask of the figures giving check. Defaults to None.
 
         Returns:
-            list: list of offsets
+            list[int]: packed valid moves
         """
-        border_offset = BORDER_OFFSETS[figure_square]
-        figure_offsets = SQUAREOFFSET_KNIGHT.copy()
-
-        if border_offset[0] < 2:
-            figure_offsets[0] = 0
-            figure_offsets[1] = 0
-            if border_offset[0] == 0:
-                figure_offsets[4] = 0
-                figure_offsets[6] = 0
-
-        if border_offset[1] < 2:
-            figure_offsets[2] = 0
-            figure_offsets[3] = 0
-            if border_offset[1] == 0:
-                figure_offsets[5] = 0
-                figure_offsets[7] = 0
-
-        if border_offset[2] < 2: 
-            figure_offsets[4] = 0
-            figure_offsets[5] = 0
-            if border_offset[2] == 0:
-                figure_offsets[0] = 0
-                figure_offsets[2] = 0
-
-        if border_offset[3] < 2:
-            figure_offsets[6] = 0
-            figure_offsets[7] = 0
-            if border_offset[3] == 0:
-                figure_offsets[1] = 0
-                figure_offsets[3] = 0
-
-        return figure_offsets
-
-    def generateKnightMoves(self, start_square: int) -> list[Move]:
-        """generates all knight moves
+        color = self.chessboard.figure_at(start_square).COLOR
+        own = self.chessboard.occupancy[color]
+        enemy = self.chessboard.occupancy[color ^ 0b1]
+
+        if checkers == None:
+            checkers = self.chessboard.attack_map(color ^ 0b1) & SQUARE_MASKS[start_square]
+
+        if checkers:
+            #the king must not hide behind itself from range figures
+            attacked = self.get_attack_mask(color ^ 0b1, self.chessboard.occupied ^ SQUARE_MASKS[start_square])
+        else:
+            #a range figure can only see through the king if it gives check
+            attacked = self.chessboard.attack_map(color ^ 0b1)
+
+        targets = KING_ATTACKS[start_square] & ~own & ~attacked
+        moves = self.get_moves_to_targets(start_square, targets, enemy)
+
+        if not checkers:
+            moves.extend(self.getCastleMoves(color, attacked))
+
+        return moves   
+    
+    def getCastleMoves(self, color=None, attacked=None) -> list[int]:
+        """helper function for king moves
 
         Args:
-            start_square (int): square of the knight
+            color (int, optional): color of the castling king. Defaults to the color to move.
+            attacked (int, optional): squares attacked by the opponent. Defaults to None.
 
         Returns:
-            list[Move]: all valid moves
+            list[int]: packed valid castle moves
         """
-        figure_offsets = self.generateKnightOffsets(start_square)
-        figure = self.chessboard.squares[start_square]
+        if color == None:
+            color = self.chessboard.color_to_move
+        if attacked == None:
+            attacked = self.chessboard.attack_map(color ^ 0b1)
+
+        bitboards = self.chessboard.bitboards[color]
+        occupied = self.chessboard.occupied
         moves = []
 
-        for os in figure_offsets:
+        own_king = self.chessboard.king_squares[color]
+        if own_king is None or attacked & SQUARE_MASKS[own_king]:
+            return moves
 
-            if os == 0: continue
+        for castle_type in ("K", "Q") if color == 0b0 else ("k", "q"):
+            if castle_type not in self.chessboard.castle_right:
+                continue
+
+            king_square, king_target, rook_square, empty_mask, walk_mask = CASTLE_SQUARES[castle_type]
+            if own_king != king_square or not bitboards[ROOK] & SQUARE_MASKS[rook_square]:
+                continue
+            if occupied & empty_mask or attacked & walk_mask:
+                continue
+
+            flags = KING_CASTLE if castle_type in "Kk" else QUEEN_CASTLE
+            moves.append(encode_move(king_square, king_target, flags))
 
-            end_square = start_square+os
-            move = Move(figure, start_square, end_square)
-            if self.chessboard.squares[end_square] != None:
-                if self.chessboard.squares[end_square].COLOR == self.chessboard.color_to_move:
-                    continue
-                elif self.chessboard.squares[end_square].COLOR != self.chessboard.color_to_move: 
-                    move.CAPTURE = end_square
-            if self.check_valid_move(move): moves.append(move)
-        
         return moves
 
+    def generateKnightMoves(self, start_square: int, legal_mask: int = FULL_BOARD) -> list[int]:
+        """generates all knight moves
+
+        Args:
+            start_square (int): square of the knight
+            legal_mask (int, optional): squares the knight may move to without exposing its king
+
+        Returns:
+            list[int]: packed valid moves
+        """
+        color = self.chessboard.figure_at(start_square).COLOR
+        own = self.chessboard.occupancy[color]
+        enemy = self.chessboard.occupancy[color ^ 0b1]
 
-    def generatePawnMoves(self, start_square: int) -> list[Move]:
+        targets = KNIGHT_ATTACKS[start_square] & ~own & legal_mask
+        return self.get_moves_to_targets(start_square, targets, enemy)
+
+
+    def generatePawnMoves(self, start_square: int, legal_mask: int = FULL_BOARD) -> list[int]:
         """generates all valid pawn moves
 
         Args:
             start_square (int): square of the pawn
+            legal_mask (int, optional): squares the pawn may move to without exposing its king
 
         Returns:
-            list[Move]: all valid moves
+            list[int]: packed valid moves
         """
-        figure = self.chessboard.squares[start_square]
+        color = self.chessboard.figure_at(start_square).COLOR
+        occupied = self.chessboard.occupied
+        enemy = self.chessboard.occupancy[color ^ 0b1]
 
-        walking_direction = 1 if figure.COLOR == 0b0 else -1
+        walking_direction = 1 if color == 0b0 else -1
 
         moves = []
         end_square = start_square+SQUAREOFFSET[0]*walking_direction
 
-        if self.chessboard.squares[end_square] == None:
-            if int(end_square/8) == 7 or int(end_square/8) == 0:
-                is_promotion = True
-            else:
-                is_promotion = False
-            move = Move(figure, start_square, end_square, is_promotion=is_promotion)
-            if self.check_valid_move(move): moves.append(move)
+        if not occupied & SQUARE_MASKS[end_square]:
+            if legal_mask & SQUARE_MASKS[end_square]:
+                if end_square < 8 or end_square >= 56:
+                    moves.extend(self.generatePromotionMoves(start_square, end_square))
+                else:
+                    moves.append(encode_move(start_square, end_square, QUIET))
 
-            rank = int(start_square/8)
-            if figure.COLOR == 0b0 and rank == 6 or figure.COLOR == 0b1 and rank == 1:
+            rank = start_square >> 3
+            if color == 0b0 and rank == 6 or color == 0b1 and rank == 1:
                 end_square = start_square+2*SQUAREOFFSET[0]*walking_direction
                 
-                if self.chessboard.squares[end_square] == None:
-                    ep_square = end_square+SQUAREOFFSET[0]*(-1)*walking_direction
-                    move = Move(figure, start_square, end_square, en_passant_square=index_to_square_name(ep_square))
-                    if self.check_valid_move(move): moves.append(move)
+                if not occupied & SQUARE_MASKS[end_square] and legal_mask & SQUARE_MASKS[end_square]:
+                    moves.append(encode_move(start_square, end_square, DOUBLE_PAWN_PUSH))
 
         #pawn capture
-        end_square = start_square+SQUAREOFFSET[4]*walking_direction
-        if abs(start_square%8 - end_square%8) == 1 and abs(int(start_square/8) - int(end_square/8)) == 1 and self.chessboard.squares[end_square] != None:
-            if  self.chessboard.squares[end_square].COLOR != figure.COLOR:
-                if int(end_square/8) == 7 or int(end_square/8) == 0:
-                    is_promotion = True
-                else:
-                    is_promotion = False
-                move = Move(figure, start_square, end_square, capture=end_square, is_promotion=is_promotion)
-                if self.check_valid_move(move): moves.append(move)
-        
-        end_square = start_square+SQUAREOFFSET[6]*walking_direction
-        if abs(start_square%8 - end_square%8) == 1 and abs(int(start_square/8) - int(end_square/8)) == 1 and self.chessboard.squares[end_square] != None:
-            if  self.chessboard.squares[end_square].COLOR != figure.COLOR:
-                if int(end_square/8) == 7 or int(end_square/8) == 0:
-                    is_promotion = True
-                else:
-                    is_promotion = False
-                move = Move(figure, start_square, end_square, capture=end_square, is_promotion=is_promotion)
-                if self.check_valid_move(move): moves.append(move)
+        pawn_attacks = PAWN_ATTACKS[color][start_square]
+        for end_square in iterate_squares(pawn_attacks & enemy & legal_mask):
+            if end_square < 8 or end_square >= 56:
+                moves.extend(self.generatePromotionMoves(start_square, end_square, capture=True))
+            else:
+                moves.append(start_square | end_square << 6 | CAPTURE_FLAG)
 
-        #En passant
+        #En passant removes a second figure from the board, its legality is checked on its own
         end_square = square_name_to_index(self.chessboard.en_passant_square)
-        if end_square != None:
-            if abs(start_square%8 - end_square%8) == 1 and abs(int(start_square/8) - int(end_square/8)) == 1:
-                move = Move(figure, start_square, end_square, capture=end_square+(8)*walking_direction)
-                if self.check_valid_move(move): moves.append(move)
+        if end_square != None and pawn_attacks & SQUARE_MASKS[end_square]:
+            if self.is_legal_en_passant(color, start_square, end_square):
+                moves.append(encode_move(start_square, end_square, EN_PASSANT))
 
         return moves
 
+    def generatePromotionMoves(self, start_square: int, end_square: int, capture: bool = False) -> list[int]:
+        """creates one move for every figure a pawn can promote to
+
+        Args:
+            start_square (int): square of the pawn
+            end_square (int): promotion square
+            capture (bool, optional): whether the pawn captures on the promotion square. Defaults to False.
+
+        Returns:
+            list[int]: packed promotion moves, the queen first
+        """
+        code = start_square | end_square << 6
+        if capture:
+            code |= CAPTURE_FLAG
+        return [code | flags << 12 for flags in PROMOTION_FLAGS]
+
+    def is_legal_en_passant(self, color: int, start_square: int, end_square: int) -> bool:
+        """checks whether an en passant capture leaves the own king safe
+
+        Two pawns leave the rank of the king at once, so the pins computed for
+        the position do not cover this move.
+
+        Args:
+            color (int): color of the capturing pawn
+            start_square (int): square of the capturing pawn
+            end_square (int): en passant square
+
+        Returns:
+            bool: True if the king is not attacked after the capture
+        """
+        bitboards = self.chessboard.bitboards
+        king_square = self.chessboard.king_squares[color]
+        if king_square is None:
+            return True
+
+        captured_mask = SQUARE_MASKS[end_square + (8 if color == 0b0 else -8)]
+        occupancy = self.chessboard.occupied ^ SQUARE_MASKS[start_square] ^ SQUARE_MASKS[end_square] ^ captured_mask
+        attacker = bitboards[color ^ 0b1]
+
+        attackers = self.get_range_attacks(king_square, "r", occupancy) & (attacker[ROOK] | attacker[QUEEN])
+        attackers |= self.get_range_attacks(king_square, "b", occupancy) & (attacker[BISHOP] | attacker[QUEEN])
+        attackers |= KNIGHT_ATTACKS[king_square] & attacker[KNIGHT]
+        attackers |= PAWN_ATTACKS[color][king_square] & attacker[PAWN] & ~captured_mask
+        return not attackers
+
+    def get_attacks(self, start_square: int, figure_type: str, color: int, occupancy: int) -> int:
+        """mask of the squares a figure attacks
+
+        Args:
+            start_square (int): square of the figure
+            figure_type (str): type of the figure
+            color (int): color of the figure
+            occupancy (int): mask of all occupied squares
+
+        Returns:
+            int: attacked squares
+        """
+        if figure_type == "p":
+            return PAWN_ATTACKS[color][start_square]
+        if figure_type == "n":
+            return KNIGHT_ATTACKS[start_square]
+        if figure_type == "k":
+            return KING_ATTACKS[start_square]
+        return self.get_range_attacks(start_square, figure_type, occupancy)
+
     def try_move(self, move: Move, figure):
         """checks whether a given move is valid
 
@@ -337,132 +759,94 @@ class MoveGenerator:
         Returns:
             valid_move (Move): valid move
         """
-        for valid_move in figure.moves:
-            if valid_move.START_SQUARE == move.START_SQUARE and valid_move.END_SQUARE == move.END_SQUARE:
-                return valid_move
-        return None
+        return self.generateMoves(figure.COLOR).get(move.START_SQUARE, move.END_SQUARE)
     
     def find_king_square(self, position, color=None) -> int:
         """finds the square of a king of a given color in a position
 
+        The board keeps track of its kings, only other positions are searched.
+
         Args:
-            position (List[int]): position to search for the king
+            position (List[List[int]]): bitboards of the position to search for the king
             color (int, optional): color of the king. Defaults to None.
 
         Returns:
-            int: king square
+            int: king square, None if there is no king of the color
         """
         if color==None:
             color = self.chessboard.color_to_move
-        for idx, figure in enumerate(position):
-            if figure == None: continue
-            if figure.COLOR != color: continue
-            if figure.TYPE == "k": return idx
+        if position is self.chessboard.bitboards:
+            return self.chessboard.king_squares[color]
+        king_mask = position[color][KING]
+        if king_mask:
+            return lsb(king_mask)
 
+    def get_attackers(self, square: int, color: int, position: list) -> int:
+        """finds all figures of a color that attack a square
 
-    def check_for_checks(self, position: list) -> int:
+        Args:
+            square (int): attacked square
+            color (int): color of the attacking figures
+            position (list): bitboards of the position
+
+        Returns:
+            int: mask of the attacking figures
+        """
+        attacker = position[color]
+        occupancy = 0
+        for masks in position:
+            for mask in masks:
+                occupancy |= mask
+
+        attackers = self.get_range_attacks(square, "r", occupancy) & (attacker[ROOK] | attacker[QUEEN])
+        attackers |= self.get_range_attacks(square, "b", occupancy) & (attacker[BISHOP] | attacker[QUEEN])
+        attackers |= KNIGHT_ATTACKS[square] & attacker[KNIGHT]
+        # a pawn attacks the square if it stands where an opposing pawn on the square would capture
+        attackers |= PAWN_ATTACKS[color ^ 0b1][square] & attacker[PAWN]
+        attackers |= KING_ATTACKS[square] & attacker[KING]
+        return attackers
+
+    def check_for_checks(self, position: list = None, color=None) -> int:
         """checks whether the king is in check and how many times
 
         Args:
-            position (list): position to check for
+            position (list, optional): bitboards to check for. Defaults to the current position.
+            color (int, optional): color of the king. Defaults to the color to move.
 
         Returns:
             int: amount of checks
         """
-        checks = 0
-        king_square = self.find_king_square(position)
-        if not king_square: 
-            return 666
-        king_figure = position[king_square]
-
-        figure_border_offets = BORDER_OFFSETS[king_square]
-
-        #find rook / queen checks
-        figure_square_offsets = SQUAREOFFSET[:4]
-
-        for border_offset, square_offset in zip(figure_border_offets[:4], figure_square_offsets):
-            for x in range(1, border_offset+1):
-                end_square = king_square + x*square_offset
-
-                end_square_figure = position[end_square]
-
-                if end_square_figure == None:
-                    continue
-
-                elif end_square_figure.COLOR != self.chessboard.color_to_move:
-                    if end_square_figure.TYPE == "r" or end_square_figure.TYPE == "q":
-                        checks += 1
-                    else: 
-                        break
-                else:
-                    break
-
-        #find bishop / queen checks
-        figure_square_offsets = SQUAREOFFSET[4:]
-        for border_offset, square_offset in zip(figure_border_offets[4:], figure_square_offsets):
-            for x in range(1, border_offset+1):
-                end_square = king_square + x*square_offset
-
-                end_square_figure = position[end_square]
+        if position == None:
+            position = self.chessboard.bitboards
+        if color == None:
+            color = self.chessboard.color_to_move
 
-                if end_square_figure == None:
-                    continue
+        king_square = self.find_king_square(position, color)
+        if king_square is None:
+            return 666
 
-                elif end_square_figure.COLOR != self.chessboard.color_to_move:
-                    if end_square_figure.TYPE == "b" or end_square_figure.TYPE == "q":
-                        checks += 1
-                    else:
-                        break
+        return popcount(self.get_attackers(king_square, color ^ 0b1, position))
 
-                else:
-                    break
-
-        #find knight checks
-        figure_offsets = self.generateKnightOffsets(king_square)
-
-        for os in figure_offsets:
-            if os == 0: continue
-
-            end_square_figure = position[king_square+os]
-            if end_square_figure != None:
-                if end_square_figure.COLOR != king_figure.COLOR and end_square_figure.TYPE == "n":
-                    checks += 1
-
-        #find pawn checks
-        walking_direction = 1 if king_figure.COLOR == 0b0 else -1
-        end_square = king_square+SQUAREOFFSET[4]*walking_direction
-        if end_square <= 63 and position[end_square] != None:
-            if  position[end_square].COLOR != king_figure.COLOR and position[end_square].TYPE == "p":
-                checks += 1
-        
-        end_square = king_square+SQUAREOFFSET[6]*walking_direction
-        if end_square <= 63 and position[end_square] != None:
-            if  position[end_square].COLOR != king_figure.COLOR and position[end_square].TYPE == "p":
-                checks += 1
-
-        #find king attacks
-        for border_offset, square_offset in zip(figure_border_offets, SQUAREOFFSET):
-            if border_offset == 0: 
-                continue
-            end_square = king_square + square_offset
-            end_square_figure = position[end_square]
+    def get_attack_mask(self, color, occupancy: int, figures = "rnbqkp") -> int:
+        """mask of all squares attacked by a color
 
-            if end_square_figure == None:
-                    continue
-            elif end_square_figure.COLOR != king_figure.COLOR:
-                if end_square_figure.TYPE == "k":
-                    checks += 1
+        Args:
+            color (int): color of the attacking figures
+            occupancy (int): mask of the occupied squares the range figures are blocked by
+            figures (str, optional): specify which pieces to look for. Defaults to "rnbqkp".
 
-        return checks
-    
-    def check_valid_move(self, move: Move) -> bool:
+        Returns:
+            int: attacked squares
+        """
+        bitboards = self.chessboard.bitboards[color]
+        if figures == "rnbqkp":
+            return calculateAttackMask(bitboards, color, occupancy)
 
-        new_position = self.chessboard.squares.copy()
-        new_position[move.START_SQUARE] = None
-        new_position[move.END_SQUARE] = move.FIGURE
-        if self.check_for_checks(new_position) == 0: return True
-            
-        else: return False
+        attacked = 0
+        for figure_type in figures:
+            for square in iterate_squares(bitboards[PIECE_INDEX[figure_type]]):
+                attacked |= self.get_attacks(square, figure_type, color, occupancy)
+        return attacked
 
     def get_attacked_squares(self, color, figures = "rnbqkp"):
         """gets all the attacked squares of a color
@@ -474,8 +858,6 @@ class MoveGenerator:
         Returns:
             list: attacked squares
         """
-        moves = self.generateMoves(color, figures)
-        attacked_squares = []
-        for move in moves:
-            attacked_squares.append(move.END_SQUARE)
-        return attacked_squares
\ No newline at end of file
+        if figures == "rnbqkp":
+            return list(iterate_squares(self.chessboard.attack_map(color)))
+        return list(iterate_squares(self.get_attack_mask(color, self.chessboard.occupied, figures)))
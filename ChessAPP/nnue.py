@@ -0,0 +1,621 @@
+"""
+Efficiently updatable neural network evaluation (NNUE) in NumPy.
+
+The network sees the position through HalfKP features. For each color
+there is one input per (own king square, figure, square of the figure)
+for every figure except the kings. The board is mirrored for black, so
+both colors see the position from their own side. The first layer maps
+the about 30 active inputs of each color to an accumulator of HIDDEN
+values. The accumulators of the color to move and of the other color are
+concatenated and go through clipped ReLU layers of 32 and 32 neurons to
+the score.
+
+The first layer holds nearly all weights but only changes by a row per
+moved figure. The Accumulator is attached to a Chessboard and updated
+in _place_piece and _remove_piece, like the Zobrist key. Every move pushes
+the accumulator and taking it back pops it. Only a king move makes the
+accumulator of its color be summed up again, on the next evaluation. The
+first layer is quantized to int16 with int32 accumulators, so incremental
+updates give exactly the same values as summing up.
+
+Networks are stored as .npz files. train fits a network to scored
+positions, e.g. labelled with evaluation.py or an external engine.
+
+Usage:
+    python nnue.py train labels.csv network.npz --epochs 10
+    python nnue.py bench network.npz
+"""
+import argparse
+import itertools
+import time
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from batch import PositionBatch, load_positions
+from bitboard import KING, iterate_squares
+from chessboard import Chessboard
+from constants import STARTFEN
+
+# inputs per king square: own and enemy figures without the king on 64 squares
+FEATURES_PER_KING = 2 * 5 * 64
+FEATURE_COUNT = 64 * FEATURES_PER_KING
+
+HIDDEN = 128
+LAYER_SIZES = (32, 32)
+
+# accumulator value the clipped ReLU maps to 1
+QUANTIZATION = 127
+# the network computes pawns, scores are centipawns
+OUTPUT_SCALE = 100
+# centipawns that map to a winning chance of about 73 % in the training loss
+SIGMOID_SCALE = 400
+
+
+class Network(NamedTuple):
+    input_weights: np.ndarray     # FEATURE_COUNT x HIDDEN float32
+    input_bias: np.ndarray        # HIDDEN float32
+    hidden_weights: np.ndarray    # 2 * HIDDEN x 32 float32
+    hidden_bias: np.ndarray       # 32 float32
+    second_weights: np.ndarray    # 32 x 32 float32
+    second_bias: np.ndarray       # 32 float32
+    output_weights: np.ndarray    # 32 float32
+    output_bias: np.ndarray       # 1 float32
+
+
+def feature_index(perspective: int, king_square: int, color: int, piece_index: int, square: int) -> int:
+    """
+    feature_index numbers the input for a figure as seen by one color.
+
+    Args:
+        perspective (int): color that looks at the board
+        king_square (int): square of the king of that color
+        color (int): color of the figure
+        piece_index (int): PIECE_INDEX of the figure, not the king
+        square (int): square of the figure
+
+    Returns:
+        int: index of the input
+    """
+    if perspective == 0b1:
+        king_square ^= 56
+        square ^= 56
+    relative_color = 0 if color == perspective else 1
+    return king_square * FEATURES_PER_KING + (relative_color * 5 + piece_index) * 64 + square
+
+
+def active_features(bitboards: Sequence[Sequence[int]], perspective: int, king_square: int) -> List[int]:
+    """
+    active_features lists the inputs that are set for one color.
+
+    Args:
+        bitboards (Sequence[Sequence[int]]): masks of the figures indexed by [color][PIECE_INDEX]
+        perspective (int): color that looks at the board
+        king_square (int): square of the king of that color
+
+    Returns:
+        List[int]: indexes of the set inputs
+    """
+    return [
+        feature_index(perspective, king_square, color, piece_index, square)
+        for color in (0b0, 0b1)
+        for piece_index in range(KING)
+        for square in iterate_squares(bitboards[color][piece_index])
+    ]
+
+
+def random_network(hidden: int = HIDDEN, seed: int = 0) -> Network:
+    """
+    random_network creates an untrained network, the start point for train.
+
+    Args:
+        hidden (int, optional): size of the accumulators. Defaults to HIDDEN.
+        seed (int, optional): seed of the random weights. Defaults to 0.
+
+    Returns:
+        Network: network with small random weights
+    """
+    generator = np.random.default_rng(seed)
+
+    def layer(inputs: int, outputs: int) -> np.ndarray:
+        return (generator.standard_normal((inputs, outputs)) * np.sqrt(1 / inputs)).astype(np.float32)
+
+    first, second = LAYER_SIZES
+    return Network(
+        (generator.standard_normal((FEATURE_COUNT, hidden)) * 0.02).astype(np.float32),
+        np.full(hidden, 0.25, dtype=np.float32),
+        layer(2 * hidden, first), np.zeros(first, dtype=np.float32),
+        layer(first, second), np.zeros(second, dtype=np.float32),
+        layer(second, 1).reshape(second), np.zeros(1, dtype=np.float32),
+    )
+
+
+def load_network(path: str) -> Network:
+    """
+    load_network reads a network written by save_network.
+
+    Args:
+        path (str): path of the .npz file
+
+    Returns:
+        Network: the stored network
+    """
+    with np.load(path) as arrays:
+        return Network(*(arrays[name].astype(np.float32) for name in Network._fields))
+
+
+def save_network(network: Network, path: str) -> None:
+    """
+    save_network writes a network to a .npz file.
+
+    Args:
+        network (Network): network to store
+        path (str): path of the .npz file
+    """
+    np.savez(path, **network._asdict())
+
+
+class QuantizedNetwork:
+    """
+    Network prepared for inference: the first layer in int16 with int32
+    accumulators, the other layers in float32.
+    """
+
+    def __init__(self, network: Network) -> None:
+        self.network = network
+        self.hidden = network.input_bias.shape[0]
+        # one zero row more, positions with fewer inputs are padded with it in evaluate_batch
+        self.input_weights = np.zeros((FEATURE_COUNT + 1, self.hidden), dtype=np.int16)
+        self.input_weights[:FEATURE_COUNT] = np.clip(np.rint(network.input_weights * QUANTIZATION), -32767, 32767)
+        self.input_bias = np.rint(network.input_bias * QUANTIZATION).astype(np.int32)
+
+    def refresh(self, features: List[int]) -> np.ndarray:
+        """
+        refresh sums up the first layer for a set of inputs.
+
+        Args:
+            features (List[int]): indexes of the set inputs
+
+        Returns:
+            np.ndarray: int32 accumulator
+        """
+        return self.input_bias + self.input_weights[features].sum(axis=0, dtype=np.int32)
+
+    def forward(self, own: np.ndarray, other: np.ndarray) -> np.ndarray:
+        """
+        forward computes the scores from the accumulators of many positions.
+
+        Args:
+            own (np.ndarray): N x HIDDEN int32 accumulators of the colors to move
+            other (np.ndarray): N x HIDDEN int32 accumulators of the other colors
+
+        Returns:
+            np.ndarray: int32 scores in centipawns for the colors to move
+        """
+        network = self.network
+        inputs = np.clip(np.concatenate((own, other), axis=1), 0, QUANTIZATION).astype(np.float32) / QUANTIZATION
+        hidden = np.clip(inputs @ network.hidden_weights + network.hidden_bias, 0, 1)
+        hidden = np.clip(hidden @ network.second_weights + network.second_bias, 0, 1)
+        output = hidden @ network.output_weights + network.output_bias[0]
+        return np.rint(output * OUTPUT_SCALE).astype(np.int32)
+
+    def evaluate_batch(self, batch: PositionBatch, chunk: int = 4096) -> np.ndarray:
+        """
+        evaluate_batch scores many positions at once, with the same accumulators as the incremental path.
+
+        Args:
+            batch (PositionBatch): positions to score
+            chunk (int, optional): positions handled at once. Defaults to 4096.
+
+        Returns:
+            np.ndarray: int32 scores in centipawns for the color to move of every position
+        """
+        scores = np.empty(len(batch.bitboards), dtype=np.int32)
+        for start in range(0, len(scores), chunk):
+            colors = batch.color_to_move[start:start + chunk]
+            white, black = self._batch_accumulators(batch.bitboards[start:start + chunk])
+            own = np.where(colors[:, None] == 0, white, black)
+            other = np.where(colors[:, None] == 0, black, white)
+            scores[start:start + chunk] = self.forward(own, other)
+        return scores
+
+    def _batch_accumulators(self, bitboards: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Helper function to compute the accumulators of both colors for N x 12 bitboards.
+        """
+        count = len(bitboards)
+        accumulators = []
+        for positions, features in batch_features(bitboards):
+            accumulator = np.broadcast_to(self.input_bias, (count, self.hidden)).copy()
+            if len(features):
+                # positions come sorted, every position gets a row of its inputs padded to the same length
+                starts = np.searchsorted(positions, np.arange(count))
+                slots = np.arange(len(positions)) - starts[positions]
+                padded = np.full((count, slots.max() + 1), FEATURE_COUNT, dtype=np.int64)
+                padded[positions, slots] = features
+                accumulator += self.input_weights[padded].sum(axis=1, dtype=np.int32)
+            accumulators.append(accumulator)
+        return accumulators[0], accumulators[1]
+
+
+def batch_features(bitboards: np.ndarray) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    batch_features lists the set inputs of many positions for both colors.
+
+    Args:
+        bitboards (np.ndarray): N x 12 uint64, index color * 6 + PIECE_INDEX
+
+    Returns:
+        List[Tuple[np.ndarray, np.ndarray]]: for white and black the position of every set input,
+        sorted, and its index. Positions without a king of the color have no inputs for it.
+    """
+    bitboards = np.ascontiguousarray(bitboards, dtype="<u8")
+    squares = np.unpackbits(bitboards.view(np.uint8), axis=1, bitorder="little").reshape(-1, 12, 64)
+    king_squares = [squares[:, 6 * color + KING].argmax(axis=1) for color in (0b0, 0b1)]
+    has_king = [squares[:, 6 * color + KING].any(axis=1) for color in (0b0, 0b1)]
+
+    figures = squares[:, [plane for plane in range(12) if plane % 6 != KING]]
+    positions, planes, figure_squares = np.nonzero(figures)
+    colors = planes // 5
+    piece_indexes = planes % 5
+
+    result = []
+    for perspective in (0b0, 0b1):
+        keep = has_king[perspective][positions]
+        king_square = king_squares[perspective][positions[keep]]
+        square = figure_squares[keep]
+        if perspective == 0b1:
+            king_square = king_square ^ 56
+            square = square ^ 56
+        relative_color = (colors[keep] != perspective).astype(np.int64)
+        features = king_square * FEATURES_PER_KING + (relative_color * 5 + piece_indexes[keep]) * 64 + square
+        result.append((positions[keep], features.astype(np.int64)))
+    return result
+
+
+class Accumulator:
+    """
+    First layer of a network for the position of one Chessboard. The board
+    calls add_piece and remove_piece for every figure it puts on or takes
+    from a square, push before every move and pop when a move is taken back.
+    """
+
+    def __init__(self, network: QuantizedNetwork, chessboard: Chessboard) -> None:
+        self.network = network
+        self.chessboard = chessboard
+        self.values = np.empty((2, network.hidden), dtype=np.int32)
+        # a color whose king moved is summed up again before the next evaluation
+        self.dirty = [True, True]
+        self.stack: List[Tuple[np.ndarray, List[bool]]] = []
+
+    def reset(self) -> None:
+        """
+        reset forgets the stack, used when the board loads a new position.
+        """
+        self.stack.clear()
+        self.dirty = [True, True]
+
+    def push(self) -> None:
+        self.stack.append((self.values.copy(), self.dirty.copy()))
+
+    def pop(self) -> None:
+        if self.stack:
+            self.values, self.dirty = self.stack.pop()
+        else:
+            # the move was played before the accumulator was attached
+            self.dirty = [True, True]
+
+    def add_piece(self, square: int, color: int, piece_index: int) -> None:
+        self._update(square, color, piece_index, 1)
+
+    def remove_piece(self, square: int, color: int, piece_index: int) -> None:
+        self._update(square, color, piece_index, -1)
+
+    def _update(self, square: int, color: int, piece_index: int, sign: int) -> None:
+        """
+        Helper function to add or subtract the weights of a figure for both colors.
+        """
+        if piece_index == KING:
+            self.dirty[color] = True
+            return
+
+        king_squares = self.chessboard.king_squares
+        weights = self.network.input_weights
+        for perspective in (0b0, 0b1):
+            if self.dirty[perspective] or king_squares[perspective] is None:
+                continue
+            row = weights[feature_index(perspective, king_squares[perspective], color, piece_index, square)]
+            if sign > 0:
+                self.values[perspective] += row
+            else:
+                self.values[perspective] -= row
+
+    def refresh(self) -> None:
+        """
+        refresh sums up the accumulators of the colors whose king moved.
+        """
+        chessboard = self.chessboard
+        for perspective in (0b0, 0b1):
+            if not self.dirty[perspective]:
+                continue
+            king_square = chessboard.king_squares[perspective]
+            if king_square is None:
+                self.values[perspective] = self.network.input_bias
+            else:
+                self.values[perspective] = self.network.refresh(active_features(chessboard.bitboards, perspective, king_square))
+            self.dirty[perspective] = False
+
+    def evaluate(self) -> int:
+        """
+        evaluate scores the position of the board.
+
+        Returns:
+            int: score in centipawns for the color to move
+        """
+        self.refresh()
+        color = self.chessboard.color_to_move
+        return int(self.network.forward(self.values[color][None], self.values[color ^ 0b1][None])[0])
+
+
+class NnueEvaluator:
+    """
+    Evaluation function for the Searcher, e.g. Searcher(evaluate=NnueEvaluator(load_network(path))).
+    An Accumulator is attached to every board it is called with for the first time.
+    """
+
+    def __init__(self, network: Network) -> None:
+        self.network = QuantizedNetwork(network)
+
+    def attach(self, chessboard: Chessboard) -> Accumulator:
+        """
+        attach makes the board update an accumulator of this network from now on.
+
+        Args:
+            chessboard (Chessboard): board to evaluate
+
+        Returns:
+            Accumulator: the attached accumulator
+        """
+        accumulator = Accumulator(self.network, chessboard)
+        chessboard.accumulator = accumulator
+        return accumulator
+
+    def __call__(self, chessboard: Chessboard) -> int:
+        accumulator = chessboard.accumulator
+        if accumulator is None or accumulator.network is not self.network:
+            accumulator = self.attach(chessboard)
+        return accumulator.evaluate()
+
+    def evaluate_batch(self, batch: PositionBatch) -> np.ndarray:
+        """
+        evaluate_batch scores many positions at once.
+
+        Args:
+            batch (PositionBatch): positions to score
+
+        Returns:
+            np.ndarray: int32 scores in centipawns for the color to move of every position
+        """
+        return self.network.evaluate_batch(batch)
+
+
+def _sigmoid(values: np.ndarray) -> np.ndarray:
+    return 1 / (1 + np.exp(-values))
+
+
+def train(network: Network, fens: List[str], scores: np.ndarray, epochs: int = 10, batch_size: int = 1024,
+          learning_rate: float = 1e-3, seed: int = 0, progress: bool = True) -> Network:
+    """
+    train fits a network to scored positions with Adam. The loss compares the
+    winning chances of the scores, so big scores do not dominate the training.
+
+    Args:
+        network (Network): start point, e.g. random_network()
+        fens (List[str]): FEN strings of the positions
+        scores (np.ndarray): scores in centipawns for the color to move of every position
+        epochs (int, optional): passes over the positions. Defaults to 10.
+        batch_size (int, optional): positions per step. Defaults to 1024.
+        learning_rate (float, optional): step size of Adam. Defaults to 1e-3.
+        seed (int, optional): seed of the shuffling. Defaults to 0.
+        progress (bool, optional): print the loss after every epoch. Defaults to True.
+
+    Returns:
+        Network: trained network
+    """
+    positions = load_positions(fens)
+    targets = _sigmoid(np.asarray(scores, dtype=np.float32) / SIGMOID_SCALE)
+    generator = np.random.default_rng(seed)
+
+    parameters = [array.copy() for array in network]
+    first_moments = [np.zeros_like(array) for array in parameters]
+    second_moments = [np.zeros_like(array) for array in parameters]
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+    step = 0
+
+    for epoch in range(epochs):
+        order = generator.permutation(len(fens))
+        losses = []
+        for start in range(0, len(order), batch_size):
+            indexes = order[start:start + batch_size]
+            loss, gradients, touched = _gradients(parameters, positions.bitboards[indexes],
+                                                  positions.color_to_move[indexes], targets[indexes])
+            losses.append(loss)
+            step += 1
+
+            for index, (parameter, gradient) in enumerate(zip(parameters, gradients)):
+                if index == 0:
+                    # the first layer is sparse, only the rows of set inputs change
+                    rows = touched
+                    first_moments[0][rows] = beta1 * first_moments[0][rows] + (1 - beta1) * gradient
+                    second_moments[0][rows] = beta2 * second_moments[0][rows] + (1 - beta2) * gradient ** 2
+                    moment, variance = first_moments[0][rows], second_moments[0][rows]
+                else:
+                    rows = slice(None)
+                    first_moments[index] = beta1 * first_moments[index] + (1 - beta1) * gradient
+                    second_moments[index] = beta2 * second_moments[index] + (1 - beta2) * gradient ** 2
+                    moment, variance = first_moments[index], second_moments[index]
+                moment = moment / (1 - beta1 ** step)
+                variance = variance / (1 - beta2 ** step)
+                parameter[rows] -= learning_rate * moment / (np.sqrt(variance) + epsilon)
+
+        if progress:
+            print(f"epoch {epoch + 1}: loss {np.mean(losses):.6f}")
+
+    return Network(*parameters)
+
+
+def _gradients(parameters: List[np.ndarray], bitboards: np.ndarray, colors: np.ndarray,
+               targets: np.ndarray) -> Tuple[float, List[np.ndarray], np.ndarray]:
+    """
+    Helper function for the loss and the gradients of one training step in float32.
+
+    Returns:
+        Tuple[float, List[np.ndarray], np.ndarray]: loss, gradients in the order of Network with the
+        gradient of the first layer for the touched rows only, and the touched rows
+    """
+    input_weights, input_bias, hidden_weights, hidden_bias, second_weights, second_bias, output_weights, output_bias = parameters
+    count = len(bitboards)
+    hidden = input_bias.shape[0]
+
+    features = batch_features(bitboards)
+    accumulators = []
+    for positions, indexes in features:
+        accumulator = np.broadcast_to(input_bias, (count, hidden)).copy()
+        np.add.at(accumulator, positions, input_weights[indexes])
+        accumulators.append(accumulator)
+    white_to_move = (colors == 0)[:, None]
+    own = np.where(white_to_move, accumulators[0], accumulators[1])
+    other = np.where(white_to_move, accumulators[1], accumulators[0])
+
+    inputs = np.concatenate((own, other), axis=1)
+    activated = np.clip(inputs, 0, 1)
+    first = activated @ hidden_weights + hidden_bias
+    first_activated = np.clip(first, 0, 1)
+    second = first_activated @ second_weights + second_bias
+    second_activated = np.clip(second, 0, 1)
+    output = second_activated @ output_weights + output_bias[0]
+
+    predictions = _sigmoid(output * OUTPUT_SCALE / SIGMOID_SCALE)
+    loss = float(np.mean((predictions - targets) ** 2))
+
+    output_gradient = 2 * (predictions - targets) * predictions * (1 - predictions) * OUTPUT_SCALE / SIGMOID_SCALE / count
+    output_gradient = output_gradient.astype(np.float32)
+    output_weights_gradient = second_activated.T @ output_gradient
+    output_bias_gradient = np.array([output_gradient.sum()], dtype=np.float32)
+
+    second_gradient = np.outer(output_gradient, output_weights) * ((second > 0) & (second < 1))
+    second_weights_gradient = first_activated.T @ second_gradient
+    second_bias_gradient = second_gradient.sum(axis=0)
+
+    first_gradient = (second_gradient @ second_weights.T) * ((first > 0) & (first < 1))
+    hidden_weights_gradient = activated.T @ first_gradient
+    hidden_bias_gradient = first_gradient.sum(axis=0)
+
+    inputs_gradient = (first_gradient @ hidden_weights.T) * ((inputs > 0) & (inputs < 1))
+    own_gradient, other_gradient = inputs_gradient[:, :hidden], inputs_gradient[:, hidden:]
+    color_gradients = [
+        np.where(white_to_move, own_gradient, other_gradient),
+        np.where(white_to_move, other_gradient, own_gradient),
+    ]
+    input_bias_gradient = color_gradients[0].sum(axis=0) + color_gradients[1].sum(axis=0)
+
+    all_indexes = np.concatenate([indexes for _, indexes in features])
+    touched, inverse = np.unique(all_indexes, return_inverse=True)
+    input_weights_gradient = np.zeros((len(touched), hidden), dtype=np.float32)
+    np.add.at(input_weights_gradient, inverse,
+              np.concatenate([color_gradients[color][positions] for color, (positions, _) in enumerate(features)]))
+
+    gradients = [
+        input_weights_gradient, input_bias_gradient, hidden_weights_gradient, hidden_bias_gradient,
+        second_weights_gradient, second_bias_gradient, output_weights_gradient, output_bias_gradient,
+    ]
+    return loss, gradients, touched
+
+
+def read_labels(path: str, limit: Optional[int] = None) -> Tuple[List[str], np.ndarray]:
+    """
+    read_labels reads the 'FEN,score' lines written by evaluation.py.
+
+    Args:
+        path (str): path of the CSV file
+        limit (int, optional): highest amount of positions to read. Defaults to all.
+
+    Returns:
+        Tuple[List[str], np.ndarray]: FEN strings and their scores in centipawns
+    """
+    fens = []
+    scores = []
+    with open(path, encoding="utf-8") as label_file:
+        for line in itertools.islice(label_file, limit):
+            fen, _, score = line.strip().rpartition(",")
+            if fen:
+                fens.append(fen)
+                scores.append(int(score))
+    return fens, np.array(scores, dtype=np.float32)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train and time NNUE networks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = commands.add_parser("train", help="fit a network to scored positions")
+    train_parser.add_argument("labels", help="CSV file with 'FEN,score' lines, e.g. from evaluation.py --output")
+    train_parser.add_argument("network", help=".npz file to write the network to")
+    train_parser.add_argument("--start", help="network to continue training, a new one by default")
+    train_parser.add_argument("--hidden", type=int, default=HIDDEN, help="size of the accumulators of a new network")
+    train_parser.add_argument("--epochs", type=int, default=10, help="passes over the positions")
+    train_parser.add_argument("--batch-size", type=int, default=1024, help="positions per step")
+    train_parser.add_argument("--learning-rate", type=float, default=1e-3, help="step size")
+    train_parser.add_argument("--limit", type=int, help="highest amount of positions to read")
+
+    bench_parser = commands.add_parser("bench", help="time incremental and batched evaluation")
+    bench_parser.add_argument("network", nargs="?", help=".npz file of the network, a random one by default")
+    bench_parser.add_argument("--positions", type=int, default=20000, help="positions for the batched evaluation")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        fens, scores = read_labels(args.labels, args.limit)
+        network = load_network(args.start) if args.start else random_network(args.hidden)
+        start = time.perf_counter()
+        network = train(network, fens, scores, args.epochs, args.batch_size, args.learning_rate)
+        print(f"{len(fens)} positions, {args.epochs} epochs in {time.perf_counter() - start:.3f}s")
+        save_network(network, args.network)
+        return
+
+    from moveGenerator import MoveGenerator
+
+    evaluator = NnueEvaluator(load_network(args.network) if args.network else random_network())
+    chessboard = Chessboard(STARTFEN)
+    move_generator = MoveGenerator(chessboard)
+    evaluator(chessboard)
+
+    # walk a game of first moves forwards and back, every position is evaluated once
+    codes = []
+    fens = []
+    start = time.perf_counter()
+    evaluations = 0
+    for _ in range(100):
+        moves = move_generator.generate_packed_moves()
+        if not moves:
+            break
+        codes.append(moves[len(codes) % len(moves)])
+        chessboard.make_packed_move(codes[-1])
+        evaluator(chessboard)
+        fens.append(chessboard.generate_fen_from_current_position())
+        evaluations += 1
+    for _ in codes:
+        chessboard.unmake_packed_move()
+        evaluator(chessboard)
+        evaluations += 1
+    seconds = time.perf_counter() - start
+    print(f"incremental: {seconds / evaluations * 1e6:.1f} µs per move and evaluation")
+
+    batch = load_positions(list(itertools.islice(itertools.cycle(fens), args.positions)))
+    start = time.perf_counter()
+    evaluator.evaluate_batch(batch)
+    seconds = time.perf_counter() - start
+    print(f"batched:     {len(batch.fens) / seconds:.0f} positions/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""
+Lazy SMP: several processes search the same position and share their
+results through one transposition table.
+
+The SharedTranspositionTable keeps its entries in shared memory, so every
+process probes and stores without copies. It uses no locks: every entry
+is two 64 bit words, the packed result and the Zobrist key XOR the packed
+result. A word is written at once, but two processes can interleave the
+two words of an entry. Such an entry does not match the key of either
+position anymore and is treated as a miss.
+
+The ParallelSearcher runs one main search and helper searches in worker
+processes that are started once and kept between searches. Half of the
+helpers start one depth deeper, so the processes do not walk the tree in
+lockstep. The node and time limit apply to the main search, the helpers
+stop when it is done. The answer is the result of the deepest finished
+iteration, on equal depth the main search is preferred.
+
+Usage:
+    python parallelSearch.py --processes 4 --time 5
+    python parallelSearch.py --fen "<fen>" --processes 8 --depth 8
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import time
+from multiprocessing import shared_memory
+from typing import Callable, List, Optional, Tuple
+
+from chessboard import Chessboard
+from constants import STARTFEN
+from evaluation import evaluate
+from move import Move, uci_from_code
+from nnue import NnueEvaluator, load_network
+from search import MAX_PLY, Searcher, SearchResult, TableEntry, format_score
+
+# two words per entry after a header word holding the age of the current search
+HEADER_WORDS = 1
+ENTRY_WORDS = 2
+
+# layout of the packed result of an entry
+SCORE_SHIFT = 16
+SCORE_OFFSET = 1 << 15
+DEPTH_SHIFT = 32
+BOUND_SHIFT = 40
+AGE_SHIFT = 48
+# set in every stored entry, so an empty slot never matches
+USED = 1 << 63
+
+WORD_MASK = (1 << 64) - 1
+
+
+class SharedTranspositionTable:
+    """
+    TranspositionTable in shared memory that can be used by several processes
+    at once, with the same replacement policy. The process that creates the
+    table owns it. Other processes open it by its name and take the age of
+    the current search from the owner.
+    """
+
+    def __init__(self, size: int = 1 << 20, name: Optional[str] = None) -> None:
+        """
+        Args:
+            size (int, optional): amount of entries, rounded down to a power of two. Defaults to 1 << 20.
+            name (str, optional): name of the table of another process to open. Defaults to None,
+            which creates a new table.
+        """
+        size = 1 << (max(size, 1).bit_length() - 1)
+        self.mask = size - 1
+        self.owner = name is None
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=8 * (HEADER_WORDS + ENTRY_WORDS * size))
+        else:
+            # the workers share the resource tracker of their parent, so the owner alone removes the memory
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.words = self.memory.buf.cast("Q")
+        self.age = self.words[0]
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def __len__(self) -> int:
+        return self.mask + 1
+
+    def close(self) -> None:
+        """
+        close releases the memory of the table, the owner removes it for every process.
+        """
+        self.words.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+    def clear(self) -> None:
+        """
+        clear forgets every stored result.
+        """
+        self.memory.buf[:] = bytes(len(self.memory.buf))
+        self.age = 0
+
+    def new_search(self) -> None:
+        """
+        new_search marks the stored results as old. The owner starts a new age,
+        the other processes take over the age of the owner.
+        """
+        if self.owner:
+            self.words[0] = (self.words[0] + 1) & 0xFF
+        self.age = self.words[0]
+
+    def probe(self, key: int) -> Optional[TableEntry]:
+        """
+        probe looks up the stored result of a position.
+
+        Args:
+            key (int): Zobrist key of the position
+
+        Returns:
+            Optional[TableEntry]: stored result, None if the position is not in the table
+        """
+        index = HEADER_WORDS + ENTRY_WORDS * (key & self.mask)
+        words = self.words
+        data = words[index + 1]
+        if words[index] ^ data != key or not data & USED:
+            return None
+        return TableEntry(
+            key,
+            data >> DEPTH_SHIFT & 0xFF,
+            (data >> SCORE_SHIFT & 0xFFFF) - SCORE_OFFSET,
+            data >> BOUND_SHIFT & 0x3,
+            data & 0xFFFF,
+            data >> AGE_SHIFT & 0xFF,
+        )
+
+    def store(self, key: int, depth: int, score: int, bound: int, move: int) -> None:
+        """
+        store saves the result of a position if the replacement policy allows it.
+
+        Args:
+            key (int): Zobrist key of the position
+            depth (int): remaining depth the position was searched with
+            score (int): score of the position, mate scores relative to the position
+            bound (int): EXACT, LOWER_BOUND or UPPER_BOUND
+            move (int): best packed move, 0 if none is known
+        """
+        index = HEADER_WORDS + ENTRY_WORDS * (key & self.mask)
+        words = self.words
+        data = words[index + 1]
+        if data & USED:
+            if words[index] ^ data == key:
+                if not move:
+                    move = data & 0xFFFF
+            elif data >> AGE_SHIFT & 0xFF == self.age and data >> DEPTH_SHIFT & 0xFF > depth:
+                return
+
+        data = USED | self.age << AGE_SHIFT | bound << BOUND_SHIFT | min(depth, 0xFF) << DEPTH_SHIFT \
+            | (score + SCORE_OFFSET) << SCORE_SHIFT | move
+        words[index] = (key ^ data) & WORD_MASK
+        words[index + 1] = data
+
+    def hashfull(self) -> int:
+        """
+        hashfull estimates the filling of the table from its first thousand slots.
+
+        Returns:
+            int: used slots per mille
+        """
+        sample = min(1000, len(self))
+        words = self.words
+        used = sum(
+            words[HEADER_WORDS + ENTRY_WORDS * slot + 1] & USED != 0
+            and words[HEADER_WORDS + ENTRY_WORDS * slot + 1] >> AGE_SHIFT & 0xFF == self.age
+            for slot in range(sample)
+        )
+        return used * 1000 // sample
+
+
+# result of a worker: index of the worker, whether the search is finished, best packed move or 0,
+# score, depth, nodes, seconds and principal variation
+WorkerReport = Tuple[int, bool, int, int, int, int, float, List[int]]
+
+
+def _report(index: int, finished: bool, result: SearchResult) -> WorkerReport:
+    """
+    Helper function to turn a SearchResult into plain values that can be sent between processes.
+    """
+    code = result.move.code if result.move is not None else 0
+    return index, finished, code, result.score, result.depth, result.nodes, result.seconds, result.pv
+
+
+def _worker(index: int, table_name: str, table_size: int, evaluate: Callable[[Chessboard], int],
+            tasks: multiprocessing.Queue, reports: multiprocessing.Queue, stop_event) -> None:
+    """
+    Helper function that runs in a worker process and searches every position it is sent.
+    Worker 0 runs the main search and reports every finished depth.
+    """
+    table = SharedTranspositionTable(table_size, table_name)
+    searcher = Searcher(table, evaluate, stop_event)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            start_fen, codes, depth, nodes, time_limit = task
+
+            chessboard = Chessboard(start_fen)
+            for code in codes:
+                chessboard.make_packed_move(code)
+
+            if index == 0:
+                result = searcher.search(chessboard, depth, nodes, time_limit,
+                                         lambda result: reports.put(_report(index, False, result)))
+            else:
+                result = searcher.search(chessboard, depth, first_depth=1 + index % 2)
+            reports.put(_report(index, True, result))
+    finally:
+        table.close()
+
+
+class ParallelSearcher:
+    """
+    Lazy SMP search engine with the interface of the Searcher. The worker
+    processes and the shared table are kept between searches, close ends them.
+    """
+
+    def __init__(self, processes: Optional[int] = None, table_size: int = 1 << 20,
+                 evaluate: Callable[[Chessboard], int] = evaluate) -> None:
+        """
+        Args:
+            processes (int, optional): amount of searching processes. Defaults to the amount of CPUs.
+            table_size (int, optional): amount of entries of the shared table. Defaults to 1 << 20.
+            evaluate (Callable[[Chessboard], int], optional): static evaluation for the color to move,
+            it is sent to every process. Defaults to evaluation.evaluate.
+        """
+        self.processes = max(processes or os.cpu_count() or 1, 1)
+        self.table = SharedTranspositionTable(table_size)
+        self.evaluate = evaluate
+        self.stop_event = multiprocessing.Event()
+        self.reports: multiprocessing.Queue = multiprocessing.Queue()
+        self.tasks: List[multiprocessing.Queue] = []
+        self.workers: List[multiprocessing.Process] = []
+
+    def _start_workers(self) -> None:
+        """
+        Helper function to start the worker processes before the first search.
+        """
+        for index in range(self.processes):
+            tasks = multiprocessing.Queue()
+            worker = multiprocessing.Process(
+                target=_worker,
+                args=(index, self.table.name, len(self.table), self.evaluate, tasks, self.reports, self.stop_event),
+                daemon=True,
+            )
+            worker.start()
+            self.tasks.append(tasks)
+            self.workers.append(worker)
+
+    def close(self) -> None:
+        """
+        close ends the worker processes and removes the shared table.
+        """
+        for tasks in self.tasks:
+            tasks.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.tasks.clear()
+        self.workers.clear()
+        self.table.close()
+
+    def search(self, chessboard: Chessboard, depth: int = MAX_PLY, nodes: Optional[int] = None,
+               time_limit: Optional[float] = None,
+               info: Optional[Callable[[SearchResult], None]] = None) -> SearchResult:
+        """
+        search finds the best move of the color to move with all processes.
+
+        Args:
+            chessboard (Chessboard): board with the position, it is not changed
+            depth (int, optional): highest depth to search. Defaults to MAX_PLY.
+            nodes (int, optional): nodes of the main search after which the search stops. Defaults to no limit.
+            time_limit (float, optional): seconds after which the search stops. Defaults to no limit.
+            info (Callable[[SearchResult], None], optional): called with the result of every depth the
+            main search finishes. Defaults to None.
+
+        Returns:
+            SearchResult: result of the deepest finished iteration of all processes, with the nodes
+            of all processes and the time taken
+        """
+        start = time.perf_counter()
+        if not self.workers:
+            self._start_workers()
+
+        self.table.new_search()
+        self.stop_event.clear()
+        codes = [record.code for record in chessboard.move_stack]
+        for tasks in self.tasks:
+            tasks.put((chessboard.start_fen, codes, depth, nodes, time_limit))
+
+        results: List[Optional[WorkerReport]] = [None] * self.processes
+        while any(result is None for result in results):
+            try:
+                report = self.reports.get(timeout=1.0)
+            except queue.Empty:
+                if not all(worker.is_alive() for worker in self.workers):
+                    self.stop_event.set()
+                    raise RuntimeError("a search process ended unexpectedly")
+                continue
+
+            index, finished = report[0], report[1]
+            if not finished:
+                if info is not None:
+                    info(self._result(chessboard, report, report[5], report[6]))
+                continue
+            results[index] = report
+            if index == 0:
+                # the main search is done, the helpers answer with their last finished depth
+                self.stop_event.set()
+
+        # the deepest finished iteration wins, on equal depth the lower index. A helper stopped before it
+        # finished an iteration reports depth 0, reports without a move only count if all are without one.
+        with_move = [result for result in results if result[2]]
+        best = max(with_move, key=lambda result: (result[4], -result[0])) if with_move else results[0]
+        total_nodes = sum(result[5] for result in results)
+        return self._result(chessboard, best, total_nodes, time.perf_counter() - start)
+
+    @staticmethod
+    def _result(chessboard: Chessboard, report: WorkerReport, nodes: int, seconds: float) -> SearchResult:
+        """
+        Helper function to turn a report of a worker into a SearchResult for the board.
+        """
+        code, score, depth, pv = report[2], report[3], report[4], report[7]
+        move = Move.from_code(chessboard.figure_at(code & 63), code) if code else None
+        return SearchResult(move, score, depth, nodes, seconds, pv)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Search the best move of a position with several processes.")
+    parser.add_argument("--fen", default=STARTFEN, help="position to search")
+    parser.add_argument("--processes", type=int, help="searching processes, the amount of CPUs by default")
+    parser.add_argument("--depth", type=int, default=MAX_PLY, help="highest depth to search")
+    parser.add_argument("--nodes", type=int, help="nodes of the main search after which the search stops")
+    parser.add_argument("--time", type=float, help="seconds after which the search stops")
+    parser.add_argument("--hash", type=int, default=1 << 20, help="entries of the shared transposition table")
+    parser.add_argument("--network", help=".npz file of an NNUE network to evaluate with, see nnue.py")
+    args = parser.parse_args()
+    if args.depth == MAX_PLY and args.nodes is None and args.time is None:
+        args.time = 5.0
+
+    def print_info(result: SearchResult) -> None:
+        print(f"depth {result.depth} score {format_score(result.score)} nodes {result.nodes} "
+              f"time {result.seconds:.3f}s pv {' '.join(uci_from_code(code) for code in result.pv)}")
+
+    evaluator = NnueEvaluator(load_network(args.network)) if args.network else evaluate
+    searcher = ParallelSearcher(args.processes, args.hash, evaluator)
+    try:
+        result = searcher.search(Chessboard(args.fen), args.depth, args.nodes, args.time, print_info)
+        hashfull = searcher.table.hashfull()
+    finally:
+        searcher.close()
+    nps = result.nodes / result.seconds if result.seconds else 0
+    print(f"{searcher.processes} processes: depth {result.depth} nodes {result.nodes} time {result.seconds:.3f}s "
+          f"nps {nps:.0f} hashfull {hashfull}")
+    print(f"bestmove {result.move.uci() if result.move is not None else '(none)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""
+perft walks the legal move tree of a position to a fixed depth and counts the leaves.
+The counts are compared against known values to prove the move generator correct,
+the time taken gives the throughput of make_packed_move, unmake_packed_move
+and generate_packed_moves.
+
+The root moves of a position, or a batch of positions, can be spread over a
+process pool. Every worker rebuilds its own board from the FEN.
+
+Usage:
+    python perft.py --fen "<fen>" --depth 3 --divide
+    python perft.py --suite --depth 3
+    python perft.py --fen "<fen>" --depth 5 --processes 32
+    python perft.py --count-moves positions.txt --processes 32 --chunk 100000
+"""
+import argparse
+import itertools
+import multiprocessing
+import multiprocessing.pool
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from constants import STARTFEN
+from chessboard import Chessboard
+from fen import read_fens
+from moveGenerator import MoveGenerator
+from move import uci_from_code
+
+
+class ReferencePosition(NamedTuple):
+    name: str
+    fen: str
+    nodes: List[int]
+
+
+class PerftResult(NamedTuple):
+    fen: str
+    depth: int
+    nodes: int
+    divide: Dict[str, int]
+    seconds: float
+    nodes_per_second: float
+
+
+# node counts from https://www.chessprogramming.org/Perft_Results, index 0 is depth 1
+REFERENCE_POSITIONS = [
+    ReferencePosition(
+        "initial position",
+        STARTFEN,
+        [20, 400, 8902, 197281, 4865609],
+    ),
+    ReferencePosition(
+        "kiwipete",
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        [48, 2039, 97862, 4085603],
+    ),
+    ReferencePosition(
+        "position 3",
+        "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        [14, 191, 2812, 43238, 674624],
+    ),
+    ReferencePosition(
+        "position 4",
+        "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        [6, 264, 9467, 422333],
+    ),
+    ReferencePosition(
+        "position 5",
+        "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+        [44, 1486, 62379, 2103487],
+    ),
+    ReferencePosition(
+        "position 6",
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        [46, 2079, 89890, 3894594],
+    ),
+]
+
+
+def perft(chessboard: Chessboard, move_generator: MoveGenerator, depth: int) -> int:
+    """
+    perft counts the leaf nodes of the legal move tree.
+
+    Args:
+        chessboard (Chessboard): board with the position to search, it is restored afterwards
+        move_generator (MoveGenerator): generator working on the chessboard
+        depth (int): depth in half moves
+
+    Returns:
+        int: amount of leaf nodes
+    """
+    if depth == 0:
+        return 1
+
+    # bulk counting, the moves of the last ply do not have to be played
+    if depth == 1:
+        return move_generator.count_legal_moves()
+
+    nodes = 0
+    for code in move_generator.generate_packed_moves():
+        chessboard.make_packed_move(code)
+        nodes += perft(chessboard, move_generator, depth - 1)
+        chessboard.unmake_packed_move()
+
+    return nodes
+
+
+def divide(chessboard: Chessboard, move_generator: MoveGenerator, depth: int) -> Dict[str, int]:
+    """
+    divide splits the perft count by the moves of the root position.
+
+    Args:
+        chessboard (Chessboard): board with the position to search
+        move_generator (MoveGenerator): generator working on the chessboard
+        depth (int): depth in half moves, at least 1
+
+    Returns:
+        Dict[str, int]: UCI move -> leaf nodes below it
+    """
+    nodes_per_move = {}
+    for code in move_generator.generate_packed_moves():
+        chessboard.make_packed_move(code)
+        nodes_per_move[uci_from_code(code)] = perft(chessboard, move_generator, depth - 1)
+        chessboard.unmake_packed_move()
+
+    return nodes_per_move
+
+
+def run_perft(fen: str, depth: int) -> PerftResult:
+    """
+    run_perft sets up a board without display and times a divide of the position.
+
+    Args:
+        fen (str): FEN string of the position
+        depth (int): depth in half moves, at least 1
+
+    Returns:
+        PerftResult: node count, divide and timing of the run
+    """
+    if depth < 1:
+        raise ValueError(f"perft depth has to be at least 1, got {depth}")
+
+    chessboard = Chessboard(fen)
+    move_generator = MoveGenerator(chessboard)
+
+    start = time.perf_counter()
+    nodes_per_move = divide(chessboard, move_generator, depth)
+    seconds = time.perf_counter() - start
+
+    nodes = sum(nodes_per_move.values())
+    nodes_per_second = nodes / seconds if seconds > 0 else float("inf")
+
+    return PerftResult(fen, depth, nodes, nodes_per_move, seconds, nodes_per_second)
+
+
+def _perft_root_move(task: Tuple[str, str, int]) -> Tuple[str, int]:
+    """
+    _perft_root_move is the pool worker of run_parallel_perft, it counts the tree below one root move.
+
+    Args:
+        task (Tuple[str, str, int]): FEN of the root position, UCI root move and depth of the root
+
+    Returns:
+        Tuple[str, int]: UCI root move and the leaf nodes below it
+    """
+    fen, move_name, depth = task
+    chessboard = Chessboard(fen)
+    move_generator = MoveGenerator(chessboard)
+
+    for code in move_generator.generate_packed_moves():
+        if uci_from_code(code) == move_name:
+            chessboard.make_packed_move(code)
+            return move_name, perft(chessboard, move_generator, depth - 1)
+
+    raise ValueError(f"{move_name} is not a legal move in {fen}")
+
+
+def run_parallel_perft(fen: str, depth: int, processes: Optional[int] = None) -> PerftResult:
+    """
+    run_parallel_perft splits the root moves over a process pool and merges the divide in move generation order.
+
+    Args:
+        fen (str): FEN string of the position
+        depth (int): depth in half moves, at least 1
+        processes (int, optional): size of the pool. Defaults to the amount of CPUs.
+
+    Returns:
+        PerftResult: node count, divide and timing of the run
+    """
+    if depth < 1:
+        raise ValueError(f"perft depth has to be at least 1, got {depth}")
+
+    chessboard = Chessboard(fen)
+    move_generator = MoveGenerator(chessboard)
+
+    start = time.perf_counter()
+    tasks = [(fen, uci_from_code(code), depth) for code in move_generator.generate_packed_moves()]
+    with multiprocessing.Pool(processes) as pool:
+        # one root move per task, the subtrees differ a lot in size
+        results = pool.map(_perft_root_move, tasks, chunksize=1)
+    seconds = time.perf_counter() - start
+
+    nodes_per_move = dict(results)
+    nodes = sum(nodes_per_move.values())
+    nodes_per_second = nodes / seconds if seconds > 0 else float("inf")
+
+    return PerftResult(fen, depth, nodes, nodes_per_move, seconds, nodes_per_second)
+
+
+def _count_legal_moves(fen: str) -> int:
+    """
+    _count_legal_moves is the pool worker of count_legal_moves_batch.
+
+    Args:
+        fen (str): FEN string of the position
+
+    Returns:
+        int: amount of legal moves in the position
+    """
+    chessboard = Chessboard(fen)
+    return MoveGenerator(chessboard).count_legal_moves()
+
+
+def count_legal_moves_batch(fens: Iterable[str], processes: Optional[int] = None, chunksize: int = 64,
+                            pool: Optional[multiprocessing.pool.Pool] = None) -> List[int]:
+    """
+    count_legal_moves_batch counts the legal moves of many positions on a process pool.
+
+    Args:
+        fens (Iterable[str]): FEN strings of the positions
+        processes (int, optional): size of the pool. Defaults to the amount of CPUs.
+        chunksize (int, optional): positions sent to a worker at once. Defaults to 64.
+        pool (multiprocessing.pool.Pool, optional): running pool to use instead of starting one,
+        e.g. to count a file chunk by chunk. Defaults to None.
+
+    Returns:
+        List[int]: amount of legal moves, in the order of the positions
+    """
+    if pool is not None:
+        return list(pool.imap(_count_legal_moves, fens, chunksize=chunksize))
+    with multiprocessing.Pool(processes) as pool:
+        return list(pool.imap(_count_legal_moves, fens, chunksize=chunksize))
+
+
+def run_suite(depth: int, positions: Optional[List[ReferencePosition]] = None, processes: int = 1) -> bool:
+    """
+    run_suite checks the reference positions up to the given depth and prints the results.
+
+    Args:
+        depth (int): maximum depth, positions without a known count that deep are searched to their deepest count
+        positions (List[ReferencePosition], optional): positions to check. Defaults to REFERENCE_POSITIONS.
+        processes (int, optional): size of the process pool, 1 searches in this process. Defaults to 1.
+
+    Returns:
+        bool: True if every count matched
+    """
+    if positions is None:
+        positions = REFERENCE_POSITIONS
+
+    all_passed = True
+    total_nodes = 0
+    total_seconds = 0.0
+
+    for position in positions:
+        position_depth = min(depth, len(position.nodes))
+        if processes == 1:
+            result = run_perft(position.fen, position_depth)
+        else:
+            result = run_parallel_perft(position.fen, position_depth, processes)
+        expected = position.nodes[position_depth - 1]
+        passed = result.nodes == expected
+        all_passed = all_passed and passed
+
+        total_nodes += result.nodes
+        total_seconds += result.seconds
+
+        status = "ok" if passed else f"FAILED, expected {expected}"
+        print(f"{position.name:<18} depth {position_depth}: {result.nodes:>10} nodes "
+              f"{result.seconds:8.2f}s {result.nodes_per_second:>10.0f} nps  {status}")
+
+    if total_seconds > 0:
+        print(f"total: {total_nodes} nodes in {total_seconds:.2f}s ({total_nodes / total_seconds:.0f} nps)")
+
+    return all_passed
+
+
+def print_result(result: PerftResult) -> None:
+    """
+    print_result prints a divide in the usual "move: nodes" layout followed by the totals.
+
+    Args:
+        result (PerftResult): result to print
+    """
+    for move_name, nodes in sorted(result.divide.items()):
+        print(f"{move_name}: {nodes}")
+
+    print()
+    print(f"Nodes searched: {result.nodes}")
+    print(f"Time: {result.seconds:.3f}s ({result.nodes_per_second:.0f} nps)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Count the legal move tree of a position.")
+    parser.add_argument("--fen", default=STARTFEN, help="position to search")
+    parser.add_argument("--depth", type=int, default=3, help="depth in half moves")
+    parser.add_argument("--divide", action="store_true", help="print the node count of every root move")
+    parser.add_argument("--suite", action="store_true", help="check the built-in reference positions")
+    parser.add_argument("--processes", type=int, default=1, help="size of the process pool, 0 uses every CPU")
+    parser.add_argument("--count-moves", metavar="FILE", help="count the legal moves of every position in a FEN or EPD file, may be gzip compressed")
+    parser.add_argument("--chunk", type=int, default=65536, help="positions of --count-moves loaded into memory at once")
+    args = parser.parse_args()
+
+    processes = args.processes or None
+
+    if args.suite:
+        passed = run_suite(args.depth, processes=processes)
+        raise SystemExit(0 if passed else 1)
+
+    if args.count_moves:
+        fens = read_fens(args.count_moves)
+        positions = 0
+        seconds = 0.0
+
+        # the pool is started once, only a chunk of the file is held in memory at a time
+        with multiprocessing.Pool(processes) as pool:
+            while True:
+                chunk = list(itertools.islice(fens, args.chunk))
+                if not chunk:
+                    break
+
+                start = time.perf_counter()
+                counts = count_legal_moves_batch(chunk, pool=pool)
+                seconds += time.perf_counter() - start
+                positions += len(chunk)
+
+                for fen, count in zip(chunk, counts):
+                    print(f"{count}\t{fen}")
+        print(f"{positions} positions in {seconds:.3f}s")
+        return
+
+    if processes == 1:
+        result = run_perft(args.fen, args.depth)
+    else:
+        result = run_parallel_perft(args.fen, args.depth, processes)
+    if args.divide:
+        print_result(result)
+    else:
+        print(f"Nodes searched: {result.nodes}")
+        print(f"Time: {result.seconds:.3f}s ({result.nodes_per_second:.0f} nps)")
+
+
+if __name__ == "__main__":
+    main()
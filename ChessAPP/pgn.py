@@ -0,0 +1,382 @@
+"""
+Reading, replaying and writing of games in PGN.
+
+read_games streams the games of a PGN file, gzip compressed or not. Only one
+game is held in memory at a time, so dumps of any size can be read.
+replay_game plays the SAN moves of a game on a Chessboard through the move
+index of the move generator, write_game turns the moves played on a board
+back into PGN.
+
+Usage:
+    python pgn.py games.pgn.gz
+    python pgn.py games.pgn --processes 32
+"""
+import argparse
+import datetime
+import itertools
+import multiprocessing
+import re
+import time
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from constants import STARTFEN
+from chessboard import Chessboard
+from fen import open_text
+from move import PROMOTION, PROMOTION_FIGURES
+from moveGenerator import MoveGenerator
+
+
+class PgnGame(NamedTuple):
+    headers: Dict[str, str]
+    moves: List[str]
+    result: str
+
+
+class ReplayStats(NamedTuple):
+    games: int
+    plies: int
+    errors: int
+    seconds: float
+    games_per_second: float
+
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+# tag pairs every PGN game starts with, in this order
+SEVEN_TAG_ROSTER = ("Event", "Site", "Date", "Round", "White", "Black", "Result")
+
+# greedy value, some writers leave quotes inside the value unescaped
+HEADER = re.compile(r'\[\s*(\w+)\s+"(.*)"\s*\]')
+MOVETEXT_TOKEN = re.compile(r"\{[^}]*\}?|;[^\n]*|\(|\)|\$\d+|[^\s(){};]+")
+MOVE_NUMBER = re.compile(r"^\d+\.*")
+
+LINE_LENGTH = 80
+
+
+def _parse_movetext(movetext: str) -> Tuple[List[str], Optional[str]]:
+    """
+    Helper function to pick the SAN moves and the result out of the movetext of a game.
+    Comments, variations, NAGs, move numbers and annotation marks are dropped.
+
+    Returns:
+        Tuple[List[str], Optional[str]]: SAN moves and the result, None if the movetext has no result
+    """
+    moves = []
+    result = None
+    variation_depth = 0
+
+    for token in MOVETEXT_TOKEN.findall(movetext):
+        if token[0] in "{;$":
+            continue
+        if token == "(":
+            variation_depth += 1
+            continue
+        if token == ")":
+            variation_depth = max(variation_depth - 1, 0)
+            continue
+        if variation_depth:
+            continue
+        if token in RESULTS:
+            result = token
+            continue
+
+        san = MOVE_NUMBER.sub("", token).rstrip("!?")
+        if san:
+            moves.append(san)
+
+    return moves, result
+
+
+def parse_games(lines: Iterable[str]) -> Iterator[PgnGame]:
+    """
+    parse_games splits PGN text into games while it is read.
+
+    Args:
+        lines (Iterable[str]): lines of PGN text
+
+    Yields:
+        PgnGame: tag pairs, SAN moves and result of every game
+    """
+    headers = {}
+    movetext = []
+
+    for line in lines:
+        line = line.strip()
+        if not line or line[0] == "%":
+            continue
+
+        header = HEADER.fullmatch(line)
+        if header:
+            # a game without result ends when the tag pairs of the next one start
+            if movetext:
+                moves, result = _parse_movetext("\n".join(movetext))
+                yield PgnGame(headers, moves, result or headers.get("Result", "*"))
+                headers = {}
+                movetext = []
+            headers[header.group(1)] = header.group(2).replace('\\"', '"').replace("\\\\", "\\")
+            continue
+
+        movetext.append(line)
+        if line.split()[-1] in RESULTS:
+            moves, result = _parse_movetext("\n".join(movetext))
+            yield PgnGame(headers, moves, result or headers.get("Result", "*"))
+            headers = {}
+            movetext = []
+
+    if movetext or headers:
+        moves, result = _parse_movetext("\n".join(movetext))
+        yield PgnGame(headers, moves, result or headers.get("Result", "*"))
+
+
+def read_games(path: str) -> Iterator[PgnGame]:
+    """
+    read_games streams the games of a PGN file.
+
+    Args:
+        path (str): path of the file, may be gzip compressed
+
+    Yields:
+        PgnGame: tag pairs, SAN moves and result of every game
+    """
+    with open_text(path) as pgn_file:
+        yield from parse_games(pgn_file)
+
+
+def replay_game(game: PgnGame, chessboard: Optional[Chessboard] = None) -> Chessboard:
+    """
+    replay_game plays the moves of a game on a board.
+
+    Args:
+        game (PgnGame): game to replay
+        chessboard (Chessboard, optional): board to play on, it is set to the start position of the game.
+        Defaults to a new board.
+
+    Raises:
+        ValueError: if a move of the game is not legal
+
+    Returns:
+        Chessboard: board after the last move of the game
+    """
+    start_fen = game.headers.get("FEN", STARTFEN)
+    if chessboard is None:
+        chessboard = Chessboard(start_fen)
+    else:
+        chessboard.create_board(start_fen)
+    move_generator = MoveGenerator(chessboard)
+
+    for ply, san in enumerate(game.moves):
+        move = move_generator.generateMoves().by_san(san)
+        if move is None:
+            raise ValueError(f"illegal move {san!r} at ply {ply + 1} in {chessboard.generate_fen_from_current_position()}")
+        chessboard.make_move(move)
+
+    return chessboard
+
+
+def game_result(chessboard: Chessboard, move_generator: Optional[MoveGenerator] = None) -> str:
+    """
+    game_result decides the result of a game from its final position.
+
+    Args:
+        chessboard (Chessboard): board with the final position
+        move_generator (MoveGenerator, optional): generator working on the board. Defaults to a new one.
+
+    Returns:
+        str: "1-0" or "0-1" for checkmate, "1/2-1/2" for stalemate and "*" for a game that is not over
+    """
+    if move_generator is None:
+        move_generator = MoveGenerator(chessboard)
+    if move_generator.has_legal_move():
+        return "*"
+    if move_generator.check_for_checks() == 0:
+        return "1/2-1/2"
+    return "0-1" if chessboard.color_to_move == 0b0 else "1-0"
+
+
+def game_sans(chessboard: Chessboard) -> List[str]:
+    """
+    game_sans names the moves played on a board in SAN, including check and mate marks.
+
+    Args:
+        chessboard (Chessboard): board the moves were played on since create_board
+
+    Returns:
+        List[str]: SAN of every move
+    """
+    replay = Chessboard(chessboard.start_fen)
+    move_generator = MoveGenerator(replay)
+
+    sans = []
+    for record in chessboard.move_stack:
+        moves = move_generator.generateMoves()
+        move = moves.get(record.code & 63, record.code >> 6 & 63, _promotion_type(record.code))
+        san = moves.san(move)
+
+        replay.make_move(move)
+        if move_generator.check_for_checks():
+            san += "+" if move_generator.has_legal_move() else "#"
+        sans.append(san)
+
+    return sans
+
+
+def _promotion_type(code: int) -> Optional[str]:
+    """
+    Helper function to read the promotion figure type of a packed move, None for other moves.
+    """
+    if not code >> 12 & PROMOTION:
+        return None
+    return PROMOTION_FIGURES[code >> 12 & 3].TYPE
+
+
+def format_game(headers: Dict[str, str], sans: List[str], result: str, start_fen: str = STARTFEN) -> str:
+    """
+    format_game writes a game in PGN with the seven tag roster first and lines of at most 80 characters.
+
+    Args:
+        headers (Dict[str, str]): tag pairs, missing roster tags are filled with "?"
+        sans (List[str]): moves in SAN
+        result (str): result of the game
+        start_fen (str, optional): start position of the game. Defaults to STARTFEN.
+
+    Returns:
+        str: PGN text of the game ending with an empty line
+    """
+    headers = dict(headers)
+    headers["Result"] = result
+    if start_fen != STARTFEN:
+        headers["SetUp"] = "1"
+        headers["FEN"] = start_fen
+
+    tags = list(SEVEN_TAG_ROSTER) + [tag for tag in headers if tag not in SEVEN_TAG_ROSTER]
+    lines = []
+    for tag in tags:
+        value = headers.get(tag, "????.??.??" if tag == "Date" else "?")
+        value = value.replace("\\", "\\\\").replace('"', '\\"')
+        lines.append(f'[{tag} "{value}"]')
+    lines.append("")
+
+    start_fields = start_fen.split()
+    game_turn = int(start_fields[5]) if len(start_fields) > 5 else 1
+    black_to_move = len(start_fields) > 1 and start_fields[1] == "b"
+
+    tokens = []
+    for ply, san in enumerate(sans, start=1 if black_to_move else 0):
+        move_number = game_turn + ply // 2
+        if ply % 2 == 0:
+            tokens.append(f"{move_number}. {san}")
+        elif not tokens:
+            tokens.append(f"{move_number}... {san}")
+        else:
+            tokens.append(san)
+    tokens.append(result)
+
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_LENGTH:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+
+    return "\n".join(lines) + "\n\n"
+
+
+def write_game(path: str, chessboard: Chessboard, headers: Optional[Dict[str, str]] = None, append: bool = False) -> None:
+    """
+    write_game saves the moves played on a board as PGN, e.g. the game of the app.
+
+    Args:
+        path (str): path of the PGN file
+        chessboard (Chessboard): board the game was played on
+        headers (Dict[str, str], optional): tag pairs like "White" and "Black". Defaults to the date only.
+        append (bool, optional): add the game to the end of the file instead of replacing it. Defaults to False.
+    """
+    headers = dict(headers or {})
+    headers.setdefault("Date", datetime.date.today().strftime("%Y.%m.%d"))
+
+    result = game_result(chessboard)
+    text = format_game(headers, game_sans(chessboard), result, chessboard.start_fen)
+    with open(path, "a" if append else "w", encoding="utf-8") as pgn_file:
+        pgn_file.write(text)
+
+
+def _replay(game: PgnGame) -> Tuple[int, Optional[str]]:
+    """
+    _replay is the pool worker of replay_games.
+
+    Args:
+        game (PgnGame): game to replay
+
+    Returns:
+        Tuple[int, Optional[str]]: amount of moves in the game and the error, None if all moves were legal
+    """
+    try:
+        replay_game(game)
+    except ValueError as error:
+        return len(game.moves), str(error)
+    return len(game.moves), None
+
+
+def replay_games(games: Iterable[PgnGame], processes: Optional[int] = 1, batch_size: int = 4096) -> ReplayStats:
+    """
+    replay_games replays many games to check them, optionally on a process pool.
+    The games are read in batches, so only batch_size games are in memory at once.
+
+    Args:
+        games (Iterable[PgnGame]): games to replay, e.g. from read_games
+        processes (int, optional): size of the process pool, 1 replays in this process, None uses every CPU. Defaults to 1.
+        batch_size (int, optional): games handed to the pool at once. Defaults to 4096.
+
+    Returns:
+        ReplayStats: amount of games, moves and illegal games and the time taken
+    """
+    games = iter(games)
+    game_count = 0
+    plies = 0
+    errors = 0
+
+    pool = multiprocessing.Pool(processes) if processes != 1 else None
+    start = time.perf_counter()
+    try:
+        while True:
+            batch = list(itertools.islice(games, batch_size))
+            if not batch:
+                break
+
+            if pool is None:
+                results = map(_replay, batch)
+            else:
+                results = pool.imap(_replay, batch, chunksize=16)
+
+            for moves, error in results:
+                game_count += 1
+                plies += moves
+                if error is not None:
+                    errors += 1
+                    print(f"game {game_count}: {error}")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    seconds = time.perf_counter() - start
+
+    games_per_second = game_count / seconds if seconds > 0 else float("inf")
+    return ReplayStats(game_count, plies, errors, seconds, games_per_second)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay every game of a PGN file and report the throughput.")
+    parser.add_argument("file", help="PGN file, may be gzip compressed")
+    parser.add_argument("--processes", type=int, default=1, help="size of the process pool, 0 uses every CPU")
+    parser.add_argument("--batch-size", type=int, default=4096, help="games read into memory at once")
+    args = parser.parse_args()
+
+    stats = replay_games(read_games(args.file), args.processes or None, args.batch_size)
+    print(f"{stats.games} games, {stats.plies} moves, {stats.errors} with illegal moves")
+    print(f"Time: {stats.seconds:.3f}s ({stats.games_per_second:.0f} games/s)")
+
+
+if __name__ == "__main__":
+    main()
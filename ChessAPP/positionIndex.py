@@ -0,0 +1,335 @@
+"""
+Index from the Zobrist key of a position to every game of a game database
+that reached it.
+
+The index file holds three arrays of the same length, sorted by key, so a
+position is found by binary search on the memory-mapped key array:
+
+    header          32 bytes, see HEADER_FORMAT
+    keys            uint64 Zobrist key of every position of every game
+    games           uint32 number of the game in the database
+    plies           uint16 half moves played in the game before the position
+
+The index is built like an external sort. The games are replayed on a
+process pool and the positions are written to bucket files by the top
+bits of their key. The buckets are then sorted one after another, so
+memory is bounded by the size of one bucket, not by the size of the database.
+
+Usage:
+    python positionIndex.py import games.pgn.gz games.db games.idx --processes 8
+    python positionIndex.py build games.db games.idx --processes 8
+    python positionIndex.py query games.db games.idx --fen "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+"""
+import argparse
+import array
+import glob
+import multiprocessing
+import os
+import struct
+import tempfile
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from constants import STARTFEN
+from chessboard import Chessboard
+from gamedb import GameDatabase, import_pgn
+from move import uci_from_code
+from moveGenerator import MoveGenerator
+
+MAGIC = b"PYCHESIX"
+# version 2 hashes the en passant file only if a pawn can capture, older indexes miss transpositions
+VERSION = 2
+
+# magic, version, amount of positions and amount of games of the database
+HEADER_FORMAT = "<8sI4xQQ"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# one position while the index is built
+ENTRY = np.dtype([("key", "<u8"), ("game", "<u4"), ("ply", "<u2")])
+
+# positions a worker collects before they are written to the bucket files
+FLUSH_ENTRIES = 1 << 20
+
+
+class MoveStatistic(NamedTuple):
+    uci: str
+    san: str
+    games: int
+    white_wins: int
+    draws: int
+    black_wins: int
+
+
+def _flush(entries: Tuple[array.array, array.array, array.array], directory: str, chunk: int, bucket_bits: int) -> None:
+    """
+    Helper function to append the collected positions of a worker to the bucket files and empty the buffers.
+    """
+    keys, games, plies = entries
+    if not keys:
+        return
+    records = np.empty(len(keys), dtype=ENTRY)
+    records["key"] = np.frombuffer(keys, dtype=np.uint64)
+    records["game"] = np.frombuffer(games, dtype=np.uint32)
+    records["ply"] = np.frombuffer(plies, dtype=np.uint16)
+
+    buckets = records["key"] >> np.uint64(64 - bucket_bits)
+    records = records[np.argsort(buckets, kind="stable")]
+    bounds = np.searchsorted(np.sort(buckets), np.arange((1 << bucket_bits) + 1))
+
+    for bucket in range(1 << bucket_bits):
+        if bounds[bucket] == bounds[bucket + 1]:
+            continue
+        with open(os.path.join(directory, f"{bucket:05d}_{chunk:06d}.bin"), "ab") as bucket_file:
+            records[bounds[bucket]:bounds[bucket + 1]].tofile(bucket_file)
+
+    for buffer in entries:
+        del buffer[:]
+
+
+def _collect_positions(task: Tuple[str, int, int, str, int, int]) -> int:
+    """
+    _collect_positions is the pool worker of build_index, it replays a range of games.
+
+    Args:
+        task (Tuple[str, int, int, str, int, int]): database path, first and last game,
+        directory of the bucket files, number of the range and bits of the bucket number
+
+    Returns:
+        int: amount of collected positions
+    """
+    database_path, first_game, last_game, directory, chunk, bucket_bits = task
+    entries = (array.array("Q"), array.array("I"), array.array("H"))
+    keys, games, plies = entries
+    positions = 0
+    chessboard = Chessboard()
+
+    with GameDatabase(database_path) as database:
+        for game_id in range(first_game, last_game):
+            chessboard.create_board(database.start_fen(game_id))
+            keys.append(chessboard.zobrist_key)
+            games.append(game_id)
+            plies.append(0)
+
+            for ply, code in enumerate(database.moves(game_id).tolist(), 1):
+                chessboard.make_packed_move(code)
+                keys.append(chessboard.zobrist_key)
+                games.append(game_id)
+                plies.append(ply)
+
+            if len(keys) >= FLUSH_ENTRIES:
+                positions += len(keys)
+                _flush(entries, directory, chunk, bucket_bits)
+
+    positions += len(keys)
+    _flush(entries, directory, chunk, bucket_bits)
+    return positions
+
+
+def build_index(database_path: str, path: str, processes: Optional[int] = None,
+                games_per_task: int = 20000, bucket_bits: int = 8) -> int:
+    """
+    build_index writes the position index of a game database.
+
+    Args:
+        database_path (str): path of the game database
+        path (str): path of the index file, an existing file is replaced
+        processes (int, optional): size of the process pool, 1 builds in this process. Defaults to every CPU.
+        games_per_task (int, optional): games replayed by one task of the pool. Defaults to 20000.
+        bucket_bits (int, optional): top key bits that choose the bucket, memory needed for sorting
+        shrinks by half with every bit. Defaults to 8.
+
+    Returns:
+        int: amount of indexed positions
+    """
+    with GameDatabase(database_path) as database:
+        game_count = len(database)
+
+    directory = tempfile.mkdtemp(prefix="positions_", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        tasks = [
+            (database_path, first_game, min(first_game + games_per_task, game_count), directory, chunk, bucket_bits)
+            for chunk, first_game in enumerate(range(0, game_count, games_per_task))
+        ]
+        if processes == 1:
+            entry_count = sum(map(_collect_positions, tasks))
+        else:
+            with multiprocessing.Pool(processes) as pool:
+                entry_count = sum(pool.imap_unordered(_collect_positions, tasks))
+
+        keys_offset = HEADER_SIZE
+        games_offset = keys_offset + 8 * entry_count
+        plies_offset = games_offset + 4 * entry_count
+
+        with open(path, "wb") as index_file:
+            index_file.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, entry_count, game_count))
+            index_file.truncate(plies_offset + 2 * entry_count)
+
+            position = 0
+            for bucket in range(1 << bucket_bits):
+                # the file names sort by range, so positions of one key stay ordered by game
+                bucket_files = sorted(glob.glob(os.path.join(directory, f"{bucket:05d}_*.bin")))
+                if not bucket_files:
+                    continue
+                records = np.concatenate([np.fromfile(bucket_file, dtype=ENTRY) for bucket_file in bucket_files])
+                records = records[np.argsort(records["key"], kind="stable")]
+
+                for offset, column in ((keys_offset, "key"), (games_offset, "game"), (plies_offset, "ply")):
+                    index_file.seek(offset + records.dtype[column].itemsize * position)
+                    np.ascontiguousarray(records[column]).tofile(index_file)
+                position += len(records)
+
+                for bucket_file in bucket_files:
+                    os.remove(bucket_file)
+    finally:
+        for bucket_file in glob.glob(os.path.join(directory, "*.bin")):
+            os.remove(bucket_file)
+        os.rmdir(directory)
+
+    return entry_count
+
+
+class PositionIndex:
+    """
+    Read access to an index file written by build_index, together with the
+    game database it was built from.
+    """
+
+    def __init__(self, path: str, database: GameDatabase) -> None:
+        with open(path, "rb") as index_file:
+            magic, version, entry_count, game_count = struct.unpack(HEADER_FORMAT, index_file.read(HEADER_SIZE))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is no position index of version {VERSION}")
+        if game_count != len(database):
+            raise ValueError(f"{path} indexes {game_count} games, the database has {len(database)}")
+
+        self.database = database
+        self.keys = np.memmap(path, dtype="<u8", mode="r", offset=HEADER_SIZE, shape=(entry_count,))
+        self.games = np.memmap(path, dtype="<u4", mode="r", offset=HEADER_SIZE + 8 * entry_count, shape=(entry_count,))
+        self.plies = np.memmap(path, dtype="<u2", mode="r", offset=HEADER_SIZE + 12 * entry_count, shape=(entry_count,))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, zobrist_key: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        lookup finds every occurrence of a position by binary search.
+
+        Args:
+            zobrist_key (int): Zobrist key of the position
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: numbers of the games and plies at which the position was reached
+        """
+        key = np.uint64(zobrist_key)
+        first = np.searchsorted(self.keys, key, side="left")
+        last = np.searchsorted(self.keys, key, side="right")
+        return np.asarray(self.games[first:last]), np.asarray(self.plies[first:last])
+
+    def find_games(self, chessboard: Chessboard) -> np.ndarray:
+        """
+        find_games finds the games that reached the position on the board.
+
+        Args:
+            chessboard (Chessboard): board with the position
+
+        Returns:
+            np.ndarray: sorted numbers of the games
+        """
+        games, _ = self.lookup(chessboard.zobrist_key)
+        return np.unique(games)
+
+    def move_statistics(self, chessboard: Chessboard) -> List[MoveStatistic]:
+        """
+        move_statistics counts the moves played in the position on the board and the results they led to.
+        A game that reached the position more than once counts once per different move.
+
+        Args:
+            chessboard (Chessboard): board with the position
+
+        Returns:
+            List[MoveStatistic]: statistics of every move played, the most played first
+        """
+        games, plies = self.lookup(chessboard.zobrist_key)
+        database = self.database
+
+        # the position after the last move of a game has no next move
+        move_positions = database.move_index[games].astype(np.int64) + plies
+        played = move_positions < database.move_index[games + 1].astype(np.int64)
+        games = games[played]
+        codes = database.move_data[move_positions[played]].astype(np.int64)
+
+        pairs = np.unique(games.astype(np.int64) << 16 | codes)
+        games = pairs >> 16
+        codes = pairs & 0xFFFF
+        results = database.results[games]
+
+        moves = MoveGenerator(chessboard).generateMoves()
+        statistics = []
+        for code in np.unique(codes).tolist():
+            move_results = results[codes == code]
+            move = moves.get(code & 63, code >> 6 & 63, uci_from_code(code)[4:] or None)
+            statistics.append(MoveStatistic(
+                uci_from_code(code),
+                moves.san(move) if move is not None else "?",
+                len(move_results),
+                int(np.count_nonzero(move_results == 0)),
+                int(np.count_nonzero(move_results == 2)),
+                int(np.count_nonzero(move_results == 1)),
+            ))
+
+        statistics.sort(key=lambda statistic: statistic.games, reverse=True)
+        return statistics
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Position index of a game database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="index every position of a game database")
+    build_parser.add_argument("database", help="game database file")
+    build_parser.add_argument("index", help="index file to write")
+    build_parser.add_argument("--processes", type=int, default=0, help="size of the process pool, 0 uses every CPU")
+
+    import_parser = commands.add_parser("import", help="store the games of a PGN file in a new database and index them")
+    import_parser.add_argument("pgn", help="PGN file, may be gzip compressed")
+    import_parser.add_argument("database", help="database file to write")
+    import_parser.add_argument("index", help="index file to write")
+    import_parser.add_argument("--processes", type=int, default=0, help="size of the process pool, 0 uses every CPU")
+
+    query_parser = commands.add_parser("query", help="print the moves played in a position")
+    query_parser.add_argument("database", help="game database file")
+    query_parser.add_argument("index", help="index file")
+    query_parser.add_argument("--fen", default=STARTFEN, help="position to look up")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        stats = import_pgn(args.pgn, args.database)
+        print(f"{stats.games} games with {stats.moves} moves stored, {stats.skipped} skipped in {stats.seconds:.3f}s")
+
+    if args.command in ("import", "build"):
+        start = time.perf_counter()
+        entry_count = build_index(args.database, args.index, args.processes or None)
+        seconds = time.perf_counter() - start
+        print(f"{entry_count} positions indexed")
+        print(f"Time: {seconds:.3f}s ({entry_count / seconds if seconds else 0:.0f} positions/s)")
+        return
+
+    with GameDatabase(args.database) as database:
+        index = PositionIndex(args.index, database)
+        chessboard = Chessboard(args.fen)
+
+        start = time.perf_counter()
+        statistics = index.move_statistics(chessboard)
+        seconds = time.perf_counter() - start
+
+        print(f"{len(index.find_games(chessboard))} games reached the position")
+        for statistic in statistics:
+            print(f"{statistic.san:8} {statistic.games:8} games  "
+                  f"+{statistic.white_wins} ={statistic.draws} -{statistic.black_wins}")
+        print(f"Time: {seconds * 1000:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,9 @@ from fish import Bot
 from constants import *
 from chessboard import *
 from moveGenerator import MoveGenerator
+from boardRenderer import BoardRenderer
 from move import Move
+from pgn import write_game
 from tkinter import messagebox
 from chessCam import ChessCam
 from chessboard import square_name_to_index, index_to_square_name
@@ -59,6 +61,12 @@ class Pychess():
             manager=self.manager
         )
 
+        self.save_pgn_button = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((WIDTH - 250, 460), (180, 40)),
+            text="Save PGN",
+            manager=self.manager
+        )
+
         self.queen_promotion = pygame_gui.elements.UIButton(
             relative_rect=pygame.Rect((WIDTH-250, 400), (40, 40)),
             text='Q',
@@ -87,22 +95,20 @@ class Pychess():
         while True:
             time_delta = self.clock.tick(60) / 1000.0
             self.manager.update(time_delta)
-            pos_x, pos_y, fig = self.chessboard.get_square_under_mouse()
-            moves: list[Move] = self.moveGenerator.generateMoves()
-            
-            if not moves:
+            pos_x, pos_y, fig = self.renderer.get_square_under_mouse()
+            if not self.moveGenerator.has_legal_move():
                 return
             
             if self.chessboard.color_to_move == self.player_color and not self.manual_input_state and len(positions) == 2:
                 camMove = self.chessCam.get_move(positions[0], positions[1])
                 if len(camMove) == 2:
                     playerMoves = [square_name_to_index(x) for x in camMove]
-                    if not self.try_user_move(moves, playerMoves): 
+                    if not self.try_user_move(self.moveGenerator.generateMoves(), playerMoves): 
                         self.switch_input_type()
 
                 elif len(camMove) == 4:
                     playerMoves = [square_name_to_index(x) for x in camMove if x[0] in "ceg"]
-                    if not self.try_user_move(moves, playerMoves): self.switch_input_type()
+                    if not self.try_user_move(self.moveGenerator.generateMoves(), playerMoves): self.switch_input_type()
                 else:
                     self.switch_input_type()
                 continue
@@ -112,6 +118,7 @@ class Pychess():
             for event in pygame.event.get():
                 self.manager.process_events(event)
                 if event.type == pygame.QUIT:
+                    self.computer.close()
                     pygame.quit()
 
                 if event.type == pygame.USEREVENT:
@@ -125,33 +132,20 @@ class Pychess():
                         if event.ui_element == self.capture_board and not self.wait_for_promotion:
                             positions.append(self.chessCam.capture_image())
 
+                        if event.ui_element == self.save_pgn_button:
+                            self.save_pgn()
+
                         if event.ui_element == self.queen_promotion:
-                            figure = Queen(self.player_color)
-                            self.player_move.set_promotion_piece(figure)
-                            self.chessboard.make_move(self.player_move)
-                            self.wait_for_promotion = False
-                            self.update_win()
+                            self.play_promotion("q")
                         
                         if event.ui_element == self.rook_promotion:
-                            figure = Rook(self.player_color)
-                            self.player_move.set_promotion_piece(figure)
-                            self.chessboard.make_move(self.player_move)
-                            self.wait_for_promotion = False
-                            self.update_win()
+                            self.play_promotion("r")
 
                         if event.ui_element == self.knight_promotion:
-                            figure = Knight(self.player_color)
-                            self.player_move.set_promotion_piece(figure)
-                            self.chessboard.make_move(self.player_move)
-                            self.wait_for_promotion = False
-                            self.update_win()
+                            self.play_promotion("n")
 
                         if event.ui_element == self.bishop_promotion:
-                            figure = Bishop(self.player_color)
-                            self.player_move.set_promotion_piece(figure)
-                            self.chessboard.make_move(self.player_move)
-                            self.wait_for_promotion = False
-                            self.update_win()
+                            self.play_promotion("b")
 
 
                 if self.chessboard.color_to_move == self.player_color and self.manual_input_state:
@@ -162,12 +156,12 @@ class Pychess():
                             continue
                         
                         old_x, old_y, selected_fig = pos_x, pos_y, self.chessboard.squares[pos_y*8 + pos_x]
-                        self.chessboard.draw_valid_moves(selected_fig)
+                        self.renderer.draw_valid_moves(self.moveGenerator.get_piece_moves(pos_y*8 + pos_x))
                     if event.type == pygame.MOUSEBUTTONUP and not self.wait_for_promotion:
                         if pos_x == None:
                             selected_fig = None
                             continue
-                        self.chessboard.draw_board()
+                        self.renderer.draw_board()
                         if selected_fig == None:
                             continue
                         self.player_move = self.moveGenerator.try_move(Move(selected_fig, (old_y*8 + old_x), (pos_y*8 + pos_x)), selected_fig)
@@ -201,8 +195,10 @@ class Pychess():
         self.BOARD_LAYER = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
         self.FIGURE_LAYER = pygame.Surface((WIDTH,HEIGHT), pygame.SRCALPHA)
 
-        self.chessboard = Chessboard(self.BOARD_LAYER, self.FIGURE_LAYER)
-        stockfish_path = filedialog.askopenfilename(title="Select Stockfish Executable")
+        self.chessboard = Chessboard()
+        self.renderer = BoardRenderer(self.chessboard, self.BOARD_LAYER, self.FIGURE_LAYER)
+        # without a Stockfish executable the bot searches with the built-in engine
+        stockfish_path = filedialog.askopenfilename(title="Select Stockfish Executable (cancel for the built-in engine)")
         self.computer = Bot(self.chessboard, self.computer_color, stockfish_path)
         self.moveGenerator = MoveGenerator(self.chessboard)
 
@@ -211,8 +207,8 @@ class Pychess():
         update_win updates the content
         """
         self.FIGURE_LAYER.fill(pygame.Color(0,0,0,0))
-        self.chessboard.draw_figures_on_board()
-        self.chessboard.draw_drag(selected_figure)
+        self.renderer.draw_figures_on_board()
+        self.renderer.draw_drag(selected_figure)
         self.WIN.fill("#000000")
         self.WIN.blit(self.BOARD_LAYER,(0,0))
         self.WIN.blit(self.FIGURE_LAYER,(0,0))
@@ -225,21 +221,42 @@ class Pychess():
         self.plot_surface = self.cv2_image_to_pygame_surface(live_image, 200, 200)
 
     def try_user_move(self, aviableMoves, playerMoves):
-        for move in aviableMoves:
-            if playerMoves[0] == move.START_SQUARE and playerMoves[1] == move.END_SQUARE:
-                if move.IS_PROMOTION:
-                    self.wait_for_promotion = True
-                    self.player_move = move
-                    return
-                self.chessboard.make_move(move)
-                return True
-            elif playerMoves[0] == move.END_SQUARE and playerMoves[1] == move.START_SQUARE:
-                if move.IS_PROMOTION:
-                    self.wait_for_promotion = True
-                self.chessboard.make_move(move)
-                return True
-        return False
+        # the camera does not know which of the two changed squares the figure left
+        move = aviableMoves.get(playerMoves[0], playerMoves[1]) or aviableMoves.get(playerMoves[1], playerMoves[0])
+        if move is None:
+            return False
+        if move.IS_PROMOTION:
+            self.wait_for_promotion = True
+            self.player_move = move
+            return
+        self.chessboard.make_move(move)
+        return True
+
+    def play_promotion(self, figure_type):
+        """
+        play_promotion plays the pending promotion move with the chosen figure
+
+        Args:
+            figure_type (str): figure the pawn promotes to, "q", "r", "b" or "n"
+        """
+        moves = self.moveGenerator.generateMoves()
+        self.chessboard.make_move(moves.get(self.player_move.START_SQUARE, self.player_move.END_SQUARE, figure_type))
+        self.wait_for_promotion = False
+        self.update_win()
     
+    def save_pgn(self):
+        """
+        save_pgn writes the moves played so far to a PGN file chosen by the user
+        """
+        path = filedialog.asksaveasfilename(title="Save game", defaultextension=".pgn", filetypes=[("PGN", "*.pgn")])
+        if not path:
+            return
+        player, computer = "Player", self.computer.name
+        headers = {"Event": "pychess game", "White": player, "Black": computer}
+        if self.player_color == 0b1:
+            headers["White"], headers["Black"] = computer, player
+        write_game(path, self.chessboard, headers)
+
     def switch_input_type(self):
         self.manual_input_state = not self.manual_input_state
         if self.manual_input_state:
@@ -0,0 +1,547 @@
+"""
+Alpha-beta search on top of the MoveGenerator.
+
+The Searcher runs an iterative deepening principal variation search with
+quiescence search on the captures, check extensions and draw detection by
+repetition and the fifty move rule. Moves are tried in the order hash move,
+captures by MVV-LVA and promotions, killer moves, then quiet moves by
+history. Results are kept in a fixed-size transposition table indexed by
+the Zobrist key of the positions. The search stops at a depth, node or
+time limit and always answers with the best move of the last finished
+iteration.
+
+Usage:
+    python search.py --time 5
+    python search.py --fen "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3" --depth 6
+    python search.py --network network.npz --time 5
+"""
+import argparse
+import time
+from multiprocessing.synchronize import Event
+from typing import Callable, List, NamedTuple, Optional
+
+from bitboard import PIECE_INDEX, PAWN
+from chessboard import Chessboard
+from constants import STARTFEN
+from evaluation import evaluate
+from move import CAPTURE_FLAG, EN_PASSANT, PROMOTION, PROMOTION_FIGURES, Move, uci_from_code
+from moveGenerator import MoveGenerator, NOISY_FLAGS
+from nnue import NnueEvaluator, load_network
+
+MAX_PLY = 64
+INFINITY = 32000
+MATE_SCORE = 31000
+# scores beyond this bound are mates, their distance to the root is stored relative to the position
+MATE_BOUND = MATE_SCORE - MAX_PLY
+
+# bounds of transposition table scores
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# the clock is read every this many nodes
+LIMIT_CHECK_INTERVAL = 1024
+
+HASH_MOVE_ORDER = 1 << 30
+NOISY_ORDER = 1 << 24
+KILLER_ORDER = 1 << 22
+
+
+class TableEntry(NamedTuple):
+    key: int
+    depth: int
+    score: int
+    bound: int
+    move: int
+    age: int
+
+
+class SearchResult(NamedTuple):
+    move: Optional[Move]
+    score: int
+    depth: int
+    nodes: int
+    seconds: float
+    pv: List[int]
+
+
+class TranspositionTable:
+    """
+    Fixed-size table of search results indexed by the low bits of the Zobrist
+    key. An entry is replaced by a new result of the same position, by a
+    result of at least the same depth or by any result once it stems from an
+    earlier search.
+    """
+
+    def __init__(self, size: int = 1 << 20) -> None:
+        """
+        Args:
+            size (int, optional): amount of entries, rounded down to a power of two. Defaults to 1 << 20.
+        """
+        size = 1 << (max(size, 1).bit_length() - 1)
+        self.mask = size - 1
+        self.age = 0
+        self.entries: List[Optional[TableEntry]] = [None] * size
+
+    def __len__(self) -> int:
+        return self.mask + 1
+
+    def clear(self) -> None:
+        """
+        clear forgets every stored result.
+        """
+        self.entries = [None] * (self.mask + 1)
+        self.age = 0
+
+    def new_search(self) -> None:
+        """
+        new_search marks the stored results as old, they are replaced first from now on.
+        """
+        self.age = (self.age + 1) & 0xFF
+
+    def probe(self, key: int) -> Optional[TableEntry]:
+        """
+        probe looks up the stored result of a position.
+
+        Args:
+            key (int): Zobrist key of the position
+
+        Returns:
+            Optional[TableEntry]: stored result, None if the position is not in the table
+        """
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry.key == key:
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, score: int, bound: int, move: int) -> None:
+        """
+        store saves the result of a position if the replacement policy allows it.
+
+        Args:
+            key (int): Zobrist key of the position
+            depth (int): remaining depth the position was searched with
+            score (int): score of the position, mate scores relative to the position
+            bound (int): EXACT, LOWER_BOUND or UPPER_BOUND
+            move (int): best packed move, 0 if none is known
+        """
+        slot = key & self.mask
+        entry = self.entries[slot]
+        if entry is not None:
+            if entry.key == key:
+                if not move:
+                    move = entry.move
+            elif entry.age == self.age and entry.depth > depth:
+                return
+        self.entries[slot] = TableEntry(key, depth, score, bound, move, self.age)
+
+    def hashfull(self) -> int:
+        """
+        hashfull estimates the filling of the table from its first thousand slots.
+
+        Returns:
+            int: used slots per mille
+        """
+        sample = self.entries[:1000]
+        return sum(entry is not None and entry.age == self.age for entry in sample) * 1000 // len(sample)
+
+
+def _score_to_table(score: int, ply: int) -> int:
+    """
+    Helper function to make a mate score relative to the position before storing it.
+    """
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _score_from_table(score: int, ply: int) -> int:
+    """
+    Helper function to make a stored mate score relative to the root again.
+    """
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class Searcher:
+    """
+    Alpha-beta search engine. The searcher plays the moves on its own copy of
+    the board, the board that is searched is left untouched, including its
+    redo stack and listeners. The transposition table is kept between searches.
+    """
+
+    def __init__(self, table: Optional[TranspositionTable] = None,
+                 evaluate: Callable[[Chessboard], int] = evaluate, stop_event: Optional[Event] = None) -> None:
+        """
+        Args:
+            table (TranspositionTable, optional): table for the search results. Defaults to a new table.
+            evaluate (Callable[[Chessboard], int], optional): static evaluation for the color to move.
+            Defaults to evaluation.evaluate.
+            stop_event (Event, optional): stops the search like a limit once it is set, e.g. by another
+            process. Defaults to None.
+        """
+        self.table = table if table is not None else TranspositionTable()
+        self.evaluate = evaluate
+        self.stop_event = stop_event
+        self.chessboard: Optional[Chessboard] = None
+        self.move_generator: Optional[MoveGenerator] = None
+        self.nodes = 0
+        self.stopped = False
+        self.node_limit: Optional[int] = None
+        self.deadline: Optional[float] = None
+        self.next_check = LIMIT_CHECK_INTERVAL
+        self.killers = [[0, 0] for _ in range(MAX_PLY + 1)]
+        self.history = [0] * 4096
+
+    def search(self, chessboard: Chessboard, depth: int = MAX_PLY, nodes: Optional[int] = None,
+               time_limit: Optional[float] = None,
+               info: Optional[Callable[[SearchResult], None]] = None, first_depth: int = 1) -> SearchResult:
+        """
+        search finds the best move of the color to move by iterative deepening.
+
+        Args:
+            chessboard (Chessboard): board with the position, it is not changed
+            depth (int, optional): highest depth to search. Defaults to MAX_PLY.
+            nodes (int, optional): nodes after which the search stops. Defaults to no limit.
+            time_limit (float, optional): seconds after which the search stops. Defaults to no limit.
+            info (Callable[[SearchResult], None], optional): called with the result of every finished depth.
+            Defaults to None.
+            first_depth (int, optional): depth of the first iteration, helpers of a parallel search
+            start deeper. Defaults to 1.
+
+        Returns:
+            SearchResult: best move with its score in centipawns for the color to move, the depth of the
+            last finished iteration, the searched nodes, the time taken and the principal variation.
+            The move is None if the color to move has no legal move. If the search is stopped before an
+            iteration finished, the move is a guess with depth 0 and score 0.
+        """
+        start = time.perf_counter()
+        self._set_up(chessboard)
+        self.node_limit = nodes
+        self.deadline = start + time_limit if time_limit is not None else None
+        self._check_limits()
+
+        result = SearchResult(None, 0, 0, 0, 0.0, [])
+        root_moves = self.move_generator.generate_packed_moves()
+        if not root_moves:
+            in_check = self._in_check()
+            return result._replace(score=-MATE_SCORE if in_check else 0)
+
+        for iteration_depth in range(min(first_depth, depth, MAX_PLY), min(depth, MAX_PLY) + 1):
+            score = self._negamax(iteration_depth, -INFINITY, INFINITY, 0)
+            if self.stopped:
+                if result.move is None:
+                    # no iteration finished, the move is a guess from the table and depth 0 says so
+                    pv = self._principal_variation(iteration_depth)
+                    best_code = pv[0] if pv else root_moves[0]
+                    result = SearchResult(Move.from_code(chessboard.figure_at(best_code & 63), best_code),
+                                          0, 0, self.nodes, time.perf_counter() - start, pv)
+                break
+
+            pv = self._principal_variation(iteration_depth)
+            best_code = pv[0] if pv else root_moves[0]
+            result = SearchResult(
+                Move.from_code(chessboard.figure_at(best_code & 63), best_code),
+                score, iteration_depth, self.nodes, time.perf_counter() - start, pv
+            )
+            if info is not None:
+                info(result)
+            if abs(score) >= MATE_BOUND and MATE_SCORE - abs(score) <= iteration_depth:
+                break
+
+        return result._replace(nodes=self.nodes, seconds=time.perf_counter() - start)
+
+    def _set_up(self, chessboard: Chessboard) -> None:
+        """
+        Helper function to copy the board with its moves, so repetitions of the game are known to the search.
+        """
+        self.chessboard = Chessboard(chessboard.start_fen)
+        for record in chessboard.move_stack:
+            self.chessboard.make_packed_move(record.code)
+        self.move_generator = MoveGenerator(self.chessboard)
+
+        self.nodes = 0
+        self.stopped = False
+        self.killers = [[0, 0] for _ in range(MAX_PLY + 1)]
+        self.history = [0] * 4096
+        self.table.new_search()
+
+    def _check_limits(self) -> None:
+        """
+        Helper function to stop the search once the node or time limit is reached or it is stopped from outside.
+        """
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            self.stopped = True
+        elif self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.stopped = True
+        elif self.stop_event is not None and self.stop_event.is_set():
+            self.stopped = True
+
+        self.next_check = self.nodes + LIMIT_CHECK_INTERVAL
+        if self.node_limit is not None:
+            self.next_check = min(self.next_check, self.node_limit)
+
+    def _in_check(self) -> bool:
+        """
+        Helper function to check whether the color to move is in check.
+        """
+        chessboard = self.chessboard
+        color = chessboard.color_to_move
+        king_square = chessboard.king_squares[color]
+        if king_square is None:
+            return False
+        return bool(self.move_generator.get_attackers(king_square, color ^ 0b1, chessboard.bitboards))
+
+    def _is_draw(self) -> bool:
+        """
+        Helper function to detect draws by the fifty move rule and by repetition within the game or search.
+        """
+        chessboard = self.chessboard
+        if chessboard.half_moves >= 100:
+            return True
+
+        # only positions since the last capture or pawn move can repeat, the same color moves every second ply
+        move_stack = chessboard.move_stack
+        key = chessboard.zobrist_key
+        for back in range(2, min(chessboard.half_moves, len(move_stack)) + 1, 2):
+            if move_stack[-back].zobrist_key == key:
+                return True
+        return False
+
+    def _order_moves(self, moves: List[int], hash_move: int, ply: int) -> List[int]:
+        """
+        Helper function to sort moves by how likely they cause a cutoff.
+        """
+        figure_at = self.chessboard.figure_at
+        killers = self.killers[ply]
+        history = self.history
+
+        def order(code: int) -> int:
+            if code == hash_move:
+                return HASH_MOVE_ORDER
+            if code & NOISY_FLAGS:
+                flags = code >> 12
+                order = NOISY_ORDER
+                if flags & PROMOTION:
+                    order += 8 * PIECE_INDEX[PROMOTION_FIGURES[flags & 3].TYPE]
+                if code & CAPTURE_FLAG:
+                    # most valuable victim first, least valuable attacker breaks ties
+                    victim = PAWN if flags == EN_PASSANT else PIECE_INDEX[figure_at(code >> 6 & 63).TYPE]
+                    order += 64 * victim - PIECE_INDEX[figure_at(code & 63).TYPE]
+                return order
+            if code == killers[0]:
+                return KILLER_ORDER + 1
+            if code == killers[1]:
+                return KILLER_ORDER
+            return history[code & 4095]
+
+        return sorted(moves, key=order, reverse=True)
+
+    def _negamax(self, depth: int, alpha: int, beta: int, ply: int) -> int:
+        """
+        Helper function for the principal variation search of a position.
+
+        Args:
+            depth (int): remaining depth
+            alpha (int): lowest score the color to move is sure to get
+            beta (int): highest score the opponent allows
+            ply (int): distance to the root
+
+        Returns:
+            int: score for the color to move
+        """
+        self.nodes += 1
+        if self.nodes >= self.next_check:
+            self._check_limits()
+        if self.stopped:
+            return 0
+
+        chessboard = self.chessboard
+        if ply:
+            if self._is_draw():
+                return 0
+            if ply >= MAX_PLY:
+                return self.evaluate(chessboard)
+
+        in_check = self._in_check()
+        if in_check:
+            depth += 1
+        if depth <= 0:
+            return self._quiescence(alpha, beta, ply)
+
+        key = chessboard.zobrist_key
+        entry = self.table.probe(key)
+        hash_move = 0
+        if entry is not None:
+            hash_move = entry.move
+            if ply and entry.depth >= depth:
+                score = _score_from_table(entry.score, ply)
+                if entry.bound == EXACT \
+                        or entry.bound == LOWER_BOUND and score >= beta \
+                        or entry.bound == UPPER_BOUND and score <= alpha:
+                    return score
+
+        moves = self.move_generator.generate_packed_moves()
+        if not moves:
+            return -MATE_SCORE + ply if in_check else 0
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = 0
+        for index, code in enumerate(self._order_moves(moves, hash_move, ply)):
+            chessboard.make_packed_move(code)
+            if index == 0:
+                score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            else:
+                score = -self._negamax(depth - 1, -alpha - 1, -alpha, ply + 1)
+                if alpha < score < beta:
+                    score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            chessboard.unmake_packed_move()
+            if self.stopped:
+                return 0
+
+            if score > best_score:
+                best_score = score
+                best_move = code
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if not code & NOISY_FLAGS:
+                            killers = self.killers[ply]
+                            if killers[0] != code:
+                                killers[1] = killers[0]
+                                killers[0] = code
+                            self.history[code & 4095] += depth * depth
+                        break
+
+        if best_score >= beta:
+            bound = LOWER_BOUND
+        elif best_score > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER_BOUND
+        self.table.store(key, depth, _score_to_table(best_score, ply), bound, best_move)
+        return best_score
+
+    def _quiescence(self, alpha: int, beta: int, ply: int) -> int:
+        """
+        Helper function to search captures and promotions until the position is quiet,
+        so the evaluation is not taken in the middle of an exchange.
+
+        Args:
+            alpha (int): lowest score the color to move is sure to get
+            beta (int): highest score the opponent allows
+            ply (int): distance to the root
+
+        Returns:
+            int: score for the color to move
+        """
+        self.nodes += 1
+        if self.nodes >= self.next_check:
+            self._check_limits()
+        if self.stopped:
+            return 0
+
+        chessboard = self.chessboard
+        stand_pat = self.evaluate(chessboard)
+        if stand_pat >= beta or ply >= MAX_PLY:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        # the staged generator yields every capture and promotion before the first quiet move
+        noisy_moves = []
+        for code in self.move_generator.iter_packed_moves():
+            if not code & NOISY_FLAGS:
+                break
+            noisy_moves.append(code)
+
+        best_score = stand_pat
+        for code in self._order_moves(noisy_moves, 0, ply):
+            chessboard.make_packed_move(code)
+            score = -self._quiescence(-beta, -alpha, ply + 1)
+            chessboard.unmake_packed_move()
+            if self.stopped:
+                return 0
+
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score
+
+    def _principal_variation(self, depth: int) -> List[int]:
+        """
+        Helper function to follow the hash moves from the root.
+
+        Args:
+            depth (int): longest variation to follow
+
+        Returns:
+            List[int]: packed moves of the expected line of play
+        """
+        chessboard = self.chessboard
+        pv = []
+        seen = set()
+        while len(pv) < depth:
+            entry = self.table.probe(chessboard.zobrist_key)
+            if entry is None or not entry.move or chessboard.zobrist_key in seen:
+                break
+            if entry.move not in self.move_generator.generate_packed_moves():
+                break
+            seen.add(chessboard.zobrist_key)
+            chessboard.make_packed_move(entry.move)
+            pv.append(entry.move)
+
+        for _ in pv:
+            chessboard.unmake_packed_move()
+        return pv
+
+
+def format_score(score: int) -> str:
+    """
+    format_score writes a score like an UCI engine, e.g. "cp 35" or "mate -3".
+
+    Args:
+        score (int): score in centipawns
+
+    Returns:
+        str: score in centipawns or moves to mate
+    """
+    if abs(score) >= MATE_BOUND:
+        plies = MATE_SCORE - abs(score)
+        moves = (plies + 1) // 2
+        return f"mate {moves if score > 0 else -moves}"
+    return f"cp {score}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Search the best move of a position.")
+    parser.add_argument("--fen", default=STARTFEN, help="position to search")
+    parser.add_argument("--depth", type=int, default=MAX_PLY, help="highest depth to search")
+    parser.add_argument("--nodes", type=int, help="nodes after which the search stops")
+    parser.add_argument("--time", type=float, help="seconds after which the search stops")
+    parser.add_argument("--network", help=".npz file of an NNUE network to evaluate with, see nnue.py")
+    args = parser.parse_args()
+    if args.depth == MAX_PLY and args.nodes is None and args.time is None:
+        args.time = 5.0
+
+    def print_info(result: SearchResult) -> None:
+        nps = result.nodes / result.seconds if result.seconds else 0
+        print(f"depth {result.depth} score {format_score(result.score)} nodes {result.nodes} "
+              f"time {result.seconds:.3f}s nps {nps:.0f} pv {' '.join(uci_from_code(code) for code in result.pv)}")
+
+    searcher = Searcher(evaluate=NnueEvaluator(load_network(args.network))) if args.network else Searcher()
+    result = searcher.search(Chessboard(args.fen), args.depth, args.nodes, args.time, print_info)
+    print(f"bestmove {result.move.uci() if result.move is not None else '(none)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Client for chess engines that speak the Universal Chess Interface (UCI),
+e.g. Stockfish.
+
+The engine process is started once and kept for the whole game, together
+with its hash table. Every move sends the start position and the moves of
+the game, ucinewgame is only sent when a different game starts. A single
+go command answers with the evaluation, read from the last info line, and
+the best move.
+
+Usage:
+    python uci.py /usr/bin/stockfish --time 0.1 --plies 20
+    python uci.py /usr/bin/stockfish --depth 12 --plies 20
+    python uci.py /usr/bin/stockfish --fen "<fen>" --time 1 --option "Threads=4"
+"""
+import argparse
+import subprocess
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Union
+
+from chessboard import Chessboard
+from constants import STARTFEN
+from move import uci_from_code
+from moveGenerator import MoveGenerator
+from search import MATE_SCORE, format_score
+
+
+class EngineResult(NamedTuple):
+    best_move: Optional[str]    # UCI name of the move, None if there is no legal move
+    score: Optional[int]        # centipawns for the color to move, mates like in search.py, None if not sent
+    depth: int
+    nodes: int
+    pv: List[str]
+
+
+def parse_info(line: str, result: EngineResult) -> EngineResult:
+    """
+    parse_info takes the values of an info line of the engine over.
+
+    Args:
+        line (str): info line, e.g. "info depth 12 score cp 31 nodes 53120 pv e2e4 e7e5"
+        result (EngineResult): values of the lines before
+
+    Returns:
+        EngineResult: the values with the ones of the line replaced
+    """
+    tokens = line.split()
+    # lines without a score only report progress, e.g. the move searched, and of a multipv search
+    # only the main line counts
+    if "score" not in tokens or "multipv" in tokens and tokens[tokens.index("multipv") + 1] != "1":
+        return result
+
+    index = 1
+    while index < len(tokens):
+        token = tokens[index]
+        if token == "depth":
+            result = result._replace(depth=int(tokens[index + 1]))
+        elif token == "nodes":
+            result = result._replace(nodes=int(tokens[index + 1]))
+        elif token == "score":
+            kind, value = tokens[index + 1], int(tokens[index + 2])
+            if kind == "cp":
+                result = result._replace(score=value)
+            elif kind == "mate":
+                # mate in moves to distance in plies, the way the Searcher scores mates
+                plies = 2 * value - 1 if value > 0 else -2 * value
+                result = result._replace(score=MATE_SCORE - plies if value > 0 else -(MATE_SCORE - plies))
+            index += 2
+        elif token == "pv":
+            return result._replace(pv=tokens[index + 1:])
+        elif token == "string":
+            break
+        index += 1
+    return result
+
+
+class UciEngine:
+    """
+    Engine process driven over the UCI protocol. The process is started with
+    the object and ends with close.
+    """
+
+    def __init__(self, path: str, options: Optional[Dict[str, Union[str, int]]] = None) -> None:
+        """
+        Args:
+            path (str): path of the engine executable
+            options (Dict[str, Union[str, int]], optional): UCI options set once after start,
+            e.g. {"Threads": 4, "Hash": 256}. Defaults to None.
+        """
+        self.process = subprocess.Popen(
+            [path], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1
+        )
+        self.name = ""
+        self.start_fen: Optional[str] = None
+
+        self._send("uci")
+        for line in self._read_until("uciok"):
+            if line.startswith("id name "):
+                self.name = line[len("id name "):]
+        for name, value in (options or {}).items():
+            self.set_option(name, value)
+        self.wait_ready()
+
+    def _send(self, command: str) -> None:
+        """
+        Helper function to write a command to the engine.
+        """
+        self.process.stdin.write(command + "\n")
+        self.process.stdin.flush()
+
+    def _read_until(self, token: str) -> List[str]:
+        """
+        Helper function to read the lines of the engine up to the one starting with a token.
+
+        Returns:
+            List[str]: the lines read, the one with the token last
+        """
+        lines = []
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                raise RuntimeError(f"the engine ended while waiting for '{token}'")
+            line = line.strip()
+            lines.append(line)
+            if line.split(" ", 1)[0] == token:
+                return lines
+
+    def set_option(self, name: str, value: Union[str, int]) -> None:
+        """
+        set_option sets an UCI option of the engine.
+
+        Args:
+            name (str): name of the option, e.g. "Threads"
+            value (Union[str, int]): new value, booleans as "true" and "false"
+        """
+        self._send(f"setoption name {name} value {value}")
+
+    def wait_ready(self) -> None:
+        """
+        wait_ready waits until the engine has handled every command sent before.
+        """
+        self._send("isready")
+        self._read_until("readyok")
+
+    def new_game(self) -> None:
+        """
+        new_game tells the engine that the next position is from another game, so it clears its hash table.
+        """
+        self._send("ucinewgame")
+        self.wait_ready()
+        self.start_fen = None
+
+    def set_position(self, start_fen: str, moves: Sequence[str]) -> None:
+        """
+        set_position sends a game to the engine. A new game is only started if the start position differs
+        from the one of the game before, the moves of the same game keep the hash table of the engine.
+
+        Args:
+            start_fen (str): FEN string of the start position of the game
+            moves (Sequence[str]): UCI names of the moves played since
+        """
+        if start_fen != self.start_fen:
+            if self.start_fen is not None:
+                self.new_game()
+            self.start_fen = start_fen
+
+        position = "startpos" if start_fen == STARTFEN else f"fen {start_fen}"
+        self._send(f"position {position} moves {' '.join(moves)}" if moves else f"position {position}")
+
+    def go(self, movetime: Optional[float] = None, depth: Optional[int] = None,
+           nodes: Optional[int] = None) -> EngineResult:
+        """
+        go searches the position that was sent last.
+
+        Args:
+            movetime (float, optional): seconds to search. Defaults to no limit.
+            depth (int, optional): depth to search. Defaults to no limit.
+            nodes (int, optional): nodes to search. Defaults to no limit.
+
+        Returns:
+            EngineResult: best move with the values of the last info line
+        """
+        command = "go"
+        if movetime is not None:
+            command += f" movetime {max(int(movetime * 1000), 1)}"
+        if depth is not None:
+            command += f" depth {depth}"
+        if nodes is not None:
+            command += f" nodes {nodes}"
+        if command == "go":
+            raise ValueError("go needs a limit, the search would never end")
+        self._send(command)
+
+        result = EngineResult(None, None, 0, 0, [])
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                raise RuntimeError("the engine ended while searching")
+            tokens = line.split()
+            if not tokens:
+                continue
+            if tokens[0] == "info":
+                result = parse_info(line, result)
+            elif tokens[0] == "bestmove":
+                best_move = tokens[1] if len(tokens) > 1 and tokens[1] != "(none)" else None
+                return result._replace(best_move=best_move)
+
+    def play(self, chessboard: Chessboard, think_time: Optional[float] = None, depth: Optional[int] = None,
+             nodes: Optional[int] = None) -> EngineResult:
+        """
+        play searches the position of a board with the moves that led to it, until the first limit is reached.
+
+        Args:
+            chessboard (Chessboard): board with the game
+            think_time (float, optional): seconds to search. Defaults to no limit.
+            depth (int, optional): depth to search. Defaults to no limit.
+            nodes (int, optional): nodes to search. Defaults to no limit.
+
+        Returns:
+            EngineResult: best move with its evaluation
+        """
+        self.set_position(chessboard.start_fen, [uci_from_code(record.code) for record in chessboard.move_stack])
+        return self.go(think_time, depth, nodes)
+
+    def close(self) -> None:
+        """
+        close ends the engine process.
+        """
+        if self.process.poll() is None:
+            try:
+                self._send("quit")
+                self.process.wait(timeout=5)
+            except (BrokenPipeError, subprocess.TimeoutExpired):
+                self.process.kill()
+                self.process.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Let an UCI engine play from a position and time its answers.")
+    parser.add_argument("engine", help="path of the engine executable")
+    parser.add_argument("--fen", default=STARTFEN, help="start position")
+    parser.add_argument("--time", type=float, help="seconds per move")
+    parser.add_argument("--depth", type=int, help="depth per move, the first limit reached ends the search")
+    parser.add_argument("--nodes", type=int, help="nodes per move")
+    parser.add_argument("--plies", type=int, default=1, help="half moves the engine plays against itself")
+    parser.add_argument("--option", action="append", default=[], help="UCI option as NAME=VALUE, may be repeated")
+    args = parser.parse_args()
+    if args.time is None and args.depth is None and args.nodes is None:
+        args.time = 0.1
+
+    options = dict(option.split("=", 1) for option in args.option)
+    engine = UciEngine(args.engine, options)
+    chessboard = Chessboard(args.fen)
+    move_generator = MoveGenerator(chessboard)
+    latencies = []
+    try:
+        print(engine.name)
+        for _ in range(args.plies):
+            start = time.perf_counter()
+            result = engine.play(chessboard, args.time, args.depth, args.nodes)
+            latencies.append(time.perf_counter() - start)
+            if result.best_move is None:
+                break
+            score = format_score(result.score) if result.score is not None else "-"
+            print(f"{result.best_move} depth {result.depth} score {score} nodes {result.nodes} "
+                  f"time {latencies[-1]:.3f}s")
+            move = move_generator.generateMoves().by_uci(result.best_move)
+            if move is None:
+                print(f"illegal move {result.best_move}")
+                break
+            chessboard.make_packed_move(move.code)
+    finally:
+        engine.close()
+    if latencies:
+        print(f"{len(latencies)} moves, {sum(latencies) / len(latencies):.3f}s per move")
+
+
+if __name__ == "__main__":
+    main()
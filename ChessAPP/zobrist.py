@@ -0,0 +1,101 @@
+"""
+Random keys for Zobrist hashing of chess positions.
+
+The keys come from a fixed seed, so a position hashes to the same 64 bit key
+in every process and every run, which allows storing keys on disk.
+"""
+import random
+
+from bitboard import PAWN, iterate_squares, square_name_to_index
+
+
+_key_generator = random.Random(0x5A0B1157)
+
+
+def _random_key() -> int:
+    return _key_generator.getrandbits(64)
+
+
+# indexed by [color][PIECE_INDEX][square]
+PIECE_KEYS = [[[_random_key() for _ in range(64)] for _ in range(6)] for _ in range(2)]
+
+# xored in when black is to move
+SIDE_KEY = _random_key()
+
+CASTLE_KEYS = {castle_type: _random_key() for castle_type in "KQkq"}
+
+# indexed by the file of the en passant square, a = 0
+EN_PASSANT_KEYS = [_random_key() for _ in range(8)]
+
+
+def castle_key(castle_right: str) -> int:
+    """
+    castle_key combines the keys of the given castle rights.
+
+    Args:
+        castle_right (str): castle rights in FEN notation, e.g. "KQkq" or "-"
+
+    Returns:
+        int: key of the castle rights
+    """
+    key = 0
+    for castle_type in castle_right:
+        key ^= CASTLE_KEYS.get(castle_type, 0)
+    return key
+
+
+def en_passant_key(en_passant_square: str, color_to_move: int, bitboards) -> int:
+    """
+    en_passant_key returns the key of the file of an en passant square. Like in
+    Polyglot the file only counts if a pawn of the color to move stands next to
+    the pawn that moved, otherwise the position equals the one without the en
+    passant square and must hash the same, whatever the order of the moves was.
+
+    Args:
+        en_passant_square (str): en passant square in FEN notation, e.g. "e3" or "-"
+        color_to_move (int): color that could capture en passant
+        bitboards (List[List[int]]): occupancy mask per color and piece type
+
+    Returns:
+        int: key of the en passant file, 0 if there is none or no pawn can capture
+    """
+    if en_passant_square == "-":
+        return 0
+    square = square_name_to_index(en_passant_square)
+    file = square % 8
+    # the capturing pawns stand on the rank of the pawn that moved, a8 is square 0
+    pawn_square = square + 8 if color_to_move == 0b0 else square - 8
+    capturers = 0
+    if file > 0:
+        capturers |= 1 << (pawn_square - 1)
+    if file < 7:
+        capturers |= 1 << (pawn_square + 1)
+    if not bitboards[color_to_move][PAWN] & capturers:
+        return 0
+    return EN_PASSANT_KEYS[file]
+
+
+def compute_hash(bitboards, color_to_move: int, castle_right: str, en_passant_square: str) -> int:
+    """
+    compute_hash calculates the key of a position from scratch.
+
+    Args:
+        bitboards (List[List[int]]): occupancy mask per color and piece type
+        color_to_move (int): 0b0 for white, 0b1 for black
+        castle_right (str): castle rights in FEN notation
+        en_passant_square (str): en passant square in FEN notation
+
+    Returns:
+        int: 64 bit Zobrist key
+    """
+    key = 0
+    for color, masks in enumerate(bitboards):
+        for piece_index, mask in enumerate(masks):
+            piece_keys = PIECE_KEYS[color][piece_index]
+            for square in iterate_squares(mask):
+                key ^= piece_keys[square]
+
+    if color_to_move == 0b1:
+        key ^= SIDE_KEY
+
+    return key ^ castle_key(castle_right) ^ en_passant_key(en_passant_square, color_to_move, bitboards)
@@ -0,0 +1,41 @@
+import os
+import random
+import sys
+
+import pytest
+
+# the modules of ChessAPP import each other by their flat names, like when the app is started from there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ChessAPP"))
+
+from chessboard import Chessboard
+from moveGenerator import MoveGenerator
+from perft import REFERENCE_POSITIONS
+
+
+@pytest.fixture(scope="session")
+def positions():
+    """
+    FEN strings of the reference positions, the positions one move after them and of seeded random games.
+    The reference positions bring castling, en passant, pins and promotions, the random games the rest.
+    """
+    fens = []
+    for position in REFERENCE_POSITIONS:
+        chessboard = Chessboard(position.fen)
+        move_generator = MoveGenerator(chessboard)
+        fens.append(position.fen)
+        for code in move_generator.generate_packed_moves():
+            chessboard.make_packed_move(code)
+            fens.append(chessboard.generate_fen_from_current_position())
+            chessboard.unmake_packed_move()
+
+    generator = random.Random(2024)
+    for _ in range(20):
+        chessboard = Chessboard()
+        move_generator = MoveGenerator(chessboard)
+        for _ in range(120):
+            codes = move_generator.generate_packed_moves()
+            if not codes:
+                break
+            chessboard.make_packed_move(generator.choice(codes))
+            fens.append(chessboard.generate_fen_from_current_position())
+    return fens
@@ -0,0 +1,39 @@
+import numpy as np
+
+from batch import attack_maps, count_checkers, count_king_safe_moves, count_legal_moves, load_positions
+from chessboard import Chessboard
+from moveGenerator import MoveGenerator
+
+
+def test_legal_counts_match_the_move_generator(positions):
+    batch = load_positions(positions)
+    expected = [MoveGenerator(Chessboard(fen)).count_legal_moves() for fen in positions]
+    assert count_legal_moves(batch).tolist() == expected
+
+
+def test_legal_counts_on_a_pool(positions):
+    batch = load_positions(positions[:300])
+    assert count_legal_moves(batch, processes=2).tolist() == count_legal_moves(batch).tolist()
+
+
+def test_attack_maps_match_the_board(positions):
+    maps = attack_maps(load_positions(positions)).tolist()
+    for fen, (white, black) in zip(positions, maps):
+        chessboard = Chessboard(fen)
+        assert (white, black) == (chessboard.attack_map(0b0), chessboard.attack_map(0b1)), fen
+
+
+def test_checkers_match_the_move_generator(positions):
+    checkers = count_checkers(load_positions(positions)).tolist()
+    for fen, count in zip(positions, checkers):
+        chessboard = Chessboard(fen)
+        color = chessboard.color_to_move
+        attackers = MoveGenerator(chessboard).get_attackers(chessboard.king_squares[color], color ^ 0b1,
+                                                            chessboard.bitboards)
+        assert count == bin(attackers).count("1"), fen
+
+
+def test_king_safe_moves_bound_the_legal_moves_without_checks(positions):
+    batch = load_positions(positions)
+    quiet = (count_checkers(batch) == 0) & (batch.en_passant == 0)
+    assert np.all(count_king_safe_moves(batch)[quiet] >= count_legal_moves(batch)[quiet])
@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from batch import load_positions
+from chessboard import Chessboard
+from evaluation import evaluate, evaluate_batch
+from moveGenerator import MoveGenerator
+from pieceSquareTables import score_bitboards
+
+
+def test_incremental_matches_batch(positions):
+    expected = evaluate_batch(load_positions(positions)).tolist()
+    assert [evaluate(Chessboard(fen)) for fen in positions] == expected
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_sums_follow_make_and_unmake(seed):
+    generator = random.Random(seed)
+    chessboard = Chessboard()
+    move_generator = MoveGenerator(chessboard)
+    scores = [evaluate(chessboard)]
+
+    for _ in range(100):
+        codes = move_generator.generate_packed_moves()
+        if not codes:
+            break
+        chessboard.make_packed_move(generator.choice(codes))
+        sums = score_bitboards(chessboard.bitboards)
+        assert (chessboard.midgame_scores, chessboard.endgame_scores, chessboard.phase) == sums
+        scores.append(evaluate(chessboard))
+
+    while chessboard.move_stack:
+        chessboard.unmake_packed_move()
+        scores.pop()
+        assert evaluate(chessboard) == scores[-1]
+
+
+def test_mirrored_position_scores_the_same():
+    fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+    placement, color, *_ = fen.split()
+    mirrored = "/".join(reversed(placement.split("/"))).swapcase()
+    assert evaluate(Chessboard(fen)) == evaluate(Chessboard(f"{mirrored} {'b' if color == 'w' else 'w'} - - 0 1"))
@@ -0,0 +1,69 @@
+import gzip
+
+import pytest
+
+from chessboard import Chessboard
+from fen import format_fen, parse_fen, parse_position_line, read_fens, read_positions
+from perft import REFERENCE_POSITIONS
+
+
+@pytest.mark.parametrize("position", REFERENCE_POSITIONS, ids=lambda position: position.name)
+def test_round_trip(position):
+    state = parse_fen(position.fen)
+    fen = format_fen(state.squares, state.color_to_move, state.castle_right, state.en_passant_square,
+                     state.half_moves, state.game_turn)
+    assert fen == position.fen
+    assert Chessboard(position.fen).generate_fen_from_current_position() == position.fen
+
+
+def test_bitboards_match_squares():
+    state = parse_fen(REFERENCE_POSITIONS[1].fen)
+    for square, figure in enumerate(state.squares):
+        occupied = bool((state.occupancy[0] | state.occupancy[1]) >> square & 1)
+        assert occupied == (figure is not None)
+
+
+def test_missing_counters_default():
+    state = parse_fen("8/8/8/8/8/8/8/K6k w - -")
+    assert (state.half_moves, state.game_turn) == (0, 1)
+
+
+@pytest.mark.parametrize("placement", [
+    # digit above 8
+    "9/8/8/8/8/8/8/K6k",
+    "0K7/8/8/8/8/8/8/7k",
+    # rank with 9 squares followed by one with 7
+    "K8/7k/8/8/8/8/8/8",
+    "8p7/8/8/8/8/8/8/K6k",
+    # 16 squares on one rank and none on the next
+    "8p7//8/8/8/8/8/K6k",
+    # rank with 7 squares
+    "7/8/8/8/8/8/8/K6k",
+    # 7 and 9 ranks
+    "8/8/8/8/8/8/K6k",
+    "8/8/8/8/8/8/8/8/K6k",
+    "8/8/8/8/8/8/8/K6x",
+])
+def test_malformed_placement_is_rejected(placement):
+    with pytest.raises(ValueError):
+        parse_fen(f"{placement} w - - 0 1")
+
+
+def test_malformed_side_to_move_is_rejected():
+    with pytest.raises(ValueError):
+        parse_fen("8/8/8/8/8/8/8/K6k x - - 0 1")
+
+
+def test_epd_operations():
+    record = parse_position_line('8/8/8/8/8/8/8/K6k w - - bm Ka2; id "a; b"; hmvc 3; fmvn 40;')
+    assert record.fen == "8/8/8/8/8/8/8/K6k w - - 3 40"
+    assert record.operations == {"bm": "Ka2", "id": "a; b", "hmvc": "3", "fmvn": "40"}
+
+
+def test_read_gzip_file(tmp_path):
+    lines = [position.fen for position in REFERENCE_POSITIONS]
+    path = tmp_path / "positions.fen.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as position_file:
+        position_file.write("# comment\n\n" + "\n".join(lines) + "\n")
+    assert list(read_fens(str(path))) == lines
+    assert all(not record.operations for record in read_positions(str(path)))
@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+from chessboard import Chessboard
+from gamedb import GameDatabase, import_pgn, write_database
+from moveGenerator import MoveGenerator
+from perft import REFERENCE_POSITIONS
+from pgn import PgnGame, game_result, game_sans, write_game
+
+
+def random_games(count):
+    games = []
+    for seed in range(count):
+        generator = random.Random(seed)
+        start_fen = REFERENCE_POSITIONS[seed % len(REFERENCE_POSITIONS)].fen
+        chessboard = Chessboard(start_fen)
+        move_generator = MoveGenerator(chessboard)
+        for _ in range(generator.randrange(0, 80)):
+            codes = move_generator.generate_packed_moves()
+            if not codes:
+                break
+            chessboard.make_packed_move(generator.choice(codes))
+        games.append(chessboard)
+    return games
+
+
+@pytest.fixture
+def boards():
+    return random_games(12)
+
+
+@pytest.fixture
+def database(tmp_path, boards):
+    path = str(tmp_path / "games.db")
+    games = [PgnGame({"Round": str(number), "FEN": chessboard.start_fen, "Annotator": "a\tb ä"},
+                     game_sans(chessboard), game_result(chessboard))
+             for number, chessboard in enumerate(boards)]
+    # a game with an illegal move is skipped
+    games.insert(3, PgnGame({}, ["e4", "e4"], "*"))
+    stats = write_database(games, path)
+    assert (stats.games, stats.skipped) == (len(boards), 1)
+    with GameDatabase(path) as database:
+        yield database
+
+
+def test_games_replay_to_the_stored_moves(database, boards):
+    assert len(database) == len(boards)
+    for game_id, chessboard in enumerate(boards):
+        assert database.moves(game_id).tolist() == [record.code for record in chessboard.move_stack]
+        assert database.start_fen(game_id) == chessboard.start_fen
+        assert database.result(game_id) == game_result(chessboard)
+        assert database.tags(game_id)["Annotator"] == "a\tb ä"
+
+        replayed = database.replay(game_id)
+        assert replayed.generate_fen_from_current_position() == chessboard.generate_fen_from_current_position()
+        assert replayed.zobrist_key == chessboard.zobrist_key
+
+
+def test_replay_part_of_a_game_on_a_board(database, boards):
+    chessboard = Chessboard()
+    game_id = max(range(len(boards)), key=lambda game_id: len(boards[game_id].move_stack))
+    database.replay(game_id, chessboard, plies=5)
+    expected = Chessboard(boards[game_id].start_fen)
+    for record in boards[game_id].move_stack[:5]:
+        expected.make_packed_move(record.code)
+    assert chessboard.generate_fen_from_current_position() == expected.generate_fen_from_current_position()
+
+
+def test_game_ids_out_of_range(database):
+    with pytest.raises(IndexError):
+        database.moves(len(database))
+    with pytest.raises(IndexError):
+        database.tags(-1)
+
+
+def test_import_pgn_file(tmp_path, boards):
+    pgn_path = str(tmp_path / "games.pgn")
+    for chessboard in boards:
+        write_game(pgn_path, chessboard, append=True)
+    database_path = str(tmp_path / "games.db")
+    stats = import_pgn(pgn_path, database_path)
+    assert stats.moves == sum(len(chessboard.move_stack) for chessboard in boards)
+    with GameDatabase(database_path) as database:
+        assert [database.result(game_id) for game_id in range(len(database))] == [game_result(chessboard) for chessboard in boards]
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / "games.pgn"
+    path.write_bytes(b"[Event \"not a database\"]" + b"\0" * 64)
+    with pytest.raises(ValueError):
+        GameDatabase(str(path))
@@ -0,0 +1,88 @@
+from chessboard import Chessboard
+from moveGenerator import NOISY_FLAGS, MoveGenerator
+
+CHECKMATE = "rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3"
+
+
+def test_moves_are_cached_per_board_version():
+    chessboard = Chessboard()
+    move_generator = MoveGenerator(chessboard)
+    moves = move_generator.generateMoves()
+    assert move_generator.generateMoves() is moves
+
+    chessboard.make_move(moves.by_uci("f2f3"))
+    assert move_generator.generateMoves() is not moves
+    assert len(move_generator.generateMoves()) == 20
+
+    chessboard.unmake_move()
+    assert [move.code for move in move_generator.generateMoves()] == [move.code for move in moves]
+
+
+def test_has_legal_move_follows_the_board(monkeypatch):
+    chessboard = Chessboard()
+    move_generator = MoveGenerator(chessboard)
+    generated = []
+    iter_packed_moves = move_generator.iter_packed_moves
+    monkeypatch.setattr(move_generator, "iter_packed_moves",
+                        lambda color=None: generated.append(color) or iter_packed_moves(color))
+
+    for uci in ("f2f3", "e7e5", "g2g4"):
+        assert move_generator.has_legal_move()
+        chessboard.make_move(move_generator.generateMoves().by_uci(uci))
+    assert move_generator.has_legal_move()
+    chessboard.make_move(move_generator.generateMoves().by_uci("d8h4"))
+
+    # asked twice at the same version, the second answer comes from the cache
+    assert not move_generator.has_legal_move()
+    assert not move_generator.has_legal_move()
+    assert move_generator.has_legal_move(0b1)
+    assert generated == [0b0, 0b1, 0b0, 0b1, 0b0, 0b1]
+
+    chessboard.unmake_move()
+    assert move_generator.has_legal_move()
+
+
+def test_loading_a_position_clears_the_cache():
+    chessboard = Chessboard()
+    move_generator = MoveGenerator(chessboard)
+    assert move_generator.has_legal_move()
+    chessboard.create_board(CHECKMATE)
+    assert not move_generator.has_legal_move()
+    assert len(move_generator.generateMoves()) == 0
+
+
+def test_staged_moves_equal_the_legal_moves(positions):
+    for fen in positions:
+        move_generator = MoveGenerator(Chessboard(fen))
+        staged = list(move_generator.iter_packed_moves())
+        assert sorted(staged) == sorted(move_generator.generate_packed_moves()), fen
+        assert move_generator.count_legal_moves() == len(staged)
+        assert move_generator.has_legal_move() == bool(staged)
+
+        # captures and promotions come before every quiet move
+        noisy = [bool(code & NOISY_FLAGS) for code in staged]
+        assert noisy == sorted(noisy, reverse=True), fen
+
+
+def test_move_list_lookups(positions):
+    for fen in positions[:600]:
+        moves = MoveGenerator(Chessboard(fen)).generateMoves()
+        for move in moves:
+            assert moves.by_uci(move.uci()) is move
+            assert moves.by_san(moves.san(move)) is move
+            assert moves.get(move.START_SQUARE, move.END_SQUARE, move.uci()[4:] or None) is move
+            assert move in moves.from_square(move.START_SQUARE)
+        assert sum(len(moves.from_square(square)) for square in range(64)) == len(moves)
+
+
+def test_move_list_rejects_unknown_moves():
+    moves = MoveGenerator(Chessboard()).generateMoves()
+    assert moves.by_uci("e2e5") is None
+    assert moves.by_uci("z9z9") is None
+    assert moves.by_san("Ke2") is None
+    assert moves.by_san("O-O") is None
+    # a promotion without figure promotes to a queen
+    promotions = MoveGenerator(Chessboard("8/P6k/8/8/8/8/8/K7 w - - 0 1")).generateMoves()
+    assert promotions.by_san("a8").uci() == "a7a8q"
+    assert promotions.by_uci("a7a8N").uci() == "a7a8n"
+    assert promotions.get(8, 0).uci() == "a7a8q"
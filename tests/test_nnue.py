@@ -0,0 +1,79 @@
+import random
+
+import numpy as np
+import pytest
+
+from batch import load_positions
+from chessboard import Chessboard
+from moveGenerator import MoveGenerator
+from nnue import NnueEvaluator, load_network, random_network, save_network, train
+
+
+@pytest.fixture(scope="module")
+def evaluator():
+    network = random_network(hidden=32, seed=1)
+    # an untrained network scores every position about 0, scaled up a small difference of the accumulators shows
+    return NnueEvaluator(network._replace(output_weights=network.output_weights * 1000))
+
+
+def fresh_evaluation(evaluator, fen):
+    return evaluator(Chessboard(fen))
+
+
+def test_incremental_matches_batch(evaluator, positions):
+    fens = positions[:400]
+    batch = load_positions(fens)
+    white, black = evaluator.network._batch_accumulators(batch.bitboards)
+    for fen, white_values, black_values in zip(fens, white, black):
+        chessboard = Chessboard(fen)
+        evaluator(chessboard)
+        assert np.array_equal(chessboard.accumulator.values, np.stack((white_values, black_values))), fen
+
+    # the float layers round differently for one position and for many at once
+    scores = np.array([fresh_evaluation(evaluator, fen) for fen in fens])
+    assert np.abs(scores - evaluator.evaluate_batch(batch)).max() <= 1
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_accumulator_follows_make_and_unmake(evaluator, seed):
+    generator = random.Random(seed)
+    chessboard = Chessboard()
+    move_generator = MoveGenerator(chessboard)
+    accumulator = evaluator.attach(chessboard)
+    scores = [evaluator(chessboard)]
+
+    for _ in range(60):
+        codes = move_generator.generate_packed_moves()
+        if not codes:
+            break
+        chessboard.make_packed_move(generator.choice(codes))
+        fen = chessboard.generate_fen_from_current_position()
+        scores.append(evaluator(chessboard))
+        assert scores[-1] == fresh_evaluation(evaluator, fen)
+
+        # summing the features up again gives exactly the incremental values
+        values = accumulator.values.copy()
+        accumulator.dirty = [True, True]
+        accumulator.refresh()
+        assert np.array_equal(values, accumulator.values)
+
+    while chessboard.move_stack:
+        chessboard.unmake_packed_move()
+        scores.pop()
+        assert evaluator(chessboard) == scores[-1]
+
+
+def test_save_and_load(tmp_path):
+    network = random_network(hidden=16, seed=2)
+    path = str(tmp_path / "network.npz")
+    save_network(network, path)
+    loaded = load_network(path)
+    assert all(np.array_equal(saved, restored) for saved, restored in zip(network, loaded))
+
+
+def test_train_keeps_the_layout(positions):
+    network = random_network(hidden=16, seed=3)
+    fens = positions[:64]
+    trained = train(network, fens, np.zeros(len(fens), dtype=np.float32), epochs=1, batch_size=32, progress=False)
+    assert [array.shape for array in trained] == [array.shape for array in network]
+    assert not np.array_equal(trained[0], network[0])
@@ -0,0 +1,55 @@
+import pytest
+
+from chessboard import Chessboard
+from moveGenerator import MoveGenerator
+from parallelSearch import ParallelSearcher, SharedTranspositionTable
+from search import EXACT, MATE_SCORE, UPPER_BOUND
+
+
+@pytest.fixture(scope="module")
+def searcher():
+    searcher = ParallelSearcher(processes=2, table_size=1 << 14)
+    yield searcher
+    searcher.close()
+
+
+def test_finds_mate_in_one(searcher):
+    chessboard = Chessboard("r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4")
+    reports = []
+    result = searcher.search(chessboard, depth=3, info=reports.append)
+    assert result.move.uci() == "h5f7"
+    assert result.score == MATE_SCORE - 1
+    assert all(report.move is not None for report in reports)
+
+
+def test_stalemate_has_no_move(searcher):
+    result = searcher.search(Chessboard("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1"), depth=3)
+    assert (result.move, result.score) == (None, 0)
+
+
+def test_node_limit_returns_a_legal_move(searcher):
+    chessboard = Chessboard()
+    move_generator = MoveGenerator(chessboard)
+    chessboard.make_move(move_generator.generateMoves().by_uci("e2e4"))
+    result = searcher.search(chessboard, nodes=50)
+    assert result.move is not None
+    assert move_generator.generateMoves().by_uci(result.move.uci()) is not None
+
+
+def test_shared_table_is_seen_by_another_handle():
+    table = SharedTranspositionTable(1 << 10)
+    other = SharedTranspositionTable(1 << 10, table.name)
+    try:
+        table.store(0x1234_5678_9ABC_DEF0, 5, -42, UPPER_BOUND, 0x0123)
+        entry = other.probe(0x1234_5678_9ABC_DEF0)
+        assert (entry.depth, entry.score, entry.bound, entry.move) == (5, -42, UPPER_BOUND, 0x0123)
+        assert other.probe(0x0FED_CBA9_8765_4321) is None
+
+        # a new search of the owner is taken over by the other handle
+        table.new_search()
+        other.new_search()
+        other.store(0x0FED_CBA9_8765_4321, 1, 0, EXACT, 0)
+        assert table.probe(0x0FED_CBA9_8765_4321).age == table.age == 1
+    finally:
+        other.close()
+        table.close()
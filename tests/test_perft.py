@@ -0,0 +1,52 @@
+import sys
+
+import pytest
+
+import perft
+from chessboard import Chessboard
+from moveGenerator import MoveGenerator
+from perft import REFERENCE_POSITIONS, count_legal_moves_batch, run_parallel_perft, run_perft
+
+
+@pytest.mark.parametrize("position", REFERENCE_POSITIONS, ids=lambda position: position.name)
+@pytest.mark.parametrize("depth", [1, 2, 3])
+def test_reference_counts(position, depth):
+    assert run_perft(position.fen, depth).nodes == position.nodes[depth - 1]
+
+
+@pytest.mark.parametrize("position", REFERENCE_POSITIONS, ids=lambda position: position.name)
+def test_perft_restores_the_board(position):
+    chessboard = Chessboard(position.fen)
+    key = chessboard.zobrist_key
+    perft.perft(chessboard, MoveGenerator(chessboard), 2)
+    assert chessboard.generate_fen_from_current_position() == position.fen
+    assert chessboard.zobrist_key == key
+    assert not chessboard.move_stack
+
+
+def test_parallel_perft_matches_divide():
+    position = REFERENCE_POSITIONS[1]
+    parallel = run_parallel_perft(position.fen, 2, processes=2)
+    assert parallel.nodes == position.nodes[1]
+    assert parallel.divide == run_perft(position.fen, 2).divide
+
+
+def test_depth_below_one_is_rejected():
+    with pytest.raises(ValueError):
+        run_perft(REFERENCE_POSITIONS[0].fen, 0)
+
+
+def test_count_legal_moves_batch():
+    fens = [position.fen for position in REFERENCE_POSITIONS]
+    assert count_legal_moves_batch(fens, processes=2) == [position.nodes[0] for position in REFERENCE_POSITIONS]
+
+
+def test_count_moves_reads_the_file_in_chunks(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "positions.epd"
+    path.write_text("".join(f"{position.fen}\n" for position in REFERENCE_POSITIONS))
+    monkeypatch.setattr(sys, "argv", ["perft.py", "--count-moves", str(path), "--chunk", "4", "--processes", "2"])
+    perft.main()
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[:-1] == [f"{position.nodes[0]}\t{position.fen}" for position in REFERENCE_POSITIONS]
+    assert lines[-1].startswith(f"{len(REFERENCE_POSITIONS)} positions in ")
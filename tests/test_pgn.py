@@ -0,0 +1,95 @@
+import gzip
+import random
+
+import pytest
+
+from chessboard import Chessboard
+from constants import STARTFEN
+from moveGenerator import MoveGenerator
+from perft import REFERENCE_POSITIONS
+from pgn import PgnGame, game_result, game_sans, parse_games, read_games, replay_game, replay_games, write_game
+
+
+def random_game(start_fen, seed, plies=100):
+    generator = random.Random(seed)
+    chessboard = Chessboard(start_fen)
+    move_generator = MoveGenerator(chessboard)
+    for _ in range(plies):
+        codes = move_generator.generate_packed_moves()
+        if not codes:
+            break
+        chessboard.make_packed_move(generator.choice(codes))
+    return chessboard
+
+
+START_FENS = [position.fen for position in REFERENCE_POSITIONS] + [
+    # black to move, the movetext starts with "1..."
+    "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1",
+]
+
+
+@pytest.mark.parametrize("start_fen", START_FENS)
+def test_written_games_replay_to_the_same_moves(tmp_path, start_fen):
+    path = str(tmp_path / "games.pgn")
+    boards = [random_game(start_fen, seed) for seed in range(4)]
+    for number, chessboard in enumerate(boards):
+        write_game(path, chessboard, {"White": "a", "Black": 'b "quoted"', "Round": str(number)}, append=True)
+
+    games = list(read_games(path))
+    assert len(games) == len(boards)
+    for game, chessboard in zip(games, boards):
+        assert game.headers["Black"] == 'b "quoted"'
+        assert game.result == game_result(chessboard)
+        replayed = replay_game(game)
+        assert [record.code for record in replayed.move_stack] == [record.code for record in chessboard.move_stack]
+        assert replayed.generate_fen_from_current_position() == chessboard.generate_fen_from_current_position()
+        assert game_sans(replayed) == game.moves
+
+
+def test_movetext_annotations_are_dropped():
+    text = """[Event "annotated"]
+
+1. e4! {best by test} e5 2. Nf3 (2. f4 exf4 3. Nf3) Nc6?! $6 ; rest of line
+3. Bb5 a6 *
+"""
+    game, = parse_games(text.splitlines())
+    assert game.moves == ["e4", "e5", "Nf3", "Nc6", "Bb5", "a6"]
+    assert game.result == "*"
+
+
+def test_game_without_result_ends_at_the_next_tags():
+    text = '[Event "first"]\n\n1. d4 d5\n[Event "second"]\n\n1. c4 1-0\n'
+    first, second = parse_games(text.splitlines())
+    assert (first.moves, second.moves, second.result) == (["d4", "d5"], ["c4"], "1-0")
+
+
+@pytest.mark.parametrize("sans, result", [
+    (["f3", "e5", "g4", "Qh4#"], "0-1"),
+    (["e4"], "*"),
+])
+def test_result_and_check_marks(sans, result):
+    chessboard = replay_game(PgnGame({}, [san.rstrip("#") for san in sans], "*"))
+    assert game_result(chessboard) == result
+    assert game_sans(chessboard) == sans
+
+
+def test_stalemate_is_a_draw():
+    chessboard = Chessboard("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1")
+    assert game_result(chessboard) == "1/2-1/2"
+
+
+def test_illegal_moves(tmp_path):
+    with pytest.raises(ValueError):
+        replay_game(PgnGame({}, ["e4", "e4"], "*"))
+
+    path = tmp_path / "games.pgn.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as pgn_file:
+        pgn_file.write('[Event "legal"]\n\n1. e4 e5 1-0\n\n[Event "illegal"]\n\n1. e5 0-1\n')
+    stats = replay_games(read_games(str(path)))
+    assert (stats.games, stats.plies, stats.errors) == (2, 3, 1)
+
+
+def test_setup_headers():
+    chessboard = random_game(REFERENCE_POSITIONS[2].fen, 0, plies=3)
+    game = PgnGame({"FEN": chessboard.start_fen}, game_sans(chessboard), "*")
+    assert replay_game(game, Chessboard(STARTFEN)).move_stack[-1].code == chessboard.move_stack[-1].code
@@ -0,0 +1,65 @@
+import pytest
+
+from chessboard import Chessboard
+from gamedb import GameDatabase, write_database
+from pgn import parse_games
+from positionIndex import PositionIndex, build_index
+
+GAMES = """[Event "knight first"]
+[Result "1-0"]
+
+1. Nf3 d5 2. d4 Nf6 1-0
+
+[Event "pawn first"]
+[Result "0-1"]
+
+1. d4 d5 2. Nf3 c6 0-1
+
+[Event "en passant possible"]
+[Result "1/2-1/2"]
+
+1. e4 d5 2. e5 f5 3. exf6 1/2-1/2
+"""
+
+
+@pytest.fixture
+def index(tmp_path):
+    database_path = str(tmp_path / "games.db")
+    index_path = str(tmp_path / "games.idx")
+    write_database(parse_games(GAMES.splitlines(keepends=True)), database_path)
+    build_index(database_path, index_path, processes=1)
+    with GameDatabase(database_path) as database:
+        yield PositionIndex(index_path, database)
+
+
+@pytest.mark.parametrize("fen", [
+    # reached by 1. Nf3 d5 2. d4, black can not take on d3
+    "rnbqkbnr/ppp1pppp/8/3p4/3P4/5N2/PPP1PPPP/RNBQKB1R b KQkq d3 0 2",
+    # reached by 1. d4 d5 2. Nf3
+    "rnbqkbnr/ppp1pppp/8/3p4/3P4/5N2/PPP1PPPP/RNBQKB1R b KQkq - 1 2",
+])
+def test_transpositions_find_both_games(index, fen):
+    assert index.find_games(Chessboard(fen)).tolist() == [0, 1]
+
+
+def test_capturable_en_passant_square_is_its_own_position(index):
+    with_square = Chessboard("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3")
+    without_square = Chessboard("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq - 0 3")
+    assert index.find_games(with_square).tolist() == [2]
+    assert index.find_games(without_square).tolist() == []
+
+
+def test_every_position_is_found_by_its_fen(index):
+    database = index.database
+    for game_id in range(len(database)):
+        chessboard = Chessboard(database.start_fen(game_id))
+        for code in database.moves(game_id).tolist():
+            chessboard.make_packed_move(code)
+            loaded = Chessboard(chessboard.generate_fen_from_current_position())
+            assert loaded.zobrist_key == chessboard.zobrist_key
+            assert game_id in index.find_games(loaded).tolist()
+
+
+def test_move_statistics(index):
+    statistics = index.move_statistics(Chessboard())
+    assert {(statistic.san, statistic.games) for statistic in statistics} == {("Nf3", 1), ("d4", 1), ("e4", 1)}
@@ -0,0 +1,72 @@
+import pytest
+
+from chessboard import Chessboard
+from moveGenerator import MoveGenerator
+from search import MATE_SCORE, Searcher, format_score
+
+MATE_IN_ONE = "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4"
+MATE_IN_TWO = "7k/8/5K2/8/8/8/8/R7 w - - 0 1"
+
+
+def test_finds_mate_in_one():
+    result = Searcher().search(Chessboard(MATE_IN_ONE), depth=2)
+    assert result.move.uci() == "h5f7"
+    assert result.score == MATE_SCORE - 1
+    assert format_score(result.score) == "mate 1"
+
+
+def test_finds_mate_in_two():
+    result = Searcher().search(Chessboard(MATE_IN_TWO), depth=4)
+    assert format_score(result.score) == "mate 2"
+
+    # the principal variation ends in the mate
+    chessboard = Chessboard(MATE_IN_TWO)
+    for code in result.pv:
+        chessboard.make_packed_move(code)
+    move_generator = MoveGenerator(chessboard)
+    assert len(result.pv) == 3
+    assert not move_generator.has_legal_move() and move_generator.check_for_checks()
+
+
+def test_board_is_left_untouched():
+    chessboard = Chessboard(MATE_IN_TWO)
+    fen = chessboard.generate_fen_from_current_position()
+    key = chessboard.zobrist_key
+    Searcher().search(chessboard, depth=3)
+    assert chessboard.generate_fen_from_current_position() == fen
+    assert chessboard.zobrist_key == key
+    assert not chessboard.move_stack
+
+
+@pytest.mark.parametrize("fen, score", [
+    # checkmated
+    ("rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3", -MATE_SCORE),
+    # stalemate
+    ("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1", 0),
+])
+def test_no_legal_move(fen, score):
+    result = Searcher().search(Chessboard(fen), depth=3)
+    assert (result.move, result.score) == (None, score)
+
+
+def test_only_finished_iterations_are_reported():
+    reports = []
+    result = Searcher().search(Chessboard(), depth=3, info=reports.append)
+    assert [report.depth for report in reports] == [1, 2, 3]
+    assert all(report.move is not None for report in reports)
+    assert result.depth == 3
+
+
+def test_stopped_before_the_first_iteration_guesses_at_depth_zero():
+    reports = []
+    result = Searcher().search(Chessboard(), depth=10, nodes=1, info=reports.append)
+    assert reports == []
+    assert result.move is not None and (result.depth, result.score) == (0, 0)
+
+
+def test_node_limit_keeps_the_last_finished_iteration():
+    searcher = Searcher()
+    reports = []
+    result = searcher.search(Chessboard(), depth=30, nodes=3000, info=reports.append)
+    assert result.depth == reports[-1].depth
+    assert result.move.code == reports[-1].move.code
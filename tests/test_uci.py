@@ -0,0 +1,110 @@
+import os
+import sys
+
+import pytest
+
+from chessboard import Chessboard
+from fish import Bot
+from moveGenerator import MoveGenerator
+from search import MATE_SCORE
+from uci import EngineResult, UciEngine, parse_info
+
+# stands in for an engine: logs every command and answers every go with the same search
+FAKE_ENGINE = """#!{python}
+import sys
+
+with open({log!r}, "a") as log:
+    for line in sys.stdin:
+        command = line.strip()
+        log.write(command + "\\n")
+        log.flush()
+        if command == "uci":
+            print("id name Fake Engine 1.0")
+            print("option name Hash type spin default 16 min 1 max 1024")
+            print("uciok")
+        elif command == "isready":
+            print("readyok")
+        elif command.startswith("go"):
+            print("info depth 1 seldepth 1 score cp 10 nodes 20 pv d2d4")
+            print("info string thinking")
+            print("info depth 2 multipv 2 score cp -5 nodes 90 pv g1f3")
+            print("info depth 2 multipv 1 score cp 31 nodes 100 pv e2e4 e7e5")
+            print("bestmove e2e4 ponder e7e5")
+        elif command == "quit":
+            break
+        sys.stdout.flush()
+"""
+
+
+@pytest.fixture
+def engine_path(tmp_path):
+    path = tmp_path / "engine.py"
+    path.write_text(FAKE_ENGINE.format(python=sys.executable, log=str(tmp_path / "commands.log")))
+    os.chmod(path, 0o755)
+    return str(path)
+
+
+def commands(engine_path):
+    with open(os.path.join(os.path.dirname(engine_path), "commands.log")) as log:
+        return log.read().splitlines()
+
+
+EMPTY = EngineResult(None, None, 0, 0, [])
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("info depth 12 score cp 31 nodes 53120 pv e2e4 e7e5", EngineResult(None, 31, 12, 53120, ["e2e4", "e7e5"])),
+    ("info depth 5 score mate 2 nodes 100 pv h5f7", EngineResult(None, MATE_SCORE - 3, 5, 100, ["h5f7"])),
+    ("info depth 5 score mate -1 nodes 100", EngineResult(None, -(MATE_SCORE - 2), 5, 100, [])),
+    ("info depth 7 score cp 15 lowerbound nodes 9", EngineResult(None, 15, 7, 9, [])),
+    ("info depth 7 currmove e2e4 currmovenumber 1", EMPTY),
+    ("info depth 7 multipv 2 score cp 15 nodes 9 pv g1f3", EMPTY),
+])
+def test_parse_info(line, expected):
+    assert parse_info(line, EMPTY) == expected
+
+
+def test_engine_keeps_the_game(engine_path):
+    engine = UciEngine(engine_path, {"Hash": 64})
+    try:
+        assert engine.name == "Fake Engine 1.0"
+        chessboard = Chessboard()
+        move_generator = MoveGenerator(chessboard)
+        result = engine.play(chessboard, think_time=0.05)
+        assert result == EngineResult("e2e4", 31, 2, 100, ["e2e4", "e7e5"])
+
+        chessboard.make_move(move_generator.generateMoves().by_uci(result.best_move))
+        engine.play(chessboard, depth=8, nodes=1000)
+
+        other = Chessboard("8/8/8/8/8/8/8/K6k w - - 0 1")
+        engine.play(other, think_time=1)
+        with pytest.raises(ValueError):
+            engine.go()
+    finally:
+        engine.close()
+
+    assert commands(engine_path) == [
+        "uci", "setoption name Hash value 64", "isready",
+        "position startpos", "go movetime 50",
+        "position startpos moves e2e4", "go depth 8 nodes 1000",
+        "ucinewgame", "isready", "position fen 8/8/8/8/8/8/8/K6k w - - 0 1", "go movetime 1000",
+        "quit",
+    ]
+
+
+def test_bot_searches_the_whole_think_time_by_default(engine_path):
+    chessboard = Chessboard()
+    bot = Bot(chessboard, 0b0, stockfish_path=engine_path, think_time=0.2)
+    try:
+        assert bot.name == "Fake Engine 1.0"
+        assert bot.get_move().uci() == "e2e4"
+    finally:
+        bot.close()
+    assert "go movetime 200" in commands(engine_path)
+
+    bot = Bot(chessboard, 0b0, stockfish_path=engine_path, think_time=0.2, engine_depth=12)
+    try:
+        bot.get_move()
+    finally:
+        bot.close()
+    assert commands(engine_path).count("go movetime 200 depth 12") == 1
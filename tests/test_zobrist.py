@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from chessboard import Chessboard
+from moveGenerator import MoveGenerator
+from search import Searcher
+from zobrist import compute_hash
+
+
+def play(chessboard, sans):
+    move_generator = MoveGenerator(chessboard)
+    for san in sans:
+        move = move_generator.generateMoves().by_san(san)
+        assert move is not None, san
+        chessboard.make_packed_move(move.code)
+    return chessboard
+
+
+def full_hash(chessboard):
+    return compute_hash(chessboard.bitboards, chessboard.color_to_move, chessboard.castle_right,
+                        chessboard.en_passant_square)
+
+
+def test_transposition_with_double_push_has_the_same_key():
+    knight_first = play(Chessboard(), ["Nf3", "d5", "d4"])
+    pawn_first = play(Chessboard(), ["d4", "d5", "Nf3"])
+    assert knight_first.zobrist_key == pawn_first.zobrist_key
+
+
+def test_capturable_en_passant_square_changes_the_key():
+    with_capture = play(Chessboard(), ["e4", "d5", "e5", "f5"])
+    fen = with_capture.generate_fen_from_current_position()
+    without_square = Chessboard(fen.replace(" f6 ", " - "))
+    assert with_capture.zobrist_key != without_square.zobrist_key
+
+
+def test_repetition_through_position_after_double_push():
+    chessboard = play(Chessboard(), ["e4", "Nf6", "Nf3", "Ng8", "Ng1"])
+    searcher = Searcher()
+    searcher._set_up(chessboard)
+    assert searcher._is_draw()
+
+
+def test_no_repetition_before_the_position_returns():
+    chessboard = play(Chessboard(), ["e4", "Nf6", "Nf3", "Ng8"])
+    searcher = Searcher()
+    searcher._set_up(chessboard)
+    assert not searcher._is_draw()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_key_matches_full_hash_and_fen(seed):
+    generator = random.Random(seed)
+    chessboard = Chessboard()
+    move_generator = MoveGenerator(chessboard)
+    keys = [chessboard.zobrist_key]
+    for _ in range(80):
+        codes = move_generator.generate_packed_moves()
+        if not codes:
+            break
+        chessboard.make_packed_move(generator.choice(codes))
+        assert chessboard.zobrist_key == full_hash(chessboard)
+        assert chessboard.zobrist_key == Chessboard(chessboard.generate_fen_from_current_position()).zobrist_key
+        keys.append(chessboard.zobrist_key)
+
+    while chessboard.move_stack:
+        keys.pop()
+        chessboard.unmake_packed_move()
+        assert chessboard.zobrist_key == keys[-1]